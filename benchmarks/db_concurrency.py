@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Concurrent read/write benchmark for the SQLite engine settings.
+
+One writer process inserts follower rows in long transactions (like the
+scheduler applying a diff) while several reader processes run the lookups
+handlers make. The run is repeated with a plain create_engine() and with
+the tuned engine from src.db.engine, and reports throughput, read latency
+and "database is locked" errors for both.
+
+Usage:
+    python benchmarks/db_concurrency.py [--seconds 5] [--readers 4] [--batch 2000]
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select, insert
+from sqlalchemy.exc import OperationalError
+from src.db.engine import create_db_engine
+from src.db.models import Base, User, TrackedAccount, Follower, InstagramUser
+
+def prepare(engine):
+    """Create the schema and one tracked account to write followers for"""
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        user_id = connection.execute(insert(User).values(chat_id="1")).inserted_primary_key[0]
+        account_id = connection.execute(
+            insert(TrackedAccount).values(user_id=user_id, instagram_username="bench", instagram_user_id=1)
+        ).inserted_primary_key[0]
+    return account_id
+
+def make_engine(kind, path):
+    """Build the engine under test; each process builds its own"""
+    if kind == "default":
+        return create_engine(f"sqlite:///{path}")
+    return create_db_engine(f"sqlite:///{path}")
+
+def writer(kind, path, account_id, batch, deadline, results):
+    """Insert followers row by row, keeping each write transaction open like a real diff"""
+    engine = make_engine(kind, path)
+    writes = errors = 0
+    next_id = 1
+
+    while time.time() < deadline:
+        try:
+            with engine.begin() as connection:
+                for i in range(batch):
+                    connection.execute(insert(InstagramUser).values(
+                        id=next_id + i,
+                        username=f"user{next_id + i}"
+                    ))
+                    connection.execute(insert(Follower).values(
+                        tracked_account_id=account_id,
+                        instagram_user_id=next_id + i
+                    ))
+            next_id += batch
+            writes += batch
+        except OperationalError:
+            errors += 1
+
+    results.put(("writer", writes, errors, []))
+
+def reader(kind, path, account_id, deadline, results):
+    """Run the lookups a handler makes, timing each one"""
+    engine = make_engine(kind, path)
+    query = select(func.count()).select_from(Follower).where(Follower.tracked_account_id == account_id)
+    reads = errors = 0
+    latencies = []
+
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            with engine.connect() as connection:
+                connection.execute(query).scalar()
+                connection.execute(select(User).where(User.chat_id == "1")).first()
+            reads += 1
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            errors += 1
+
+    results.put(("reader", reads, errors, latencies))
+
+def run(kind, path, seconds, readers, batch):
+    """Run one writer and several reader processes and return counters"""
+    account_id = prepare(make_engine(kind, path))
+    deadline = time.time() + seconds
+    results = multiprocessing.Queue()
+
+    processes = [multiprocessing.Process(target=writer, args=(kind, path, account_id, batch, deadline, results))]
+    processes += [
+        multiprocessing.Process(target=reader, args=(kind, path, account_id, deadline, results))
+        for _ in range(readers)
+    ]
+    for process in processes:
+        process.start()
+
+    counters = {"writes": 0, "reads": 0, "write_errors": 0, "read_errors": 0}
+    read_latencies = []
+    for _ in processes:
+        role, done, errors, latencies = results.get()
+        counters["writes" if role == "writer" else "reads"] += done
+        counters["write_errors" if role == "writer" else "read_errors"] += errors
+        read_latencies.extend(latencies)
+
+    for process in processes:
+        process.join()
+
+    read_latencies.sort()
+    counters["read_p99_ms"] = read_latencies[int(len(read_latencies) * 0.99)] * 1000 if read_latencies else 0.0
+    counters["read_max_ms"] = read_latencies[-1] * 1000 if read_latencies else 0.0
+    return counters
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{args.seconds:.0f}s, 1 writer ({args.batch} rows/txn), {args.readers} readers\n")
+        print(
+            f"{'engine':<8} {'rows/s':>10} {'reads/s':>10} {'read p99 ms':>12} "
+            f"{'read max ms':>12} {'write errs':>11} {'read errs':>10}"
+        )
+        for name in ("default", "tuned"):
+            result = run(name, os.path.join(directory, f"{name}.db"), args.seconds, args.readers, args.batch)
+            print(
+                f"{name:<8} {result['writes'] / args.seconds:>10.0f} {result['reads'] / args.seconds:>10.0f} "
+                f"{result['read_p99_ms']:>12.1f} {result['read_max_ms']:>12.1f} "
+                f"{result['write_errors']:>11} {result['read_errors']:>10}"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Peak memory of one follower check.
+
+Seeds a temporary SQLite database with an account that already has
+--followers followers, then runs a check in which --churn of them were
+replaced by new ones. Pages of instagrapi UserShort objects are generated
+locally instead of being fetched, so no Instagram login is needed. The
+generated fetch is marked complete, so the check takes the trusted path
+and applies new followers, unfollowers and suspect cleanup. Each
+mode runs in a fresh process on its own copy of the database, with a
+small SQLite page cache and no mmap, and reports how much its peak RSS
+grew over the run:
+
+    dicts    the previous working set: the fetched list as dicts plus every
+             existing follower loaded as an ORM object, diffed by ID
+    records  TrackingService.update_followers as it is now: pages of
+             FollowerRecords, their IDs collected in an array, then staged
+             in follower_staging and diffed in SQL
+
+Usage:
+    python benchmarks/follower_memory.py [--followers 100000] [--churn 0.01]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def follower_ids(followers, churn, check):
+    """IDs returned by the fetch; the check run swaps the oldest churn for new ones"""
+    if not check:
+        return range(1, followers + 1)
+    replaced = int(followers * churn)
+    return range(1 + replaced, followers + replaced + 1)
+
+def user_pages(ids, page_size):
+    """Pages of UserShort objects like user_followers_v1_chunk returns"""
+    from instagrapi.types import UserShort
+
+    for start in range(0, len(ids), page_size):
+        yield [
+            UserShort(
+                pk=str(user_id),
+                username=f"user{user_id}",
+                full_name=f"User Number {user_id}",
+                profile_pic_url=f"https://scontent.cdninstagram.com/v/t51.2885-19/{user_id}_n.jpg?stp=dst-jpg_s150x150",
+                is_private=False
+            )
+            for user_id in ids[start:start + page_size]
+        ]
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run(mode, path, followers, churn, page_size, check, results):
+    """Run one check in this process and report its peak RSS growth"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    # Keep SQLite's page cache and mmap small so RSS shows the Python working set
+    os.environ["SQLITE_CACHE_SIZE_KB"] = "2048"
+    os.environ["SQLITE_MMAP_SIZE"] = "0"
+
+    from sqlalchemy import insert
+    from src.db.engine import get_engine
+    from src.db.models import Base, User, TrackedAccount
+    from src.services.archive_service import ArchiveService
+    from src.services.instagram_service import InstagramService
+    from src.services.tracking_service import TrackingService
+
+    class GeneratedInstagram(InstagramService):
+        def iter_follower_pages(self, user_id, page_size=page_size, task=None, stats=None):
+            if stats is not None:
+                stats["complete"] = False
+            for page in user_pages(follower_ids(followers, churn, check), page_size):
+                if stats is not None:
+                    stats["api_calls"] = stats.get("api_calls", 0) + 1
+                yield page
+            # Every page was generated, so the check trusts the fetch like a real full one
+            if stats is not None:
+                stats["complete"] = True
+        
+        def get_follower_count(self, user_id, stats=None):
+            return followers
+
+    if not check:
+        engine = get_engine()
+        Base.metadata.create_all(engine)
+        with engine.begin() as connection:
+            user_id = connection.execute(insert(User).values(chat_id="1")).inserted_primary_key[0]
+            connection.execute(insert(TrackedAccount).values(
+                user_id=user_id, instagram_username="bench", instagram_user_id=1
+            ))
+
+    tracking = TrackingService(GeneratedInstagram(), ArchiveService(archive_dir=os.path.dirname(path)))
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+
+    if mode == "records":
+        tracking.update_followers(1)
+    else:
+        diff_with_dicts(tracking.instagram_service, followers, churn, page_size, check)
+
+    results.put((mode, peak_rss_mb() - baseline, time.perf_counter() - started))
+
+def diff_with_dicts(instagram, followers, churn, page_size, check):
+    """The old in-memory shape: three-key dicts and ORM Follower objects"""
+    from src.db.models import Follower
+    from src.db.session import get_session
+
+    fetched = []
+    for page in instagram.iter_follower_pages(1, page_size):
+        fetched.extend(
+            {"instagram_user_id": int(user.pk), "username": user.username, "full_name": user.full_name}
+            for user in page
+        )
+
+    session = get_session()
+    existing = session.query(Follower).filter_by(tracked_account_id=1).all()
+    existing_ids = {follower.instagram_user_id for follower in existing}
+    current_ids = {follower["instagram_user_id"] for follower in fetched}
+    return current_ids - existing_ids, existing_ids - current_ids
+
+def measure(mode, path, args, check):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=run, args=(mode, path, args.followers, args.churn, args.page_size, check, results)
+    )
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--followers", type=int, default=100000)
+    parser.add_argument("--churn", type=float, default=0.01)
+    parser.add_argument("--page-size", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        seeded = os.path.join(directory, "seed.db")
+        _, _, seconds = measure("records", seeded, args, check=False)
+        print(f"Seeded {args.followers} followers in {seconds:.1f}s; checking with {args.churn:.0%} churn\n")
+
+        print(f"{'mode':<8} {'peak RSS MB':>12} {'MB per 100k':>12} {'seconds':>8}")
+        for mode in ("dicts", "records"):
+            path = os.path.join(directory, f"{mode}.db")
+            for suffix in ("", "-wal"):
+                if os.path.exists(seeded + suffix):
+                    shutil.copy(seeded + suffix, path + suffix)
+            _, growth, seconds = measure(mode, path, args, check=True)
+            print(f"{mode:<8} {growth:>12.1f} {growth * 100000 / args.followers:>12.1f} {seconds:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the bot entry point.
+
+Runs `python -X importtime -c "import src.bot"` in a fresh interpreter,
+prints the slowest imports and fails if a heavy dependency that should be
+deferred gets imported, or if the total exceeds the budget.
+
+Usage:
+    python benchmarks/import_time.py [--budget-ms 1500] [--top 15] [--module src.bot]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+# Dependencies that must only be loaded by the first Instagram operation
+DEFERRED_MODULES = ["instagrapi", "PIL", "pydantic", "requests"]
+
+def measure(module):
+    """Return {module: (self_us, cumulative_us)} for one import of the module"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+
+    # Importing src.bot sets up file logging under ./logs; keep that out of the working tree
+    with tempfile.TemporaryDirectory() as directory:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=directory,
+            env=env,
+            capture_output=True,
+            text=True
+        )
+
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise SystemExit(f"Importing {module} failed")
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="src.bot")
+    parser.add_argument("--budget-ms", type=float, default=1500.0)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings = measure(args.module)
+    total_ms = timings[args.module][1] / 1000
+
+    print(f"Import of {args.module}: {total_ms:.1f} ms cumulative, {len(timings)} modules")
+    print(f"\nTop {args.top} modules by cumulative time:")
+    for name, (self_us, cumulative_us) in sorted(timings.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    failed = False
+
+    leaked = [name for name in DEFERRED_MODULES if name in timings]
+    if leaked:
+        print(f"\nFAIL: deferred dependencies imported eagerly: {', '.join(leaked)}")
+        failed = True
+
+    if total_ms > args.budget_ms:
+        print(f"\nFAIL: {total_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+        failed = True
+
+    if not failed:
+        print(f"\nOK: within {args.budget_ms:.0f} ms and no deferred dependencies imported")
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
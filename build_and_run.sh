@@ -25,11 +25,11 @@ if [ -z "$TELEGRAM_BOT_TOKEN" ]; then
 fi
 
 # Create necessary directories
-mkdir -p logs settings
+mkdir -p logs settings archives
 
 # Make sure directories have the correct permissions
-echo "🔑 Setting correct permissions for logs and settings directories..."
-chmod -R 777 logs settings
+echo "🔑 Setting correct permissions for logs, settings and archives directories..."
+chmod -R 777 logs settings archives
 
 # Build Docker image
 echo "🔄 Building Docker image..."
@@ -51,6 +51,7 @@ docker run -d --name insta-unfriender \
     -v "$(pwd)/logs:/app/logs" \
     -v "$(pwd)/bot_data.db:/app/bot_data.db" \
     -v "$(pwd)/settings:/app/settings" \
+    -v "$(pwd)/archives:/app/archives" \
     insta-unfriender:latest
 
 echo "✅ Bot is running in the background!"
@@ -0,0 +1,56 @@
+"""
+Alembic environment for the bot database
+"""
+import os
+from alembic import context
+from dotenv import load_dotenv
+from sqlalchemy import create_engine
+from src.db.models import Base
+
+load_dotenv()
+
+config = context.config
+target_metadata = Base.metadata
+
+def get_url():
+    return config.get_main_option("sqlalchemy.url") or os.getenv("DATABASE_URL", "sqlite:///bot_data.db")
+
+def run_migrations_offline():
+    """Emit SQL to stdout instead of running it"""
+    context.configure(
+        url=get_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    """Run migrations on a live connection, reusing the app's one if provided"""
+    connection = config.attributes.get("connection")
+
+    if connection is not None:
+        run_with_connection(connection)
+        return
+
+    engine = create_engine(get_url())
+    with engine.connect() as connection:
+        run_with_connection(connection)
+
+def run_with_connection(connection):
+    # Batch mode lets column changes work on SQLite, which can't ALTER columns
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=True
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,71 @@
+"""Initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("chat_id", sa.String(), nullable=False, unique=True),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("is_admin", sa.Boolean(), nullable=True),
+    )
+    op.create_table(
+        "tracked_accounts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("instagram_username", sa.String(), nullable=False),
+        sa.Column("instagram_user_id", sa.String(), nullable=True),
+        sa.Column("is_private", sa.Boolean(), nullable=True),
+        sa.Column("follow_requested", sa.Boolean(), nullable=True),
+        sa.Column("last_check", sa.DateTime(), nullable=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+    )
+    op.create_table(
+        "followers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("instagram_user_id", sa.String(), nullable=False),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("tracked_account_id", sa.Integer(), sa.ForeignKey("tracked_accounts.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+    op.create_table(
+        "unfollowers",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("instagram_user_id", sa.String(), nullable=False),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("tracked_account_id", sa.Integer(), sa.ForeignKey("tracked_accounts.id"), nullable=False),
+        sa.Column("unfollowed_at", sa.DateTime(), nullable=True),
+    )
+    op.create_table(
+        "settings",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("key", sa.String(), nullable=False, unique=True),
+        sa.Column("value", sa.String(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("settings")
+    op.drop_table("unfollowers")
+    op.drop_table("followers")
+    op.drop_table("tracked_accounts")
+    op.drop_table("users")
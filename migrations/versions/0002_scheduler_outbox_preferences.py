@@ -0,0 +1,67 @@
+"""Scheduler leases, notification outbox and user preferences
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 00:00:01
+
+Databases created before migrations existed may already have these tables
+from Base.metadata.create_all, so each one is only created if missing.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if "scheduler_leases" not in existing:
+        op.create_table(
+            "scheduler_leases",
+            sa.Column("name", sa.String(), primary_key=True),
+            sa.Column("holder_id", sa.String(), nullable=True),
+            sa.Column("fencing_token", sa.Integer(), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=True),
+            sa.Column("heartbeat_at", sa.DateTime(), nullable=True),
+        )
+
+    if "notification_outbox" not in existing:
+        op.create_table(
+            "notification_outbox",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("idempotency_key", sa.String(), nullable=False, unique=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("tracked_account_id", sa.Integer(), nullable=True),
+            sa.Column("instagram_username", sa.String(), nullable=False),
+            sa.Column("payload", sa.Text(), nullable=False),
+            sa.Column("status", sa.String(), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("next_attempt_at", sa.DateTime(), nullable=True),
+            sa.Column("claim_token", sa.String(), nullable=True),
+            sa.Column("claimed_at", sa.DateTime(), nullable=True),
+            sa.Column("last_error", sa.Text(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("sent_at", sa.DateTime(), nullable=True),
+        )
+
+    if "user_preferences" not in existing:
+        op.create_table(
+            "user_preferences",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("digest_minutes", sa.Integer(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("user_preferences")
+    op.drop_table("notification_outbox")
+    op.drop_table("scheduler_leases")
@@ -0,0 +1,91 @@
+"""Indexes for hot queries and numeric Instagram IDs
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 00:00:02
+
+Adds the indexes used by follower diffs, unfollower lookups, account
+lookups and outbox polling, and converts instagram_user_id columns from
+String to BigInteger. Duplicate rows that would violate the new unique
+indexes are removed first, keeping the oldest row.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ID_COLUMNS = [
+    ("tracked_accounts", True),
+    ("followers", False),
+    ("unfollowers", False),
+]
+
+
+def upgrade() -> None:
+    # Duplicate tracked accounts (same user and username): keep the oldest one
+    duplicate_accounts = (
+        "SELECT id FROM tracked_accounts WHERE id NOT IN "
+        "(SELECT MIN(id) FROM tracked_accounts GROUP BY user_id, instagram_username)"
+    )
+    op.execute(f"DELETE FROM followers WHERE tracked_account_id IN ({duplicate_accounts})")
+    op.execute(f"DELETE FROM unfollowers WHERE tracked_account_id IN ({duplicate_accounts})")
+    op.execute(
+        "DELETE FROM tracked_accounts WHERE id NOT IN "
+        "(SELECT MIN(id) FROM tracked_accounts GROUP BY user_id, instagram_username)"
+    )
+
+    # Duplicate follower rows for the same account
+    op.execute(
+        "DELETE FROM followers WHERE id NOT IN "
+        "(SELECT MIN(id) FROM followers GROUP BY tracked_account_id, instagram_user_id)"
+    )
+
+    for table, nullable in ID_COLUMNS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                "instagram_user_id",
+                existing_type=sa.String(),
+                type_=sa.BigInteger(),
+                existing_nullable=nullable,
+                postgresql_using="instagram_user_id::bigint"
+            )
+
+    op.create_index(
+        "uq_tracked_accounts_user_username", "tracked_accounts",
+        ["user_id", "instagram_username"], unique=True
+    )
+    op.create_index(
+        "uq_followers_account_user", "followers",
+        ["tracked_account_id", "instagram_user_id"], unique=True
+    )
+    op.create_index(
+        "ix_unfollowers_account_time", "unfollowers",
+        ["tracked_account_id", "unfollowed_at", "id"]
+    )
+    op.create_index(
+        "ix_notification_outbox_due", "notification_outbox",
+        ["status", "next_attempt_at"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notification_outbox_due", table_name="notification_outbox")
+    op.drop_index("ix_unfollowers_account_time", table_name="unfollowers")
+    op.drop_index("uq_followers_account_user", table_name="followers")
+    op.drop_index("uq_tracked_accounts_user_username", table_name="tracked_accounts")
+
+    for table, nullable in ID_COLUMNS:
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.alter_column(
+                "instagram_user_id",
+                existing_type=sa.BigInteger(),
+                type_=sa.String(),
+                existing_nullable=nullable
+            )
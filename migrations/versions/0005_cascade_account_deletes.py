@@ -0,0 +1,73 @@
+"""Cascade account deletes in the database
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19 00:00:04
+
+Followers and unfollowers reference tracked_accounts with ON DELETE
+CASCADE, so deleting an account no longer needs the ORM to load every
+child row. Adds tracked_accounts.deleted_at for accounts waiting to be
+purged, and limits the username unique index to live accounts.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHILD_TABLES = ["followers", "unfollowers"]
+
+# SQLite foreign keys from the initial schema are unnamed; batch mode names
+# them with this convention when it reflects the table
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s"}
+
+
+def foreign_key_name(table):
+    if op.get_bind().dialect.name == "postgresql":
+        return f"{table}_tracked_account_id_fkey"
+    return f"fk_{table}_tracked_account_id"
+
+
+def replace_foreign_keys(ondelete):
+    for table in CHILD_TABLES:
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(foreign_key_name(table), type_="foreignkey")
+            batch_op.create_foreign_key(
+                foreign_key_name(table), "tracked_accounts",
+                ["tracked_account_id"], ["id"],
+                ondelete=ondelete
+            )
+
+
+def upgrade() -> None:
+    op.add_column("tracked_accounts", sa.Column("deleted_at", sa.DateTime(), nullable=True))
+
+    op.drop_index("uq_tracked_accounts_user_username", table_name="tracked_accounts")
+    op.create_index(
+        "uq_tracked_accounts_user_username", "tracked_accounts",
+        ["user_id", "instagram_username"], unique=True,
+        sqlite_where=sa.text("deleted_at IS NULL"),
+        postgresql_where=sa.text("deleted_at IS NULL")
+    )
+
+    replace_foreign_keys("CASCADE")
+
+
+def downgrade() -> None:
+    replace_foreign_keys(None)
+
+    op.drop_index("uq_tracked_accounts_user_username", table_name="tracked_accounts")
+    op.execute("DELETE FROM tracked_accounts WHERE deleted_at IS NOT NULL")
+    op.create_index(
+        "uq_tracked_accounts_user_username", "tracked_accounts",
+        ["user_id", "instagram_username"], unique=True
+    )
+
+    with op.batch_alter_table("tracked_accounts") as batch_op:
+        batch_op.drop_column("deleted_at")
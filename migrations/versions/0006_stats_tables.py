@@ -0,0 +1,91 @@
+"""Materialized statistics
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 00:00:05
+
+Creates bot_stats (global counters), account_stats (per-account totals
+and last check timings) and unfollow_days, and fills them from the
+existing rows once. From then on the diff pipeline keeps them up to date.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Counter key -> query that computes its starting value
+COUNTERS = {
+    "users": "SELECT COUNT(*) FROM users",
+    "tracked_accounts": "SELECT COUNT(*) FROM tracked_accounts WHERE deleted_at IS NULL",
+    "followers": "SELECT COUNT(*) FROM followers",
+    "unfollowers": "SELECT COUNT(*) FROM unfollowers",
+}
+
+# Counters that start at zero
+TIMING_COUNTERS = [
+    "checks", "check_ms_total", "fetch_ms_total", "api_calls",
+    "cycles", "last_cycle_accounts", "last_cycle_api_calls", "last_cycle_ms",
+]
+
+
+def upgrade() -> None:
+    op.create_table(
+        "bot_stats",
+        sa.Column("key", sa.String(), primary_key=True),
+        sa.Column("value", sa.BigInteger(), nullable=False),
+    )
+    op.create_table(
+        "account_stats",
+        sa.Column(
+            "tracked_account_id", sa.Integer(),
+            sa.ForeignKey("tracked_accounts.id", ondelete="CASCADE"), primary_key=True
+        ),
+        sa.Column("follower_count", sa.Integer(), nullable=False),
+        sa.Column("unfollower_count", sa.Integer(), nullable=False),
+        sa.Column("checks", sa.Integer(), nullable=False),
+        sa.Column("last_check_ms", sa.Integer(), nullable=True),
+        sa.Column("last_fetch_ms", sa.Integer(), nullable=True),
+        sa.Column("last_api_calls", sa.Integer(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.create_table(
+        "unfollow_days",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("unfollowers", sa.Integer(), nullable=False),
+    )
+
+    for key, query in COUNTERS.items():
+        op.execute(f"INSERT INTO bot_stats (key, value) SELECT '{key}', ({query})")
+    for key in TIMING_COUNTERS:
+        op.execute(f"INSERT INTO bot_stats (key, value) VALUES ('{key}', 0)")
+
+    op.execute(
+        "INSERT INTO account_stats (tracked_account_id, follower_count, unfollower_count, checks) "
+        "SELECT a.id, "
+        "(SELECT COUNT(*) FROM followers f WHERE f.tracked_account_id = a.id), "
+        "(SELECT COUNT(*) FROM unfollowers u WHERE u.tracked_account_id = a.id), "
+        "0 FROM tracked_accounts a"
+    )
+    # SQLite stores datetimes as text, where CAST(... AS DATE) would yield the year
+    if op.get_bind().dialect.name == "sqlite":
+        day = "DATE(unfollowed_at)"
+    else:
+        day = "CAST(unfollowed_at AS DATE)"
+    op.execute(
+        f"INSERT INTO unfollow_days (day, unfollowers) "
+        f"SELECT {day}, COUNT(*) FROM unfollowers "
+        f"WHERE unfollowed_at IS NOT NULL GROUP BY {day}"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("unfollow_days")
+    op.drop_table("account_stats")
+    op.drop_table("bot_stats")
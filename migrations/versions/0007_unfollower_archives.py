@@ -0,0 +1,41 @@
+"""Unfollower archive index
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 00:00:06
+
+Old unfollower rows are moved to compressed monthly files; this table
+records which account/month files exist and the time range they cover.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: Union[str, None] = "0006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "unfollower_archives",
+        sa.Column(
+            "tracked_account_id", sa.Integer(),
+            sa.ForeignKey("tracked_accounts.id", ondelete="CASCADE"), primary_key=True
+        ),
+        sa.Column("month", sa.String(length=7), primary_key=True),
+        sa.Column("rows", sa.Integer(), nullable=False),
+        sa.Column("first_at", sa.DateTime(), nullable=True),
+        sa.Column("last_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+    op.execute("INSERT INTO bot_stats (key, value) VALUES ('archived_unfollowers', 0)")
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM bot_stats WHERE key = 'archived_unfollowers'")
+    op.drop_table("unfollower_archives")
@@ -0,0 +1,71 @@
+"""Global Instagram user directory
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 00:00:07
+
+Moves usernames and full names out of followers and unfollowers into
+instagram_users, keyed by Instagram's numeric pk. Follower rows keep only
+the pk, which now references the directory. Names are taken from the
+current followers where possible, falling back to unfollower rows, and
+are refreshed on the next fetch.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHILD_TABLES = ["followers", "unfollowers"]
+
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s"}
+
+
+def upgrade() -> None:
+    op.create_table(
+        "instagram_users",
+        sa.Column("id", sa.BigInteger(), primary_key=True, autoincrement=False),
+        sa.Column("username", sa.String(), nullable=True),
+        sa.Column("full_name", sa.String(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+    )
+
+    for table in CHILD_TABLES:
+        op.execute(
+            "INSERT INTO instagram_users (id, username, full_name, updated_at) "
+            "SELECT instagram_user_id, MAX(username), MAX(full_name), CURRENT_TIMESTAMP "
+            f"FROM {table} "
+            "WHERE instagram_user_id NOT IN (SELECT id FROM instagram_users) "
+            "GROUP BY instagram_user_id"
+        )
+
+    for table in CHILD_TABLES:
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_column("username")
+            batch_op.drop_column("full_name")
+            batch_op.create_foreign_key(
+                f"fk_{table}_instagram_user_id", "instagram_users",
+                ["instagram_user_id"], ["id"]
+            )
+
+
+def downgrade() -> None:
+    for table in CHILD_TABLES:
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(f"fk_{table}_instagram_user_id", type_="foreignkey")
+            batch_op.add_column(sa.Column("username", sa.String(), nullable=True))
+            batch_op.add_column(sa.Column("full_name", sa.String(), nullable=True))
+
+        op.execute(
+            f"UPDATE {table} SET "
+            f"username = (SELECT username FROM instagram_users i WHERE i.id = {table}.instagram_user_id), "
+            f"full_name = (SELECT full_name FROM instagram_users i WHERE i.id = {table}.instagram_user_id)"
+        )
+
+    op.drop_table("instagram_users")
@@ -0,0 +1,36 @@
+"""Follower staging table
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 00:00:08
+
+A check writes the follower IDs it fetches into follower_staging page by
+page and diffs them against followers with SQL, so neither list has to
+be loaded into memory.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "follower_staging",
+        sa.Column(
+            "tracked_account_id", sa.Integer(),
+            sa.ForeignKey("tracked_accounts.id", ondelete="CASCADE"), primary_key=True
+        ),
+        sa.Column("instagram_user_id", sa.BigInteger(), primary_key=True, autoincrement=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("follower_staging")
@@ -0,0 +1,30 @@
+"""Follower set hash
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 00:00:09
+
+Adds tracked_accounts.followers_hash. A check whose fetched follower IDs
+hash to the stored value skips the diff. Existing accounts start empty
+and get their hash on their next check.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("tracked_accounts", sa.Column("followers_hash", sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("tracked_accounts") as batch_op:
+        batch_op.drop_column("followers_hash")
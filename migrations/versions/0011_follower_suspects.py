@@ -0,0 +1,37 @@
+"""Follower suspects
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 00:00:10
+
+Followers missing from a fetch that looks truncated are recorded in
+follower_suspects instead of being turned into unfollowers; later checks
+confirm or clear them.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "follower_suspects",
+        sa.Column(
+            "tracked_account_id", sa.Integer(),
+            sa.ForeignKey("tracked_accounts.id", ondelete="CASCADE"), primary_key=True
+        ),
+        sa.Column("instagram_user_id", sa.BigInteger(), primary_key=True, autoincrement=False),
+        sa.Column("missing_since", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("follower_suspects")
@@ -0,0 +1,43 @@
+"""Follower diff progress
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19 00:00:11
+
+Large diffs are applied in many short transactions. follower_diffs holds
+the running totals of a diff in progress, so a check interrupted halfway
+can be finished from follower_staging.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0012"
+down_revision: Union[str, None] = "0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "follower_diffs",
+        sa.Column(
+            "tracked_account_id", sa.Integer(),
+            sa.ForeignKey("tracked_accounts.id", ondelete="CASCADE"), primary_key=True
+        ),
+        sa.Column("check_time", sa.DateTime(), nullable=False),
+        sa.Column("trusted", sa.Boolean(), nullable=False),
+        sa.Column("follower_count", sa.Integer(), nullable=False),
+        sa.Column("added", sa.Integer(), nullable=False),
+        sa.Column("removed", sa.Integer(), nullable=False),
+        sa.Column("followers_hash", sa.BigInteger(), nullable=True),
+        sa.Column("fetch_ms", sa.Integer(), nullable=True),
+        sa.Column("api_calls", sa.Integer(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("follower_diffs")
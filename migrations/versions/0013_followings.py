@@ -0,0 +1,65 @@
+"""Following snapshots and precomputed relations
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19 00:00:12
+
+Accounts can opt in to having their following list fetched too. followings
+holds the latest snapshot, and follow_relations the mutuals,
+not-following-back and new followings computed from it and the followers
+after each check.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0013"
+down_revision: Union[str, None] = "0012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "tracked_accounts",
+        sa.Column("track_following", sa.Boolean(), nullable=False, server_default=sa.text("false"))
+    )
+    op.add_column("tracked_accounts", sa.Column("following_checked_at", sa.DateTime(), nullable=True))
+
+    op.create_table(
+        "followings",
+        sa.Column(
+            "tracked_account_id", sa.Integer(),
+            sa.ForeignKey("tracked_accounts.id", ondelete="CASCADE"), primary_key=True
+        ),
+        sa.Column(
+            "instagram_user_id", sa.BigInteger(),
+            sa.ForeignKey("instagram_users.id"), primary_key=True, autoincrement=False
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+    )
+
+    op.create_table(
+        "follow_relations",
+        sa.Column(
+            "tracked_account_id", sa.Integer(),
+            sa.ForeignKey("tracked_accounts.id", ondelete="CASCADE"), primary_key=True
+        ),
+        sa.Column("kind", sa.String(length=24), primary_key=True),
+        sa.Column(
+            "instagram_user_id", sa.BigInteger(),
+            sa.ForeignKey("instagram_users.id"), primary_key=True, autoincrement=False
+        ),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("follow_relations")
+    op.drop_table("followings")
+
+    with op.batch_alter_table("tracked_accounts") as batch_op:
+        batch_op.drop_column("following_checked_at")
+        batch_op.drop_column("track_following")
@@ -1,5 +1,7 @@
 import os
 import sys
+import time
+from src.utils.timing import startup_timer
 from dotenv import load_dotenv
 from loguru import logger
 from telegram import Update, BotCommand
@@ -28,10 +30,22 @@ from src.handlers.tracking_handlers import (
     handle_confirm_follow,
     handle_stop_tracking,
     handle_stop_tracking_username,
+    handle_cancel_task,
     accounts_command,
-    notify_unfollowers,
+    digest_command,
     WAITING_FOR_USERNAME as TRACKING_WAITING_FOR_USERNAME
 )
+from src.handlers.history_handlers import (
+    history_command,
+    handle_history_page
+)
+from src.handlers.export_handlers import export_command
+from src.handlers.relation_handlers import (
+    following_command,
+    mutuals_command,
+    not_following_back_command,
+    new_followings_command
+)
 from src.handlers.admin_handlers import (
     set_tech_account_command,
     tech_account_username_input,
@@ -46,7 +60,12 @@ from src.handlers.admin_handlers import (
 
 # Load services
 from src.services.scheduler_service import SchedulerService
+from src.services.notification_service import NotificationService
+from src.services.container import services
 from src.db.models import init_db
+from src.db.async_session import dispose_async_engine
+
+startup_timer.record("imports", time.perf_counter() - startup_timer.started)
 
 # Load environment variables
 load_dotenv()
@@ -63,7 +82,14 @@ async def setup_commands(application: Application):
         BotCommand("start", "Start the bot"),
         BotCommand("help", "Show help message"),
         BotCommand("track", "Track a new Instagram account"),
-        BotCommand("accounts", "List your tracked accounts")
+        BotCommand("accounts", "List your tracked accounts"),
+        BotCommand("digest", "Get unfollowers as a periodic digest"),
+        BotCommand("history", "Browse past unfollowers of an account"),
+        BotCommand("export", "Download followers or unfollowers as a file"),
+        BotCommand("following", "Track who an account follows"),
+        BotCommand("mutuals", "Accounts that follow each other with an account"),
+        BotCommand("notfollowingback", "Accounts an account follows that don't follow back"),
+        BotCommand("newfollowings", "Accounts an account started following recently")
     ]
     
     await application.bot.set_my_commands(commands)
@@ -72,25 +98,47 @@ async def setup_commands(application: Application):
 def create_application():
     """Create and configure the bot application"""
     # Initialize database
-    init_db()
+    with startup_timer.phase("init_db"):
+        init_db()
+    
+    # Make sure the admin user exists; done once here instead of in every UserService
+    with startup_timer.phase("initialize_admin"):
+        services.users.initialize_admin()
+    
+    # Settings and admin roles are served from memory after this
+    with startup_timer.phase("load_settings_cache"):
+        services.settings.load()
     
     # Create application
-    application = Application.builder().token(TOKEN).build()
+    with startup_timer.phase("build_application"):
+        application = Application.builder().token(TOKEN).build()
     
     # Add handlers
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("accounts", accounts_command))
+    application.add_handler(CommandHandler("digest", digest_command))
+    application.add_handler(CommandHandler("history", history_command))
+    # Non-blocking so the Cancel button works while a large export is written
+    application.add_handler(CommandHandler("export", export_command, block=False))
     application.add_handler(CommandHandler("stats", stats_command))
+    # Non-blocking so the Cancel button works while the first following list loads
+    application.add_handler(CommandHandler("following", following_command, block=False))
+    application.add_handler(CommandHandler("mutuals", mutuals_command))
+    application.add_handler(CommandHandler("notfollowingback", not_following_back_command))
+    application.add_handler(CommandHandler("newfollowings", new_followings_command))
     
     # Track command conversation handler
     track_conv_handler = ConversationHandler(
         entry_points=[
-            CommandHandler("track", track_command),
+            # Non-blocking so other updates (including "Cancel") are handled while an account loads
+            CommandHandler("track", track_command, block=False),
             CallbackQueryHandler(handle_track_account_button, pattern="^track_account$")
         ],
         states={
-            TRACKING_WAITING_FOR_USERNAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, track_username_input)]
+            TRACKING_WAITING_FOR_USERNAME: [
+                MessageHandler(filters.TEXT & ~filters.COMMAND, track_username_input, block=False)
+            ]
         },
         fallbacks=[CommandHandler("cancel", help_command)]
     )
@@ -118,9 +166,11 @@ def create_application():
     
     # Callback query handlers
     application.add_handler(CallbackQueryHandler(handle_list_accounts_button, pattern="^list_accounts$"))
-    application.add_handler(CallbackQueryHandler(handle_confirm_follow, pattern="^confirm_follow:"))
+    application.add_handler(CallbackQueryHandler(handle_confirm_follow, pattern="^confirm_follow:", block=False))
+    application.add_handler(CallbackQueryHandler(handle_cancel_task, pattern="^cancel_task$"))
     application.add_handler(CallbackQueryHandler(handle_stop_tracking, pattern="^stop_tracking:"))
     application.add_handler(CallbackQueryHandler(handle_stop_tracking_username, pattern="^stop_tracking_username:"))
+    application.add_handler(CallbackQueryHandler(handle_history_page, pattern="^history:"))
     application.add_handler(CallbackQueryHandler(start_button_handler, pattern="^start$"))
     
     # Add error handler
@@ -134,19 +184,54 @@ def create_application():
 async def post_init(application: Application):
     """Tasks to run after bot initialization"""
     # Set up commands
-    await setup_commands(application)
+    with startup_timer.phase("setup_commands"):
+        await setup_commands(application)
+    
+    # Set up rate-limited notification delivery
+    with startup_timer.phase("start_notifier"):
+        notifier = NotificationService(application.bot)
+        await notifier.start()
     
-    # Set up scheduler for checking unfollowers
-    async def job_callback(result):
-        await notify_unfollowers(application.bot, result)
+    # Set up scheduler for checking unfollowers; alerts go through the outbox,
+    # so the callback only wakes the dispatcher up. Instagram logs in lazily on
+    # the first check, not here.
+    with startup_timer.phase("start_scheduler"):
+        scheduler = SchedulerService(application.bot, notifier.wake, services.tracking, services.users)
+        scheduler.start()
     
-    scheduler = SchedulerService(application.bot, job_callback)
-    scheduler.start()
+    # Pick up settings changed by other replicas, rescheduling checks if the interval changed
+    services.settings.add_listener(scheduler.update_check_interval)
+    services.settings.start()
     
-    # Store scheduler in application context for later access
+    # Store services in application context for later access
+    application.bot_data["notifier"] = notifier
     application.bot_data["scheduler"] = scheduler
     
     logger.info("Bot fully initialized")
+    
+    for name, seconds in services.timings.items():
+        startup_timer.record(f"build {name} service", seconds)
+    startup_timer.report()
+
+async def post_shutdown(application: Application):
+    """Tasks to run on bot shutdown"""
+    # Stop the scheduler so the leader lease is released for other replicas
+    scheduler = application.bot_data.get("scheduler")
+    if scheduler:
+        scheduler.stop()
+    
+    if services.is_built("settings"):
+        services.settings.stop()
+    
+    notifier = application.bot_data.get("notifier")
+    if notifier:
+        await notifier.stop()
+    
+    # Cancel account loads still running on the executor
+    if services.is_built("task_runner"):
+        services.task_runner.shutdown()
+    
+    await dispose_async_engine()
 
 def main():
     """Main function to start the bot"""
@@ -158,10 +243,12 @@ def main():
         sys.exit(1)
     
     # Create and run the application
-    application = create_application()
+    with startup_timer.phase("create_application"):
+        application = create_application()
     
     # Set post init callback
     application.post_init = post_init
+    application.post_shutdown = post_shutdown
     
     # Run the bot
     application.run_polling()
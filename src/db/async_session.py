@@ -0,0 +1,134 @@
+"""
+Async database sessions for Telegram handlers.
+
+Handlers run on the bot's event loop, so their reads go through an
+asyncio engine (aiosqlite for SQLite, asyncpg for Postgres) instead of
+blocking the loop. The scheduler and other threads keep using the sync
+sessions from src.db.session.
+"""
+import functools
+import os
+import threading
+from contextlib import asynccontextmanager
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from src.db.engine import get_database_url, engine_options, configure_engine
+from src.db.session import current_unit_of_work, begin_unit_of_work, end_unit_of_work, count_query
+
+# Async driver used for each sync backend
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+}
+
+# Persistent aiosqlite connections kept for handler reads
+SQLITE_ASYNC_POOL_SIZE = int(os.getenv("SQLITE_ASYNC_POOL_SIZE", "5"))
+
+_async_engine = None
+_session_factory = None
+_engine_lock = threading.Lock()
+
+def get_async_database_url(database_url=None):
+    """Rewrite the database URL to use the async driver for its backend"""
+    url = make_url(database_url or get_database_url())
+    backend = url.get_backend_name()
+
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend} databases")
+
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+def get_async_engine():
+    """The process-wide async engine, created on first use"""
+    global _async_engine, _session_factory
+
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                url = get_async_database_url()
+                options = engine_options(url)
+                if url.get_backend_name() == "sqlite":
+                    # aiosqlite defaults to NullPool, which opens a connection (and its
+                    # worker thread) and reruns every pragma for each session
+                    options.update(
+                        poolclass=AsyncAdaptedQueuePool,
+                        pool_size=SQLITE_ASYNC_POOL_SIZE,
+                        max_overflow=SQLITE_ASYNC_POOL_SIZE
+                    )
+                engine = create_async_engine(url, **options)
+                configure_engine(engine.sync_engine, url)
+                event.listen(engine.sync_engine, "before_cursor_execute", count_query)
+                _session_factory = async_sessionmaker(engine, expire_on_commit=False)
+                _async_engine = engine
+
+    return _async_engine
+
+@asynccontextmanager
+async def async_session_scope():
+    """Open an async session, rolling back on error and closing it afterwards.
+
+    Inside a unit of work the unit's async session is reused instead, and
+    only its transaction is ended afterwards.
+    """
+    get_async_engine()
+
+    unit = current_unit_of_work()
+    if unit is not None:
+        unit.session_requests += 1
+        if unit.async_session is None:
+            unit.async_session = _session_factory()
+            unit.sessions += 1
+
+        session = unit.async_session
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+        if session.in_transaction():
+            await session.commit()
+        return
+
+    async with _session_factory() as session:
+        try:
+            yield session
+        except Exception:
+            await session.rollback()
+            raise
+
+@asynccontextmanager
+async def async_unit_of_work(name):
+    """Async counterpart of src.db.session.unit_of_work for handlers"""
+    if current_unit_of_work() is not None:
+        yield current_unit_of_work()
+        return
+
+    unit, token = begin_unit_of_work(name)
+    try:
+        yield unit
+    finally:
+        end_unit_of_work(token)
+        unit.close()
+        if unit.async_session is not None:
+            await unit.async_session.close()
+        unit.log_stats()
+
+def unit_of_work_handler(handler):
+    """Run a Telegram handler inside its own unit of work"""
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        async with async_unit_of_work(handler.__name__):
+            return await handler(*args, **kwargs)
+
+    return wrapper
+
+async def dispose_async_engine():
+    """Close the async engine's pooled connections on shutdown"""
+    global _async_engine, _session_factory
+
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _session_factory = None
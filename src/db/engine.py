@@ -0,0 +1,82 @@
+"""
+Shared SQLAlchemy engine
+"""
+import os
+import threading
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+load_dotenv()
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_database_url():
+    """Database URL from the environment"""
+    return os.getenv("DATABASE_URL", "sqlite:///bot_data.db")
+
+def create_db_engine(database_url=None):
+    """Create an engine tuned for the database backend.
+
+    SQLite gets WAL journaling so the scheduler thread can write while
+    handlers read, plus a busy timeout instead of failing immediately with
+    "database is locked". Other backends get a sized, pre-pinged pool.
+    """
+    url = make_url(database_url or get_database_url())
+    engine = create_engine(url, **engine_options(url))
+    configure_engine(engine, url)
+    return engine
+
+def engine_options(url):
+    """Keyword arguments for create_engine/create_async_engine for this backend"""
+    if url.get_backend_name() == "sqlite":
+        busy_timeout_ms = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+        return {"connect_args": {"timeout": busy_timeout_ms / 1000, "check_same_thread": False}}
+
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800")),
+        "pool_pre_ping": True
+    }
+
+def configure_engine(engine, url):
+    """Attach per-connection setup; pass the sync_engine of an async engine"""
+    if url.get_backend_name() == "sqlite":
+        busy_timeout_ms = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+        event.listen(engine, "connect", _sqlite_pragmas(url, busy_timeout_ms))
+
+def _sqlite_pragmas(url, busy_timeout_ms):
+    """Build a connect listener that applies the SQLite pragmas"""
+    in_memory = url.database in (None, "", ":memory:")
+    mmap_size = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    cache_size_kb = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            if not in_memory:
+                cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            cursor.execute(f"PRAGMA busy_timeout={busy_timeout_ms}")
+            cursor.execute(f"PRAGMA mmap_size={mmap_size}")
+            # Negative cache_size is in KiB rather than pages
+            cursor.execute(f"PRAGMA cache_size=-{cache_size_kb}")
+            # Needed for ON DELETE CASCADE; SQLite leaves foreign keys off by default
+            cursor.execute("PRAGMA foreign_keys=ON")
+        finally:
+            cursor.close()
+
+    return on_connect
+
+def get_engine():
+    """The process-wide engine, created on first use"""
+    global _engine
+
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = create_db_engine()
+
+    return _engine
@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, create_engine
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, ForeignKey, DateTime, Date, Text, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import datetime
 import os
 from dotenv import load_dotenv
+from src.db.engine import get_engine
 
 load_dotenv()
 
@@ -27,56 +28,153 @@ class User(Base):
 
 class TrackedAccount(Base):
     __tablename__ = "tracked_accounts"
+    __table_args__ = (
+        # Accounts waiting to be purged don't block tracking the same username again
+        Index(
+            "uq_tracked_accounts_user_username", "user_id", "instagram_username",
+            unique=True,
+            sqlite_where=text("deleted_at IS NULL"),
+            postgresql_where=text("deleted_at IS NULL")
+        ),
+    )
     
     id = Column(Integer, primary_key=True)
     instagram_username = Column(String, nullable=False)
-    instagram_user_id = Column(String, nullable=True)
+    instagram_user_id = Column(BigInteger, nullable=True)
     is_private = Column(Boolean, default=False)
     follow_requested = Column(Boolean, default=False)
     last_check = Column(DateTime, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    deleted_at = Column(DateTime, nullable=True)  # Set when untracked; the rows are purged in the background
+    followers_hash = Column(BigInteger, nullable=True)  # Order-independent hash of the follower IDs, see src/utils/follower_hash.py
+    track_following = Column(Boolean, nullable=False, default=False, server_default=text("false"))  # Also fetch the accounts it follows
+    following_checked_at = Column(DateTime, nullable=True)  # Last following fetch; None means no snapshot yet
     
-    # Relationships
+    # Relationships; the database deletes followers and unfollowers with the account
     user = relationship("User", back_populates="tracked_accounts")
-    followers = relationship("Follower", back_populates="tracked_account", cascade="all, delete-orphan")
-    unfollowers = relationship("Unfollower", back_populates="tracked_account", cascade="all, delete-orphan")
+    followers = relationship("Follower", back_populates="tracked_account", cascade="all, delete-orphan", passive_deletes=True)
+    unfollowers = relationship("Unfollower", back_populates="tracked_account", cascade="all, delete-orphan", passive_deletes=True)
     
     def __repr__(self):
         return f"<TrackedAccount(id={self.id}, instagram_username={self.instagram_username})>"
 
 
+class InstagramUser(Base):
+    __tablename__ = "instagram_users"
+    
+    # Instagram's numeric pk; one row per person however many accounts they follow
+    id = Column(BigInteger, primary_key=True, autoincrement=False)
+    username = Column(String, nullable=True)
+    full_name = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<InstagramUser(id={self.id}, username={self.username})>"
+
+
 class Follower(Base):
     __tablename__ = "followers"
+    __table_args__ = (
+        Index("uq_followers_account_user", "tracked_account_id", "instagram_user_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True)
-    instagram_user_id = Column(String, nullable=False)
-    username = Column(String, nullable=True)
-    full_name = Column(String, nullable=True)
-    tracked_account_id = Column(Integer, ForeignKey("tracked_accounts.id"), nullable=False)
+    instagram_user_id = Column(BigInteger, ForeignKey("instagram_users.id"), nullable=False)
+    tracked_account_id = Column(Integer, ForeignKey("tracked_accounts.id", ondelete="CASCADE"), nullable=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     
     # Relationships
     tracked_account = relationship("TrackedAccount", back_populates="followers")
+    instagram_user = relationship("InstagramUser")
     
     def __repr__(self):
-        return f"<Follower(id={self.id}, username={self.username})>"
+        return f"<Follower(id={self.id}, instagram_user_id={self.instagram_user_id})>"
 
 
 class Unfollower(Base):
     __tablename__ = "unfollowers"
+    __table_args__ = (
+        Index("ix_unfollowers_account_time", "tracked_account_id", "unfollowed_at", "id"),
+    )
     
     id = Column(Integer, primary_key=True)
-    instagram_user_id = Column(String, nullable=False)
-    username = Column(String, nullable=True)
-    full_name = Column(String, nullable=True)
-    tracked_account_id = Column(Integer, ForeignKey("tracked_accounts.id"), nullable=False)
+    instagram_user_id = Column(BigInteger, ForeignKey("instagram_users.id"), nullable=False)
+    tracked_account_id = Column(Integer, ForeignKey("tracked_accounts.id", ondelete="CASCADE"), nullable=False)
     unfollowed_at = Column(DateTime, default=datetime.datetime.utcnow)
     
     # Relationships
     tracked_account = relationship("TrackedAccount", back_populates="unfollowers")
+    instagram_user = relationship("InstagramUser")
+    
+    def __repr__(self):
+        return f"<Unfollower(id={self.id}, instagram_user_id={self.instagram_user_id})>"
+
+
+class Following(Base):
+    __tablename__ = "followings"
+    
+    # Accounts the tracked account follows, kept only while track_following is on
+    tracked_account_id = Column(Integer, ForeignKey("tracked_accounts.id", ondelete="CASCADE"), primary_key=True)
+    instagram_user_id = Column(BigInteger, ForeignKey("instagram_users.id"), primary_key=True, autoincrement=False)
+    created_at = Column(DateTime, nullable=True)  # None for the first snapshot, whose start dates are unknown
+    
+    instagram_user = relationship("InstagramUser")
+    
+    def __repr__(self):
+        return f"<Following(tracked_account_id={self.tracked_account_id}, instagram_user_id={self.instagram_user_id})>"
+
+
+class FollowRelation(Base):
+    __tablename__ = "follow_relations"
+    
+    # Mutuals, not-following-back and new followings of an account, rebuilt after each check
+    tracked_account_id = Column(Integer, ForeignKey("tracked_accounts.id", ondelete="CASCADE"), primary_key=True)
+    kind = Column(String(24), primary_key=True)
+    instagram_user_id = Column(BigInteger, ForeignKey("instagram_users.id"), primary_key=True, autoincrement=False)
+    
+    def __repr__(self):
+        return f"<FollowRelation(tracked_account_id={self.tracked_account_id}, kind={self.kind}, instagram_user_id={self.instagram_user_id})>"
+
+
+class FollowerStaging(Base):
+    __tablename__ = "follower_staging"
+    
+    # IDs seen by the check in progress; diffed against followers in SQL, then cleared
+    tracked_account_id = Column(Integer, ForeignKey("tracked_accounts.id", ondelete="CASCADE"), primary_key=True)
+    instagram_user_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    
+    def __repr__(self):
+        return f"<FollowerStaging(tracked_account_id={self.tracked_account_id}, instagram_user_id={self.instagram_user_id})>"
+
+
+class FollowerSuspect(Base):
+    __tablename__ = "follower_suspects"
+    
+    # Followers missing from a fetch that looked truncated; kept until a later check confirms or clears them
+    tracked_account_id = Column(Integer, ForeignKey("tracked_accounts.id", ondelete="CASCADE"), primary_key=True)
+    instagram_user_id = Column(BigInteger, primary_key=True, autoincrement=False)
+    missing_since = Column(DateTime, nullable=False)
     
     def __repr__(self):
-        return f"<Unfollower(id={self.id}, username={self.username})>"
+        return f"<FollowerSuspect(tracked_account_id={self.tracked_account_id}, instagram_user_id={self.instagram_user_id})>"
+
+
+class FollowerDiff(Base):
+    __tablename__ = "follower_diffs"
+    
+    # A diff being applied in chunks; if the process dies, the next check resumes it from follower_staging
+    tracked_account_id = Column(Integer, ForeignKey("tracked_accounts.id", ondelete="CASCADE"), primary_key=True)
+    check_time = Column(DateTime, nullable=False)  # Stamped on every follower and unfollower row the diff writes
+    trusted = Column(Boolean, nullable=False)  # False: missing followers are quarantined, not removed
+    follower_count = Column(Integer, nullable=False)
+    added = Column(Integer, nullable=False, default=0)
+    removed = Column(Integer, nullable=False, default=0)
+    followers_hash = Column(BigInteger, nullable=True)  # Running hash; None means hash the result at the end
+    fetch_ms = Column(Integer, nullable=True)
+    api_calls = Column(Integer, nullable=True)
+    
+    def __repr__(self):
+        return f"<FollowerDiff(tracked_account_id={self.tracked_account_id}, added={self.added}, removed={self.removed})>"
 
 
 class Settings(Base):
@@ -90,9 +188,152 @@ class Settings(Base):
         return f"<Settings(key={self.key}, value={self.value})>"
 
 
+class UnfollowerArchive(Base):
+    __tablename__ = "unfollower_archives"
+    
+    tracked_account_id = Column(Integer, ForeignKey("tracked_accounts.id", ondelete="CASCADE"), primary_key=True)
+    month = Column(String(7), primary_key=True)  # YYYY-MM; one archive file per account and month
+    rows = Column(Integer, nullable=False, default=0)
+    first_at = Column(DateTime, nullable=True)
+    last_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<UnfollowerArchive(tracked_account_id={self.tracked_account_id}, month={self.month}, rows={self.rows})>"
+
+
+class BotStat(Base):
+    __tablename__ = "bot_stats"
+    
+    key = Column(String, primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)  # Maintained incrementally by the diff pipeline
+    
+    def __repr__(self):
+        return f"<BotStat(key={self.key}, value={self.value})>"
+
+
+class AccountStats(Base):
+    __tablename__ = "account_stats"
+    
+    tracked_account_id = Column(Integer, ForeignKey("tracked_accounts.id", ondelete="CASCADE"), primary_key=True)
+    follower_count = Column(Integer, nullable=False, default=0)
+    unfollower_count = Column(Integer, nullable=False, default=0)
+    checks = Column(Integer, nullable=False, default=0)
+    last_check_ms = Column(Integer, nullable=True)
+    last_fetch_ms = Column(Integer, nullable=True)
+    last_api_calls = Column(Integer, nullable=True)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<AccountStats(tracked_account_id={self.tracked_account_id}, follower_count={self.follower_count})>"
+
+
+class UnfollowDay(Base):
+    __tablename__ = "unfollow_days"
+    
+    day = Column(Date, primary_key=True)
+    unfollowers = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<UnfollowDay(day={self.day}, unfollowers={self.unfollowers})>"
+
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+    
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)  # Bumped on every change so other processes reload
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<CacheVersion(name={self.name}, version={self.version})>"
+
+
+class UserPreference(Base):
+    __tablename__ = "user_preferences"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    digest_minutes = Column(Integer, nullable=True)  # None means alerts are sent right after each check
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<UserPreference(user_id={self.user_id}, digest_minutes={self.digest_minutes})>"
+
+
+class SchedulerLease(Base):
+    __tablename__ = "scheduler_leases"
+    
+    name = Column(String, primary_key=True)
+    holder_id = Column(String, nullable=True)
+    fencing_token = Column(Integer, nullable=False, default=0)
+    expires_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<SchedulerLease(name={self.name}, holder_id={self.holder_id}, fencing_token={self.fencing_token})>"
+
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    __table_args__ = (
+        Index("ix_notification_outbox_due", "status", "next_attempt_at"),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    idempotency_key = Column(String, nullable=False, unique=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    tracked_account_id = Column(Integer, nullable=True)  # No FK so pending alerts survive untracking
+    instagram_username = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON list of unfollowers
+    status = Column(String, nullable=False, default="pending")  # pending, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, default=datetime.datetime.utcnow)
+    claim_token = Column(String, nullable=True)
+    claimed_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+    
+    def __repr__(self):
+        return f"<NotificationOutbox(id={self.id}, key={self.idempotency_key}, status={self.status})>"
+
+
 # Initialize database
 def init_db():
-    database_url = os.getenv("DATABASE_URL", "sqlite:///bot_data.db")
-    engine = create_engine(database_url)
-    Base.metadata.create_all(engine)
-    return engine 
\ No newline at end of file
+    """Bring the database schema up to date with Alembic migrations"""
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import inspect
+    
+    engine = get_engine()
+    
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    config = Config(os.path.join(root, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(root, "migrations"))
+    
+    sqlite = engine.dialect.name == "sqlite"
+    
+    with engine.connect() as connection:
+        # SQLite batch migrations copy and drop tables, which enforced foreign
+        # keys would block (or cascade); the pragma only works outside a transaction
+        if sqlite:
+            connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+            connection.commit()
+        
+        try:
+            with connection.begin():
+                config.attributes["connection"] = connection
+                
+                # Databases created with create_all before migrations existed match
+                # the initial revision; stamp them so only the later ones run
+                tables = set(inspect(connection).get_table_names())
+                if "users" in tables and "alembic_version" not in tables:
+                    command.stamp(config, "0001")
+                
+                command.upgrade(config, "head")
+        finally:
+            if sqlite:
+                connection.exec_driver_sql("PRAGMA foreign_keys=ON")
+                connection.commit()
+    
+    return engine
\ No newline at end of file
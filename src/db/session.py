@@ -1,26 +1,127 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from loguru import logger
+from sqlalchemy import event
 from sqlalchemy.orm import sessionmaker, scoped_session
-from sqlalchemy import create_engine
-import os
-from dotenv import load_dotenv
-from src.db.models import Base
+from src.db.engine import get_engine
 
-load_dotenv()
-
-database_url = os.getenv("DATABASE_URL", "sqlite:///bot_data.db")
-engine = create_engine(database_url)
-
-# Create tables if they don't exist
-Base.metadata.create_all(engine)
+# Tables are created and upgraded by init_db() through Alembic migrations
+engine = get_engine()
 
 # Create session factory
 session_factory = sessionmaker(bind=engine)
 Session = scoped_session(session_factory)
 
+_current_unit_of_work = ContextVar("unit_of_work", default=None)
+
+class UnitOfWork:
+    """One session shared by every service call made while handling a request.
+
+    Handlers open one per Telegram update and the checker one per account,
+    so nested service calls reuse a single session and the ORM objects they
+    return stay attached until the request is done. It also counts sessions
+    and queries so a request can be profiled.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.session = None
+        self.async_session = None
+        self.sessions = 0  # Sessions actually opened, sync and async
+        self.session_requests = 0  # get_session()/async_session_scope() calls served
+        self.queries = 0
+        self.cache = {}  # Lookups reused within the request, e.g. the user for a chat
+        self.started = time.perf_counter()
+
+    def get_session(self):
+        """The shared sync session, opened on first use"""
+        self.session_requests += 1
+        if self.session is None:
+            # Objects must stay usable after a service commits
+            self.session = session_factory(expire_on_commit=False)
+            self.sessions += 1
+        return self.session
+
+    def release(self, session):
+        """End the session's transaction so its connection goes back to the pool between calls"""
+        if session.in_transaction():
+            session.commit()
+
+    def close(self):
+        """Close the sync session; anything not committed is rolled back"""
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def stats(self):
+        """Counters for profiling"""
+        return {
+            "name": self.name,
+            "sessions": self.sessions,
+            "session_requests": self.session_requests,
+            "queries": self.queries,
+            "ms": (time.perf_counter() - self.started) * 1000
+        }
+
+    def log_stats(self):
+        stats = self.stats()
+        logger.debug(
+            f"Unit of work {stats['name']}: {stats['sessions']} sessions for "
+            f"{stats['session_requests']} requests, {stats['queries']} queries in {stats['ms']:.1f} ms"
+        )
+
+def current_unit_of_work():
+    """The unit of work open in this context, if any"""
+    return _current_unit_of_work.get()
+
+def begin_unit_of_work(name):
+    """Make a new unit of work current; returns it with the token to reset"""
+    unit = UnitOfWork(name)
+    return unit, _current_unit_of_work.set(unit)
+
+def end_unit_of_work(token):
+    _current_unit_of_work.reset(token)
+
+@contextmanager
+def unit_of_work(name):
+    """Share one session across the service calls in the with-block.
+
+    Nested calls join the unit of work that is already open.
+    """
+    if current_unit_of_work() is not None:
+        yield current_unit_of_work()
+        return
+
+    unit, token = begin_unit_of_work(name)
+    try:
+        yield unit
+    finally:
+        end_unit_of_work(token)
+        unit.close()
+        unit.log_stats()
+
 def get_session():
-    """Get a database session"""
+    """Get a database session, shared with the current unit of work if one is open"""
+    unit = current_unit_of_work()
+    if unit is not None:
+        return unit.get_session()
     return Session()
 
 def close_session(session):
     """Close a database session"""
+    unit = current_unit_of_work()
+    if unit is not None and session is unit.session:
+        # Closed when the unit of work ends
+        unit.release(session)
+        return
+
     session.close()
-    Session.remove() 
\ No newline at end of file
+    Session.remove()
+
+@event.listens_for(engine, "before_cursor_execute")
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    """Count statements against the current unit of work"""
+    unit = current_unit_of_work()
+    if unit is not None:
+        unit.queries += 1
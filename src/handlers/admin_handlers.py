@@ -1,30 +1,25 @@
+import asyncio
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
 from loguru import logger
-from src.services.user_service import UserService
-from src.services.tracking_service import TrackingService
+from src.services.container import services
+from src.db.async_session import unit_of_work_handler
 from src.services.instagram_service import InstagramService
 from src.services.scheduler_service import SchedulerService
-from src.db.session import get_session, close_session
-from src.db.models import User, TrackedAccount, Follower, Unfollower
 
 # States for conversation
 WAITING_FOR_USERNAME = 1
 WAITING_FOR_PASSWORD = 2
 WAITING_FOR_INTERVAL = 1
 
-# Initialize services
-user_service = UserService()
-tracking_service = TrackingService()
-instagram_service = InstagramService()
-
 # Admin command handlers
+@unit_of_work_handler
 async def set_tech_account_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler for /set_tech_account command - admin only"""
     chat_id = str(update.effective_chat.id)
     
     # Check if user is admin
-    if not user_service.is_admin(chat_id):
+    if not await services.users.is_admin_async(chat_id):
         await update.message.reply_text(
             "❌ This command is only available to administrators."
         )
@@ -39,6 +34,7 @@ async def set_tech_account_command(update: Update, context: ContextTypes.DEFAULT
     
     return WAITING_FOR_USERNAME
 
+@unit_of_work_handler
 async def tech_account_username_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler for username input in setting tech account"""
     username = update.message.text.strip()
@@ -55,6 +51,7 @@ async def tech_account_username_input(update: Update, context: ContextTypes.DEFA
     
     return WAITING_FOR_PASSWORD
 
+@unit_of_work_handler
 async def tech_account_password_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler for password input in setting tech account"""
     password = update.message.text.strip()
@@ -68,14 +65,15 @@ async def tech_account_password_input(update: Update, context: ContextTypes.DEFA
         f"⏳ Testing credentials for {username}..."
     )
     
-    # Test the credentials
+    # Test the credentials; the login and the writes run off the event loop
+    loop = asyncio.get_running_loop()
     temp_client = InstagramService()
-    login_success = temp_client.login(username, password)
+    login_success = await loop.run_in_executor(None, temp_client.login, username, password)
     
     if login_success:
         # Save credentials to database
-        user_service.update_settings("instagram_username", username)
-        user_service.update_settings("instagram_password", password)
+        await loop.run_in_executor(None, services.users.update_settings, "instagram_username", username)
+        await loop.run_in_executor(None, services.users.update_settings, "instagram_password", password)
         
         # Update the processing message
         await processing_message.edit_text(
@@ -92,19 +90,20 @@ async def tech_account_password_input(update: Update, context: ContextTypes.DEFA
     
     return ConversationHandler.END
 
+@unit_of_work_handler
 async def set_check_interval_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler for /set_check_interval command - admin only"""
     chat_id = str(update.effective_chat.id)
     
     # Check if user is admin
-    if not user_service.is_admin(chat_id):
+    if not await services.users.is_admin_async(chat_id):
         await update.message.reply_text(
             "❌ This command is only available to administrators."
         )
         return ConversationHandler.END
     
     # Get current interval
-    current_interval = user_service.get_setting("check_interval", "60")
+    current_interval = await services.users.get_setting_async("check_interval", "60")
     
     # Ask for new interval
     await update.message.reply_text(
@@ -116,6 +115,7 @@ async def set_check_interval_command(update: Update, context: ContextTypes.DEFAU
     
     return WAITING_FOR_INTERVAL
 
+@unit_of_work_handler
 async def check_interval_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler for interval input in setting check interval"""
     try:
@@ -128,8 +128,9 @@ async def check_interval_input(update: Update, context: ContextTypes.DEFAULT_TYP
             )
             return WAITING_FOR_INTERVAL
         
-        # Update setting
-        user_service.update_settings("check_interval", str(interval))
+        # Update setting off the event loop
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, services.users.update_settings, "check_interval", str(interval))
         
         # Update scheduler if provided
         scheduler = context.bot_data.get("scheduler")
@@ -150,36 +151,59 @@ async def check_interval_input(update: Update, context: ContextTypes.DEFAULT_TYP
         )
         return WAITING_FOR_INTERVAL
 
+@unit_of_work_handler
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler for /stats command - admin only"""
     chat_id = str(update.effective_chat.id)
     
     # Check if user is admin
-    if not user_service.is_admin(chat_id):
+    if not await services.users.is_admin_async(chat_id):
         await update.message.reply_text(
             "❌ This command is only available to administrators."
         )
         return
     
-    # Get stats from database
-    session = get_session()
+    # Recounting scans every table, so it only runs when asked for
+    if context.args and context.args[0].lower() == "rebuild":
+        await update.message.reply_text("⏳ Recounting statistics from all tables...")
+        loop = asyncio.get_running_loop()
+        if not await loop.run_in_executor(None, services.stats.rebuild):
+            await update.message.reply_text("❌ Failed to rebuild statistics.")
+            return
     
     try:
-        total_users = session.query(User).count()
-        total_tracked_accounts = session.query(TrackedAccount).count()
-        total_followers = session.query(Follower).count()
-        total_unfollowers = session.query(Unfollower).count()
+        # Counters are maintained by the diff pipeline; no table scans here
+        counters, per_day = await services.stats.get_summary_async()
         
         # Get tech account details
-        instagram_username = user_service.get_setting("instagram_username", "Not set")
-        check_interval = user_service.get_setting("check_interval", "60")
+        instagram_username = await services.users.get_setting_async("instagram_username", "Not set")
+        check_interval = await services.users.get_setting_async("check_interval", "60")
+        
+        checks = counters.get("checks", 0)
+        avg_fetch = counters.get("fetch_ms_total", 0) / checks / 1000 if checks else 0
+        avg_check = counters.get("check_ms_total", 0) / checks / 1000 if checks else 0
+        cycles = counters.get("cycles", 0)
+        recent = "\n".join(f"{day:%d.%m}: *{count}*" for day, count in per_day) or "none"
         
         stats_message = (
             "📊 *Bot Statistics*\n\n"
-            f"Total users: *{total_users}*\n"
-            f"Tracked accounts: *{total_tracked_accounts}*\n"
-            f"Total followers: *{total_followers}*\n"
-            f"Total unfollowers: *{total_unfollowers}*\n\n"
+            f"Total users: *{counters.get('users', 0)}*\n"
+            f"Tracked accounts: *{counters.get('tracked_accounts', 0)}*\n"
+            f"Total followers: *{counters.get('followers', 0)}*\n"
+            f"Total unfollowers: *{counters.get('unfollowers', 0) + counters.get('archived_unfollowers', 0)}* "
+            f"({counters.get('archived_unfollowers', 0)} archived)\n\n"
+            
+            "📉 *Unfollows per day*\n\n"
+            f"{recent}\n\n"
+            
+            "⚙️ *Checks*\n\n"
+            f"Check cycles: *{cycles}*\n"
+            f"Last cycle: *{counters.get('last_cycle_accounts', 0)}* accounts, "
+            f"*{counters.get('last_cycle_api_calls', 0)}* API calls, "
+            f"*{counters.get('last_cycle_ms', 0) / 1000:.1f} s*\n"
+            f"API calls per cycle: *{counters.get('api_calls', 0) / cycles if cycles else 0:.1f}*\n"
+            f"Average fetch time: *{avg_fetch:.1f} s*\n"
+            f"Average check time: *{avg_check:.1f} s*\n\n"
             
             "🔧 *Settings*\n\n"
             f"Technical account: *{instagram_username}*\n"
@@ -196,5 +220,3 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(
             "❌ Error fetching statistics."
         )
-    finally:
-        close_session(session) 
\ No newline at end of file
@@ -1,19 +1,18 @@
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from loguru import logger
-from src.services.user_service import UserService
-
-# Initialize services
-user_service = UserService()
+from src.services.container import services
+from src.db.async_session import unit_of_work_handler
 
 # Command handlers
+@unit_of_work_handler
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler for /start command"""
     chat_id = str(update.effective_chat.id)
     username = update.effective_user.username
     
     # Get or create user
-    user_service.get_or_create_user(chat_id, username)
+    await services.users.get_user_id_async(chat_id, username)
     
     # Create welcome message with inline keyboard
     keyboard = [
@@ -29,10 +28,11 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         reply_markup=reply_markup
     )
 
+@unit_of_work_handler
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler for /help command"""
     chat_id = str(update.effective_chat.id)
-    is_admin = user_service.is_admin(chat_id)
+    is_admin = await services.users.is_admin_async(chat_id)
     
     help_text = (
         "📋 *Instagram Unfriender Bot Help*\n\n"
@@ -40,7 +40,14 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "/start - Start the bot\n"
         "/help - Show this help message\n"
         "/track - Track a new Instagram account\n"
-        "/accounts - List your tracked accounts\n\n"
+        "/accounts - List your tracked accounts\n"
+        "/digest - Get unfollowers as a periodic digest\n"
+        "/history - Browse past unfollowers of an account\n"
+        "/export - Download followers or unfollowers as a file\n"
+        "/following - Track who an account follows\n"
+        "/mutuals - Accounts that follow each other with an account\n"
+        "/notfollowingback - Accounts an account follows that don't follow back\n"
+        "/newfollowings - Accounts an account started following recently\n\n"
         
         "*How it works:*\n"
         "1. Use /track to start tracking an account\n"
@@ -60,6 +67,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await update.message.reply_text(help_text, parse_mode="Markdown")
 
+@unit_of_work_handler
 async def unknown_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler for unknown commands"""
     await update.message.reply_text(
@@ -80,6 +88,7 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     # Log more detailed error
     logger.error(f"Exception in update {update}: {context.error}", exc_info=context.error)
 
+@unit_of_work_handler
 async def start_button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the 'Back to Main Menu' button click"""
     query = update.callback_query
@@ -0,0 +1,124 @@
+import datetime
+import os
+from telegram import Update
+from telegram.ext import ContextTypes
+from telegram.error import BadRequest
+from loguru import logger
+from src.services.container import services
+from src.services.export_service import EXPORT_FORMATS, EXPORT_KINDS
+from src.services.task_runner import OperationCancelled, TaskAlreadyRunning
+from src.db.async_session import unit_of_work_handler
+from src.handlers.tracking_handlers import CANCEL_TASK_KEYBOARD, TASK_BUSY_MESSAGE
+from src.utils.messages import md
+
+# Bots can't upload documents larger than this
+MAX_DOCUMENT_BYTES = 50 * 1024 * 1024
+
+EXPORT_USAGE = (
+    "📦 *Export*\n\n"
+    "`/export <account> [followers|unfollowers] [csv|ndjson]`\n\n"
+    "Sends the current followers (default) or the unfollower history as a gzip-compressed file."
+)
+
+def parse_export_args(args):
+    """Pick the account, kind and format out of /export arguments; raises ValueError"""
+    account, kind, fmt = None, "followers", "csv"
+
+    for arg in args:
+        value = arg.lower()
+        if value in EXPORT_KINDS:
+            kind = value
+        elif value in EXPORT_FORMATS:
+            fmt = value
+        elif account is None:
+            account = arg.lstrip("@")
+        else:
+            raise ValueError(f"Unexpected argument {arg}")
+
+    return account, kind, fmt
+
+def export_progress(message, title):
+    """Build a progress callback that shows how many rows were written"""
+    async def on_progress(progress):
+        try:
+            await message.edit_text(
+                f"{title}\n\nRows written: {progress.get('rows', 0)}",
+                reply_markup=CANCEL_TASK_KEYBOARD
+            )
+        except BadRequest as e:
+            logger.debug(f"Progress edit skipped: {e}")
+
+    return on_progress
+
+@unit_of_work_handler
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler for /export command - download followers or unfollowers as a file"""
+    chat_id = str(update.effective_chat.id)
+    user_id = await services.users.get_user_id_async(chat_id)
+
+    try:
+        account_name, kind, fmt = parse_export_args(context.args or [])
+    except ValueError:
+        await update.message.reply_text(EXPORT_USAGE, parse_mode="Markdown")
+        return
+
+    accounts = await services.tracking.get_tracked_accounts_async(user_id)
+    if not account_name:
+        if len(accounts) != 1:
+            names = ", ".join(f"@{md(account.instagram_username)}" for account in accounts) or "none"
+            await update.message.reply_text(f"{EXPORT_USAGE}\n\nYour accounts: {names}", parse_mode="Markdown")
+            return
+        account_name = accounts[0].instagram_username
+
+    account = next((a for a in accounts if a.instagram_username == account_name), None)
+    if not account:
+        await update.message.reply_text(f"❌ You are not tracking @{account_name}.")
+        return
+
+    if services.task_runner.is_running(chat_id):
+        await update.message.reply_text(TASK_BUSY_MESSAGE)
+        return
+
+    title = f"⏳ Exporting {kind} of @{account_name}..."
+    message = await update.message.reply_text(title, reply_markup=CANCEL_TASK_KEYBOARD)
+
+    # Written on the task executor so the event loop keeps serving updates
+    try:
+        path, rows = await services.task_runner.run(
+            chat_id,
+            services.export.export,
+            account.id,
+            kind,
+            fmt,
+            on_progress=export_progress(message, title)
+        )
+    except OperationCancelled:
+        await message.edit_text("⏹ Export cancelled.")
+        return
+    except TaskAlreadyRunning:
+        await message.edit_text(TASK_BUSY_MESSAGE)
+        return
+    except Exception as e:
+        logger.error(f"Export failed: {e}")
+        await message.edit_text("❌ Export failed. Please try again later.")
+        return
+
+    try:
+        size = os.path.getsize(path)
+        if size > MAX_DOCUMENT_BYTES:
+            await message.edit_text(
+                f"❌ The export is {size / 1024 / 1024:.0f} MB, over Telegram's 50 MB limit for bots."
+            )
+            return
+
+        filename = f"{account_name}-{kind}-{datetime.datetime.utcnow():%Y%m%d}.{fmt}.gz"
+        with open(path, "rb") as document:
+            await context.bot.send_document(
+                chat_id=update.effective_chat.id,
+                document=document,
+                filename=filename,
+                caption=f"{rows} {kind} of @{account_name}"
+            )
+        await message.delete()
+    finally:
+        os.remove(path)
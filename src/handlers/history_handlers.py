@@ -0,0 +1,169 @@
+import datetime
+import os
+import secrets
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+from loguru import logger
+from src.services.container import services
+from src.db.async_session import unit_of_work_handler
+from src.utils.messages import md, chunk_lines
+
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "20"))
+
+# Filters of recent /history queries kept per user; older buttons expire
+MAX_HISTORY_QUERIES = 5
+
+HISTORY_USAGE = (
+    "📜 *Unfollower history*\n\n"
+    "`/history <account> [from=YYYY-MM-DD] [to=YYYY-MM-DD] [prefix=abc]`\n\n"
+    "`from`/`to` limit the dates (both inclusive), `prefix` shows only usernames starting with it."
+)
+
+def encode_cursor(row):
+    """Pack a row's (unfollowed_at, id) position into callback data"""
+    micros = (row.unfollowed_at - datetime.datetime(1970, 1, 1)) // datetime.timedelta(microseconds=1)
+    return f"{micros}:{row.id}"
+
+def decode_cursor(micros, row_id):
+    return datetime.datetime(1970, 1, 1) + datetime.timedelta(microseconds=int(micros)), int(row_id)
+
+def parse_history_args(args):
+    """Split /history arguments into the account and its filters; raises ValueError"""
+    filters = {"account": None, "since": None, "until": None, "prefix": None}
+
+    for arg in args:
+        if "=" not in arg:
+            filters["account"] = arg.lstrip("@")
+            continue
+
+        key, value = arg.split("=", 1)
+        key = key.lower()
+        if key == "from":
+            filters["since"] = datetime.datetime.strptime(value, "%Y-%m-%d")
+        elif key == "to":
+            filters["until"] = datetime.datetime.strptime(value, "%Y-%m-%d") + datetime.timedelta(days=1)
+        elif key == "prefix":
+            filters["prefix"] = value.lstrip("@").lower()
+        else:
+            raise ValueError(f"Unknown filter {key}")
+
+    return filters
+
+def render_history_page(query, rows):
+    """Message text for one page of history"""
+    header = f"📜 *Unfollowers of @{md(query['account'])}*"
+    if query["prefix"]:
+        header += f", usernames starting with {md(query['prefix'])}"
+    if query["since"] or query["until"]:
+        since = f"{query['since']:%d.%m.%Y}" if query["since"] else "…"
+        until = f"{query['until'] - datetime.timedelta(days=1):%d.%m.%Y}" if query["until"] else "…"
+        header += f"\n{since} – {until}"
+    header += "\n\n"
+
+    if not rows:
+        return header + "No unfollowers found."
+
+    lines = []
+    for row in rows:
+        line = f"{row.unfollowed_at:%d.%m.%Y %H:%M} — *{md(row.username)}*"
+        if row.full_name:
+            line += f" ({md(row.full_name)})"
+        lines.append(line)
+
+    # A page always fits one message; cut it short if names are unusually long
+    return chunk_lines(header, lines)[0]
+
+def history_keyboard(query_id, rows, has_newer, has_older):
+    """Prev/next buttons carrying the keyset cursors of the page edges"""
+    buttons = []
+    if has_newer and rows:
+        buttons.append(InlineKeyboardButton("◀️ Newer", callback_data=f"history:{query_id}:a:{encode_cursor(rows[0])}"))
+    if has_older and rows:
+        buttons.append(InlineKeyboardButton("Older ▶️", callback_data=f"history:{query_id}:b:{encode_cursor(rows[-1])}"))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
+
+async def load_history_page(query, before=None, after=None):
+    """Fetch a page and work out which directions have more rows"""
+    rows, has_more = await services.tracking.get_unfollower_page_async(
+        query["account_id"],
+        HISTORY_PAGE_SIZE,
+        before=before,
+        after=after,
+        since=query["since"],
+        until=query["until"],
+        prefix=query["prefix"]
+    )
+
+    if after:
+        # Paging back to newer rows: the older side is where we came from
+        return rows, has_more, True
+    return rows, before is not None, has_more
+
+@unit_of_work_handler
+async def history_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler for /history command - browse past unfollowers of an account"""
+    chat_id = str(update.effective_chat.id)
+    user_id = await services.users.get_user_id_async(chat_id)
+
+    try:
+        filters = parse_history_args(context.args or [])
+    except ValueError:
+        await update.message.reply_text(HISTORY_USAGE, parse_mode="Markdown")
+        return
+
+    accounts = await services.tracking.get_tracked_accounts_async(user_id)
+    if not filters["account"]:
+        if len(accounts) != 1:
+            names = ", ".join(f"@{md(account.instagram_username)}" for account in accounts) or "none"
+            await update.message.reply_text(f"{HISTORY_USAGE}\n\nYour accounts: {names}", parse_mode="Markdown")
+            return
+        filters["account"] = accounts[0].instagram_username
+
+    account = next((a for a in accounts if a.instagram_username == filters["account"]), None)
+    if not account:
+        await update.message.reply_text(f"❌ You are not tracking @{filters['account']}.")
+        return
+
+    # Keep the filters server-side; buttons only carry a query ID and a cursor
+    query = dict(filters, account_id=account.id)
+    query_id = secrets.token_hex(4)
+    queries = context.user_data.setdefault("history_queries", {})
+    queries[query_id] = query
+    # Dicts keep insertion order, so the first keys are the oldest queries
+    for old_id in list(queries)[:-MAX_HISTORY_QUERIES]:
+        del queries[old_id]
+
+    rows, has_newer, has_older = await load_history_page(query)
+    await update.message.reply_text(
+        render_history_page(query, rows),
+        reply_markup=history_keyboard(query_id, rows, has_newer, has_older),
+        parse_mode="Markdown"
+    )
+
+@unit_of_work_handler
+async def handle_history_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the Newer/Older buttons of a /history message"""
+    callback = update.callback_query
+    await callback.answer()
+
+    _, query_id, direction, micros, row_id = callback.data.split(":")
+    query = context.user_data.get("history_queries", {}).get(query_id)
+    if not query:
+        await callback.edit_message_reply_markup(reply_markup=None)
+        await callback.message.reply_text("⌛ This history view has expired. Run /history again.")
+        return
+
+    cursor = decode_cursor(micros, row_id)
+    if direction == "a":
+        rows, has_newer, has_older = await load_history_page(query, after=cursor)
+    else:
+        rows, has_newer, has_older = await load_history_page(query, before=cursor)
+
+    try:
+        await callback.edit_message_text(
+            render_history_page(query, rows),
+            reply_markup=history_keyboard(query_id, rows, has_newer, has_older),
+            parse_mode="Markdown"
+        )
+    except Exception as e:
+        logger.warning(f"Failed to show history page: {e}")
@@ -0,0 +1,198 @@
+import asyncio
+import os
+from telegram import Update
+from telegram.ext import ContextTypes
+from telegram.error import BadRequest
+from loguru import logger
+from src.services.container import services
+from src.services.relation_service import NEW_FOLLOWING_DAYS
+from src.services.task_runner import TaskAlreadyRunning
+from src.db.async_session import unit_of_work_handler
+from src.handlers.tracking_handlers import CANCEL_TASK_KEYBOARD, TASK_BUSY_MESSAGE
+from src.utils.messages import md, chunk_lines
+
+# Names listed per relation command; the header always shows the full count
+RELATION_LIST_LIMIT = int(os.getenv("RELATION_LIST_LIMIT", "300"))
+
+FOLLOWING_USAGE = (
+    "👥 *Following tracking*\n\n"
+    "`/following <account> on|off`\n\n"
+    "With it on, each check also fetches who the account follows, and "
+    "/mutuals, /notfollowingback and /newfollowings list the results."
+)
+
+RELATION_TITLES = {
+    "mutual": "🤝 *Mutuals of @{account}*",
+    "not_following_back": "🚫 *Not following @{account} back*",
+    "new_following": "🆕 *Followed by @{account} in the last {days} days*"
+}
+
+def parse_following_args(args):
+    """Pick the account and on/off out of /following arguments; raises ValueError"""
+    account, enabled = None, None
+
+    for arg in args:
+        value = arg.lower()
+        if value in ("on", "off"):
+            enabled = value == "on"
+        elif account is None:
+            account = arg.lstrip("@")
+        else:
+            raise ValueError(f"Unexpected argument {arg}")
+
+    return account, enabled
+
+async def find_account(update, user_id, account_name, usage):
+    """The user's tracked account by name, or the only one if no name was given
+
+    Replies with the usage or an error and returns None if there isn't one.
+    """
+    accounts = await services.tracking.get_tracked_accounts_async(user_id)
+    if not account_name:
+        if len(accounts) != 1:
+            names = ", ".join(f"@{md(account.instagram_username)}" for account in accounts) or "none"
+            await update.message.reply_text(f"{usage}\n\nYour accounts: {names}", parse_mode="Markdown")
+            return None
+        return accounts[0]
+
+    account = next((a for a in accounts if a.instagram_username == account_name), None)
+    if not account:
+        await update.message.reply_text(f"❌ You are not tracking @{account_name}.")
+    return account
+
+def following_progress(message, title):
+    """Build a progress callback that shows how much of the following list was fetched"""
+    async def on_progress(progress):
+        try:
+            await message.edit_text(
+                f"{title}\n\n"
+                f"Pages fetched: {progress.get('pages', 0)}\n"
+                f"Following so far: {progress.get('following', 0)}",
+                reply_markup=CANCEL_TASK_KEYBOARD
+            )
+        except BadRequest as e:
+            logger.debug(f"Progress edit skipped: {e}")
+
+    return on_progress
+
+@unit_of_work_handler
+async def following_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler for /following command - turn tracking of an account's following list on or off"""
+    chat_id = str(update.effective_chat.id)
+    user_id = await services.users.get_user_id_async(chat_id)
+
+    try:
+        account_name, enabled = parse_following_args(context.args or [])
+    except ValueError:
+        await update.message.reply_text(FOLLOWING_USAGE, parse_mode="Markdown")
+        return
+
+    account = await find_account(update, user_id, account_name, FOLLOWING_USAGE)
+    if not account:
+        return
+
+    if enabled is None:
+        state = "*on*" if account.track_following else "*off*"
+        await update.message.reply_text(
+            f"👥 Following tracking for @{md(account.instagram_username)} is {state}.\n\n{FOLLOWING_USAGE}",
+            parse_mode="Markdown"
+        )
+        return
+
+    if not enabled:
+        loop = asyncio.get_running_loop()
+        success, message = await loop.run_in_executor(
+            None, services.tracking.set_following_tracking, user_id, account.id, False
+        )
+        await update.message.reply_text(f"✅ {message}" if success else f"❌ {message}")
+        return
+
+    if services.task_runner.is_running(chat_id):
+        await update.message.reply_text(TASK_BUSY_MESSAGE)
+        return
+
+    title = f"⏳ Fetching who @{account.instagram_username} follows..."
+    processing_message = await update.message.reply_text(title, reply_markup=CANCEL_TASK_KEYBOARD)
+
+    # The first snapshot is fetched off the event loop, like /track
+    try:
+        success, message = await services.task_runner.run(
+            chat_id,
+            services.tracking.set_following_tracking,
+            user_id,
+            account.id,
+            True,
+            on_progress=following_progress(processing_message, title)
+        )
+    except TaskAlreadyRunning:
+        await processing_message.edit_text(TASK_BUSY_MESSAGE)
+        return
+
+    if success:
+        await processing_message.edit_text(
+            f"✅ {message}.\n\nUse /mutuals, /notfollowingback and /newfollowings to see the results."
+        )
+    else:
+        await processing_message.edit_text(f"❌ {message}")
+
+async def show_relation(update: Update, context: ContextTypes.DEFAULT_TYPE, kind, command):
+    """Reply with one precomputed relation of an account"""
+    chat_id = str(update.effective_chat.id)
+    user_id = await services.users.get_user_id_async(chat_id)
+    usage = f"`/{command} <account>`"
+
+    args = context.args or []
+    if len(args) > 1:
+        await update.message.reply_text(usage, parse_mode="Markdown")
+        return
+
+    account = await find_account(update, user_id, args[0].lstrip("@") if args else None, usage)
+    if not account:
+        return
+
+    if not account.track_following:
+        await update.message.reply_text(
+            f"ℹ️ The following list of @{md(account.instagram_username)} isn't tracked. "
+            f"Turn it on with `/following {md(account.instagram_username)} on`.",
+            parse_mode="Markdown"
+        )
+        return
+
+    rows, total = await services.relations.get_relation_async(account.id, kind, RELATION_LIST_LIMIT)
+
+    header = RELATION_TITLES[kind].format(account=md(account.instagram_username), days=NEW_FOLLOWING_DAYS)
+    header += f": {total}"
+    if account.following_checked_at:
+        header += f"\nAs of {account.following_checked_at:%d.%m.%Y %H:%M} UTC"
+    header += "\n\n"
+
+    if not rows:
+        await update.message.reply_text(header + "Nobody.", parse_mode="Markdown")
+        return
+
+    lines = []
+    for idx, row in enumerate(rows, 1):
+        line = f"{idx}. *{md(row.username)}*"
+        if row.full_name:
+            line += f" ({md(row.full_name)})"
+        lines.append(line)
+    if total > len(rows):
+        lines.append(f"…and {total - len(rows)} more")
+
+    for chunk in chunk_lines(header, lines):
+        await update.message.reply_text(chunk, parse_mode="Markdown")
+
+@unit_of_work_handler
+async def mutuals_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler for /mutuals command - accounts that follow each other with the tracked account"""
+    await show_relation(update, context, "mutual", "mutuals")
+
+@unit_of_work_handler
+async def not_following_back_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler for /notfollowingback command - accounts the tracked account follows that don't follow it"""
+    await show_relation(update, context, "not_following_back", "notfollowingback")
+
+@unit_of_work_handler
+async def new_followings_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler for /newfollowings command - accounts the tracked account started following recently"""
+    await show_relation(update, context, "new_following", "newfollowings")
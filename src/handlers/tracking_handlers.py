@@ -1,17 +1,41 @@
+import asyncio
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes, ConversationHandler
+from telegram.error import BadRequest
 from loguru import logger
-from src.services.user_service import UserService
-from src.services.tracking_service import TrackingService
+from src.services.container import services
+from src.services.task_runner import TaskAlreadyRunning
+from src.db.async_session import unit_of_work_handler
 
 # States for conversation
 WAITING_FOR_USERNAME = 1
 
-# Initialize services
-user_service = UserService()
-tracking_service = TrackingService()
+# Allowed digest periods (15 minutes to 7 days)
+MIN_DIGEST_MINUTES = 15
+MAX_DIGEST_MINUTES = 7 * 24 * 60
+
+TASK_BUSY_MESSAGE = "⏳ Please wait until your previous request finishes, or cancel it."
+
+CANCEL_TASK_KEYBOARD = InlineKeyboardMarkup([[InlineKeyboardButton("✖️ Cancel", callback_data="cancel_task")]])
+
+def progress_editor(message, title):
+    """Build a progress callback that edits the processing message"""
+    async def on_progress(progress):
+        try:
+            await message.edit_text(
+                f"{title}\n\n"
+                f"Pages fetched: {progress.get('pages', 0)}\n"
+                f"Followers so far: {progress.get('followers', 0)}",
+                reply_markup=CANCEL_TASK_KEYBOARD
+            )
+        except BadRequest as e:
+            # Edits with unchanged text are rejected; progress is best effort
+            logger.debug(f"Progress edit skipped: {e}")
+    
+    return on_progress
 
 # Command handlers
+@unit_of_work_handler
 async def track_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler for /track command - start tracking a new account"""
     # Check if command has arguments
@@ -26,6 +50,7 @@ async def track_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return WAITING_FOR_USERNAME
 
+@unit_of_work_handler
 async def track_username_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler for username input in tracking conversation"""
     instagram_username = update.message.text.strip()
@@ -40,18 +65,32 @@ async def handle_track_username(update: Update, context: ContextTypes.DEFAULT_TY
         instagram_username = instagram_username[1:]
     
     # Get user ID
-    user = user_service.get_or_create_user(chat_id)
-    if not user:
+    user_id = await services.users.get_user_id_async(chat_id)
+    if not user_id:
         await update.message.reply_text("❌ Failed to retrieve your user information. Please try again.")
         return ConversationHandler.END
     
+    if services.task_runner.is_running(chat_id):
+        await update.message.reply_text(TASK_BUSY_MESSAGE)
+        return ConversationHandler.END
+    
     # Send processing message
-    processing_message = await update.message.reply_text(
-        f"⏳ Processing your request to track @{instagram_username}..."
-    )
+    title = f"⏳ Processing your request to track @{instagram_username}..."
+    processing_message = await update.message.reply_text(title, reply_markup=CANCEL_TASK_KEYBOARD)
     
-    # Start tracking
-    success, message = tracking_service.start_tracking(user.id, instagram_username)
+    # Start tracking off the event loop; it logs in and downloads all followers
+    try:
+        success, message = await services.task_runner.run(
+            chat_id,
+            services.tracking.start_tracking,
+            user_id,
+            instagram_username,
+            on_progress=progress_editor(processing_message, title)
+        )
+    except TaskAlreadyRunning:
+        # Another update started a task while the processing message was sent
+        await processing_message.edit_text(TASK_BUSY_MESSAGE)
+        return ConversationHandler.END
     
     # Edit the processing message with the result
     if success:
@@ -85,6 +124,7 @@ async def handle_track_username(update: Update, context: ContextTypes.DEFAULT_TY
     
     return ConversationHandler.END
 
+@unit_of_work_handler
 async def handle_confirm_follow(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle confirmation that a follow request was accepted"""
     query = update.callback_query
@@ -95,15 +135,10 @@ async def handle_confirm_follow(update: Update, context: ContextTypes.DEFAULT_TY
     instagram_username = callback_data.split(':')[1]
     
     chat_id = str(update.effective_chat.id)
-    user = user_service.get_or_create_user(chat_id)
+    user_id = await services.users.get_user_id_async(chat_id)
     
     # Find the tracked account
-    session = get_session()
-    tracked_account = session.query(TrackedAccount).filter_by(
-        user_id=user.id,
-        instagram_username=instagram_username
-    ).first()
-    close_session(session)
+    tracked_account = await services.tracking.get_tracked_account_async(user_id, instagram_username)
     
     if not tracked_account:
         await query.edit_message_text(
@@ -111,13 +146,25 @@ async def handle_confirm_follow(update: Update, context: ContextTypes.DEFAULT_TY
         )
         return
     
+    if services.task_runner.is_running(chat_id):
+        await query.edit_message_text(TASK_BUSY_MESSAGE)
+        return
+    
     # Update the message to show processing
-    await query.edit_message_text(
-        f"⏳ Confirming follow for @{instagram_username} and loading initial followers..."
-    )
+    title = f"⏳ Confirming follow for @{instagram_username} and loading initial followers..."
+    await query.edit_message_text(title, reply_markup=CANCEL_TASK_KEYBOARD)
     
-    # Process the confirmation
-    success, message = tracking_service.confirm_follow_accepted(tracked_account.id)
+    # Process the confirmation off the event loop
+    try:
+        success, message = await services.task_runner.run(
+            chat_id,
+            services.tracking.confirm_follow_accepted,
+            tracked_account.id,
+            on_progress=progress_editor(query.message, title)
+        )
+    except TaskAlreadyRunning:
+        await query.edit_message_text(TASK_BUSY_MESSAGE)
+        return
     
     if success:
         await query.edit_message_text(
@@ -137,13 +184,14 @@ async def handle_confirm_follow(update: Update, context: ContextTypes.DEFAULT_TY
             reply_markup=reply_markup
         )
 
+@unit_of_work_handler
 async def accounts_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handler for /accounts command - show tracked accounts"""
     chat_id = str(update.effective_chat.id)
-    user = user_service.get_or_create_user(chat_id)
+    user_id = await services.users.get_user_id_async(chat_id)
     
     # Get tracked accounts
-    tracked_accounts = tracking_service.get_tracked_accounts(user.id)
+    tracked_accounts = await services.tracking.get_tracked_accounts_async(user_id)
     
     if not tracked_accounts or len(tracked_accounts) == 0:
         await update.message.reply_text(
@@ -174,6 +222,7 @@ async def accounts_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode="Markdown"
     )
 
+@unit_of_work_handler
 async def handle_stop_tracking(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle stopping tracking for an account"""
     query = update.callback_query
@@ -184,10 +233,11 @@ async def handle_stop_tracking(update: Update, context: ContextTypes.DEFAULT_TYP
     account_id = int(callback_data.split(':')[1])
     
     chat_id = str(update.effective_chat.id)
-    user = user_service.get_or_create_user(chat_id)
+    user_id = await services.users.get_user_id_async(chat_id)
     
-    # Stop tracking
-    success, message = tracking_service.stop_tracking(user.id, account_id)
+    # Stop tracking; a write, so it runs off the event loop
+    loop = asyncio.get_running_loop()
+    success, message = await loop.run_in_executor(None, services.tracking.stop_tracking, user_id, account_id)
     
     if success:
         await query.edit_message_text(
@@ -200,7 +250,21 @@ async def handle_stop_tracking(update: Update, context: ContextTypes.DEFAULT_TYP
             f"Reason: {message}"
         )
 
+@unit_of_work_handler
+async def handle_cancel_task(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the 'Cancel' button on a running request"""
+    query = update.callback_query
+    await query.answer()
+    
+    chat_id = str(update.effective_chat.id)
+    
+    if services.task_runner.cancel(chat_id):
+        await query.edit_message_text("⏹ Cancelling your request...")
+    else:
+        await query.edit_message_text("Nothing to cancel, the request has already finished.")
+
 # Callback for handling tracking account button
+@unit_of_work_handler
 async def handle_track_account_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the 'Track Account' button click"""
     query = update.callback_query
@@ -213,6 +277,7 @@ async def handle_track_account_button(update: Update, context: ContextTypes.DEFA
     return WAITING_FOR_USERNAME
 
 # Callback for handling list accounts button
+@unit_of_work_handler
 async def handle_list_accounts_button(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the 'My Tracked Accounts' button click"""
     query = update.callback_query
@@ -220,10 +285,10 @@ async def handle_list_accounts_button(update: Update, context: ContextTypes.DEFA
     
     # Get user ID from chat
     chat_id = str(update.effective_chat.id)
-    user = user_service.get_or_create_user(chat_id)
+    user_id = await services.users.get_user_id_async(chat_id)
     
     # Get tracked accounts
-    tracked_accounts = tracking_service.get_tracked_accounts(user.id)
+    tracked_accounts = await services.tracking.get_tracked_accounts_async(user_id)
     
     if not tracked_accounts or len(tracked_accounts) == 0:
         await query.edit_message_text(
@@ -258,46 +323,7 @@ async def handle_list_accounts_button(update: Update, context: ContextTypes.DEFA
         parse_mode="Markdown"
     )
 
-# Handle unfollower notifications from scheduler
-async def notify_unfollowers(bot, result):
-    """Send notifications about unfollowers"""
-    try:
-        user_id = result["user_id"]
-        instagram_username = result["instagram_username"]
-        unfollowers = result["unfollowers"]
-        
-        # Get user's chat_id
-        session = get_session()
-        user = session.query(User).filter_by(id=user_id).first()
-        close_session(session)
-        
-        if not user:
-            logger.error(f"User not found for ID: {user_id}")
-            return
-        
-        # Generate message
-        message = f"🔔 *Unfollower Alert for @{instagram_username}*\n\n"
-        
-        if len(unfollowers) == 1:
-            unfollower = unfollowers[0]
-            message += f"*{unfollower['username']}* ({unfollower['full_name']}) has unfollowed you."
-        else:
-            message += f"*{len(unfollowers)} people* have unfollowed you:\n\n"
-            for idx, unfollower in enumerate(unfollowers, 1):
-                message += f"{idx}. *{unfollower['username']}* ({unfollower['full_name']})\n"
-        
-        # Send notification
-        await bot.send_message(
-            chat_id=user.chat_id,
-            text=message,
-            parse_mode="Markdown"
-        )
-        
-        logger.info(f"Sent unfollower notification to user {user.chat_id} for account {instagram_username}")
-        
-    except Exception as e:
-        logger.error(f"Error sending unfollower notification: {e}")
-
+@unit_of_work_handler
 async def handle_stop_tracking_username(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle stopping tracking by username"""
     query = update.callback_query
@@ -308,21 +334,17 @@ async def handle_stop_tracking_username(update: Update, context: ContextTypes.DE
     instagram_username = callback_data.split(':')[1]
     
     chat_id = str(update.effective_chat.id)
-    user = user_service.get_or_create_user(chat_id)
+    user_id = await services.users.get_user_id_async(chat_id)
     
     # Get account ID by username
-    session = get_session()
-    tracked_account = session.query(TrackedAccount).filter_by(
-        user_id=user.id,
-        instagram_username=instagram_username
-    ).first()
+    tracked_account = await services.tracking.get_tracked_account_async(user_id, instagram_username)
     
     if tracked_account:
         account_id = tracked_account.id
-        close_session(session)
         
-        # Stop tracking
-        success, message = tracking_service.stop_tracking(user.id, account_id)
+        # Stop tracking; a write, so it runs off the event loop
+        loop = asyncio.get_running_loop()
+        success, message = await loop.run_in_executor(None, services.tracking.stop_tracking, user_id, account_id)
         
         if success:
             await query.edit_message_text(
@@ -334,10 +356,53 @@ async def handle_stop_tracking_username(update: Update, context: ContextTypes.DE
                 f"Причина: {message}"
             )
     else:
-        close_session(session)
         await query.edit_message_text(
             f"❌ Аккаунт @{instagram_username} не найден в списке отслеживаемых."
         )
 
-from src.db.models import TrackedAccount, User
-from src.db.session import get_session, close_session 
\ No newline at end of file
+@unit_of_work_handler
+async def digest_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handler for /digest command - switch between immediate alerts and a periodic digest"""
+    chat_id = str(update.effective_chat.id)
+    user_id = await services.users.get_user_id_async(chat_id)
+    
+    if not context.args:
+        current = await services.users.get_digest_minutes_async(user_id)
+        mode = f"digest every *{current} minutes*" if current else "*immediate alerts*"
+        await update.message.reply_text(
+            f"📬 You currently receive {mode}.\n\n"
+            "Use `/digest <minutes>` to collect unfollowers into one message per period, "
+            "or `/digest off` to get alerts right after each check.",
+            parse_mode="Markdown"
+        )
+        return
+    
+    argument = context.args[0].strip().lower()
+    
+    if argument in ("off", "0"):
+        minutes = None
+    else:
+        try:
+            minutes = int(argument)
+        except ValueError:
+            await update.message.reply_text("❌ Please enter the digest period in minutes, or `off`.", parse_mode="Markdown")
+            return
+        
+        if minutes < MIN_DIGEST_MINUTES or minutes > MAX_DIGEST_MINUTES:
+            await update.message.reply_text(
+                f"❌ The digest period must be between {MIN_DIGEST_MINUTES} and {MAX_DIGEST_MINUTES} minutes."
+            )
+            return
+    
+    loop = asyncio.get_running_loop()
+    if not await loop.run_in_executor(None, services.users.set_digest_minutes, user_id, minutes):
+        await update.message.reply_text("❌ Failed to update your notification settings. Please try again.")
+        return
+    
+    if minutes:
+        await update.message.reply_text(
+            f"✅ Unfollowers will be collected and sent as a digest every *{minutes} minutes*.",
+            parse_mode="Markdown"
+        )
+    else:
+        await update.message.reply_text("✅ Digest mode is off. You will get alerts right after each check.")
\ No newline at end of file
@@ -0,0 +1,261 @@
+import collections
+import datetime
+import gzip
+import json
+import os
+import shutil
+from loguru import logger
+from sqlalchemy import select
+from src.db.session import get_session, close_session
+from src.db.models import TrackedAccount, Unfollower, UnfollowerArchive, InstagramUser
+from src.services.stats_service import StatsService
+
+# Unfollower row as read back from an archive file; same attributes /history uses
+ArchivedUnfollower = collections.namedtuple(
+    "ArchivedUnfollower",
+    ["id", "instagram_user_id", "username", "full_name", "unfollowed_at"]
+)
+
+class ArchiveService:
+    """Moves old unfollower rows out of the database into monthly archive files.
+
+    Each account gets one gzip NDJSON file per month under ARCHIVE_DIR, and
+    the unfollower_archives table records which files exist. Records keep
+    the names as they were when archived. A chunk is
+    appended (as a new gzip member) and fsynced before its rows are deleted,
+    so a crash can at worst leave a row both archived and in the table; the
+    next run deletes it without writing or counting it again, and readers
+    drop any duplicate by id.
+    """
+
+    def __init__(self, retention_days=None, archive_dir=None, chunk_size=None):
+        retention_days = os.getenv("UNFOLLOWER_RETENTION_DAYS", "365") if retention_days is None else retention_days
+        self.retention_days = int(retention_days)  # 0 keeps every row in the database
+        self.archive_dir = archive_dir or os.getenv("ARCHIVE_DIR", "archives")
+        self.chunk_size = chunk_size or int(os.getenv("ARCHIVE_CHUNK_SIZE", "5000"))
+
+    def path_for(self, tracked_account_id, month):
+        return os.path.join(self.archive_dir, "unfollowers", f"account={tracked_account_id}", f"{month}.ndjson.gz")
+
+    def compact(self, should_continue=None):
+        """Archive unfollower rows older than the retention period; returns rows moved"""
+        if not self.retention_days:
+            return 0
+
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=self.retention_days)
+        session = get_session()
+        moved = 0
+
+        try:
+            account_ids = [row.id for row in session.query(TrackedAccount.id).filter_by(deleted_at=None)]
+            close_session(session)
+
+            for account_id in account_ids:
+                archived_ids = {}  # month -> IDs already in that file, read once per run
+                while True:
+                    if should_continue and not should_continue():
+                        logger.warning("Stopping unfollower archiving early")
+                        return moved
+
+                    archived = self._archive_chunk(account_id, cutoff, archived_ids)
+                    moved += archived
+                    if archived < self.chunk_size:
+                        break
+
+            if moved:
+                logger.info(f"Archived {moved} unfollower rows older than {cutoff:%Y-%m-%d}")
+            return moved
+        except Exception as e:
+            logger.error(f"Error archiving unfollowers: {e}")
+            return moved
+        finally:
+            close_session(session)
+
+    def _archive_chunk(self, account_id, cutoff, archived_ids=None):
+        """Move the oldest chunk of an account's expired rows; returns how many moved
+
+        Rows whose IDs are already in the month's file, left there by a run
+        that crashed before deleting them, are not written again, and the
+        month's row count is the number of distinct IDs in its file.
+        """
+        archived_ids = {} if archived_ids is None else archived_ids
+        session = get_session()
+
+        try:
+            # Served by ix_unfollowers_account_time
+            rows = session.execute(
+                select(
+                    Unfollower.id, Unfollower.instagram_user_id, InstagramUser.username,
+                    InstagramUser.full_name, Unfollower.unfollowed_at
+                )
+                .join(InstagramUser, InstagramUser.id == Unfollower.instagram_user_id)
+                .where(Unfollower.tracked_account_id == account_id, Unfollower.unfollowed_at < cutoff)
+                .order_by(Unfollower.unfollowed_at, Unfollower.id)
+                .limit(self.chunk_size)
+            ).all()
+
+            if not rows:
+                return 0
+
+            by_month = collections.defaultdict(list)
+            for row in rows:
+                by_month[f"{row.unfollowed_at:%Y-%m}"].append(row)
+
+            for month, month_rows in by_month.items():
+                path = self.path_for(account_id, month)
+                known = archived_ids.get(month)
+                if known is None:
+                    known = archived_ids[month] = self._archived_ids(path)
+
+                new_rows = [row for row in month_rows if row.id not in known]
+                if new_rows:
+                    self._append(path, new_rows)
+                    known.update(row.id for row in new_rows)
+
+                archive = session.get(UnfollowerArchive, (account_id, month))
+                if archive is None:
+                    archive = UnfollowerArchive(tracked_account_id=account_id, month=month, rows=0)
+                    session.add(archive)
+                # Distinct IDs in the file, whether or not an earlier attempt committed its count
+                archive.rows = len(known)
+                archive.first_at = min(filter(None, [archive.first_at, month_rows[0].unfollowed_at]))
+                archive.last_at = max(filter(None, [archive.last_at, month_rows[-1].unfollowed_at]))
+
+            session.query(Unfollower).filter(
+                Unfollower.id.in_([row.id for row in rows])
+            ).delete(synchronize_session=False)
+            StatsService.increment(session, unfollowers=-len(rows), archived_unfollowers=len(rows))
+            session.commit()
+            return len(rows)
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            close_session(session)
+
+    @staticmethod
+    def _archived_ids(path):
+        """IDs of the rows already in an archive file"""
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as archive:
+                return {json.loads(line)["id"] for line in archive}
+        except FileNotFoundError:
+            return set()
+
+    @staticmethod
+    def _append(path, rows):
+        """Append rows to a gzip NDJSON file and make sure they reached the disk"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = "".join(
+            json.dumps({
+                "id": row.id,
+                "instagram_user_id": row.instagram_user_id,
+                "username": row.username,
+                "full_name": row.full_name,
+                "unfollowed_at": row.unfollowed_at.isoformat()
+            }, ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode("utf-8")
+
+        with open(path, "ab") as raw:
+            with gzip.GzipFile(fileobj=raw, mode="ab") as output:
+                output.write(data)
+            raw.flush()
+            os.fsync(raw.fileno())
+
+    def read_month(self, tracked_account_id, month):
+        """All archived rows of one account and month, oldest first and without duplicates"""
+        path = self.path_for(tracked_account_id, month)
+        rows = {}
+
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as archive:
+                for line in archive:
+                    record = json.loads(line)
+                    record["unfollowed_at"] = datetime.datetime.fromisoformat(record["unfollowed_at"])
+                    rows[record["id"]] = ArchivedUnfollower(**record)
+        except FileNotFoundError:
+            logger.warning(f"Archive file {path} is missing")
+            return []
+
+        return sorted(rows.values(), key=lambda row: (row.unfollowed_at, row.id))
+
+    def months(self, tracked_account_id, since=None, until=None):
+        """Archived months of an account overlapping [since, until), oldest first"""
+        session = get_session()
+
+        try:
+            query = session.query(UnfollowerArchive).filter_by(tracked_account_id=tracked_account_id)
+            if since:
+                query = query.filter(UnfollowerArchive.last_at >= since)
+            if until:
+                query = query.filter(UnfollowerArchive.first_at < until)
+            return [(archive.month, archive.first_at, archive.last_at) for archive in query.order_by(UnfollowerArchive.month)]
+        finally:
+            close_session(session)
+
+    def read_page(self, tracked_account_id, limit, before=None, after=None, since=None, until=None, prefix=None):
+        """Archived rows for /history, matching TrackingService.get_unfollower_page_async
+
+        Returns up to limit rows newest first (or oldest first when reading
+        after a cursor). Archived rows are always older than the rows still
+        in the database, so callers append these after the table's rows.
+        """
+        months = self.months(tracked_account_id, since, until)
+        if after:
+            months = [m for m in months if m[2] >= after[0]]
+        else:
+            months = [m for m in reversed(months) if not before or m[1] <= before[0]]
+
+        page = []
+        for month, _, _ in months:
+            rows = self.read_month(tracked_account_id, month)
+            if not after:
+                rows.reverse()
+
+            for row in rows:
+                position = (row.unfollowed_at, row.id)
+                if before and position >= before:
+                    continue
+                if after and position <= after:
+                    continue
+                if since and row.unfollowed_at < since:
+                    continue
+                if until and row.unfollowed_at >= until:
+                    continue
+                # Case-insensitive, like the table half of the history query
+                if prefix and not (row.username or "").lower().startswith(prefix.lower()):
+                    continue
+
+                page.append(row)
+                if len(page) == limit:
+                    return page
+
+        return page
+
+    def iter_rows(self, tracked_account_id):
+        """Every archived row of an account, oldest first, one month in memory at a time"""
+        for month, _, _ in self.months(tracked_account_id):
+            yield from self.read_month(tracked_account_id, month)
+
+    def remove_account(self, tracked_account_id):
+        """Delete an account's archive files; returns how many rows they held"""
+        session = get_session()
+
+        try:
+            rows = sum(archive.rows for archive in session.query(UnfollowerArchive).filter_by(
+                tracked_account_id=tracked_account_id
+            ))
+            session.query(UnfollowerArchive).filter_by(tracked_account_id=tracked_account_id).delete(
+                synchronize_session=False
+            )
+            StatsService.increment(session, archived_unfollowers=-rows)
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            close_session(session)
+
+        shutil.rmtree(os.path.dirname(self.path_for(tracked_account_id, "0000-00")), ignore_errors=True)
+        return rows
@@ -0,0 +1,88 @@
+import threading
+import time
+from loguru import logger
+
+class ServiceContainer:
+    """Builds services on first use and shares one instance of each across the bot.
+
+    Handlers, the scheduler and utilities all go through the module-level
+    `services` instance instead of constructing their own services, so an
+    import never logs in to Instagram or touches the database.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._instances = {}
+        self.timings = {}  # Service name -> seconds spent building it
+
+    def _get(self, name, factory):
+        """Return the named service, building it under a lock the first time"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                started = time.perf_counter()
+                instance = factory()
+                self.timings[name] = time.perf_counter() - started
+                self._instances[name] = instance
+                logger.debug(f"Built {name} service in {self.timings[name] * 1000:.1f} ms")
+
+        return instance
+
+    @property
+    def settings(self):
+        from src.services.settings_cache import SettingsCache
+        return self._get("settings", SettingsCache)
+    
+    @property
+    def users(self):
+        from src.services.user_service import UserService
+        return self._get("users", lambda: UserService(settings_cache=self.settings))
+
+    @property
+    def instagram(self):
+        from src.services.instagram_service import InstagramService
+        return self._get("instagram", InstagramService)
+
+    @property
+    def tracking(self):
+        from src.services.tracking_service import TrackingService
+        return self._get("tracking", lambda: TrackingService(
+            instagram_service=self.instagram,
+            archive_service=self.archive
+        ))
+
+    @property
+    def stats(self):
+        from src.services.stats_service import StatsService
+        return self._get("stats", StatsService)
+    
+    @property
+    def relations(self):
+        from src.services.relation_service import RelationService
+        return self._get("relations", RelationService)
+    
+    @property
+    def archive(self):
+        from src.services.archive_service import ArchiveService
+        return self._get("archive", ArchiveService)
+    
+    @property
+    def export(self):
+        from src.services.export_service import ExportService
+        return self._get("export", lambda: ExportService(archive_service=self.archive))
+    
+    @property
+    def task_runner(self):
+        from src.services.task_runner import BackgroundTaskRunner
+        return self._get("task_runner", BackgroundTaskRunner)
+
+    def is_built(self, name):
+        """Check if a service has been built already"""
+        return name in self._instances
+
+
+services = ServiceContainer()
@@ -0,0 +1,74 @@
+import datetime
+from sqlalchemy import or_
+from sqlalchemy.dialects import postgresql, sqlite
+from src.db.models import InstagramUser
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+# Rows per statement; keeps SQLite under its bound parameter limit
+UPSERT_BATCH_SIZE = 200
+
+class DirectoryService:
+    """Keeps instagram_users, the one shared row per Instagram person, current.
+
+    Follower and unfollower rows only store the numeric pk; names live here
+    and are refreshed from every page of followers fetched.
+    """
+
+    @staticmethod
+    def upsert(session, profiles):
+        """Insert or refresh profiles in the caller's transaction
+
+        profiles are FollowerRecords (or anything with instagram_user_id,
+        username and full_name attributes). Rows whose names didn't change are left
+        alone, so refetching an unchanged page doesn't write anything.
+        """
+        rows = {
+            profile.instagram_user_id: {
+                "id": profile.instagram_user_id,
+                "username": profile.username,
+                "full_name": profile.full_name,
+                "updated_at": datetime.datetime.utcnow()
+            }
+            for profile in profiles
+        }
+        if not rows:
+            return
+
+        insert = UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+        if insert is None:
+            DirectoryService._merge(session, rows)
+            return
+
+        values = list(rows.values())
+        for start in range(0, len(values), UPSERT_BATCH_SIZE):
+            statement = insert(InstagramUser).values(values[start:start + UPSERT_BATCH_SIZE])
+            session.execute(statement.on_conflict_do_update(
+                index_elements=[InstagramUser.id],
+                set_={
+                    "username": statement.excluded.username,
+                    "full_name": statement.excluded.full_name,
+                    "updated_at": statement.excluded.updated_at
+                },
+                where=or_(
+                    InstagramUser.username.is_distinct_from(statement.excluded.username),
+                    InstagramUser.full_name.is_distinct_from(statement.excluded.full_name)
+                )
+            ))
+
+    @staticmethod
+    def _merge(session, rows):
+        """Portable fallback for databases without ON CONFLICT"""
+        existing = {
+            user.id: user for user in
+            session.query(InstagramUser).filter(InstagramUser.id.in_(list(rows)))
+        }
+        for user_id, row in rows.items():
+            user = existing.get(user_id)
+            if user is None:
+                session.add(InstagramUser(**row))
+            elif (user.username, user.full_name) != (row["username"], row["full_name"]):
+                user.username = row["username"]
+                user.full_name = row["full_name"]
+        session.flush()
@@ -0,0 +1,107 @@
+import csv
+import gzip
+import json
+import os
+import tempfile
+from loguru import logger
+from sqlalchemy import select
+from src.db.engine import get_engine
+from src.db.models import Follower, Unfollower, InstagramUser
+
+# Rows fetched from the cursor per round trip
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "5000"))
+
+EXPORT_FORMATS = ("csv", "ndjson")
+
+# What can be exported -> (columns, ordering)
+EXPORT_KINDS = {
+    "followers": (
+        [Follower.instagram_user_id, InstagramUser.username, InstagramUser.full_name, Follower.created_at],
+        [Follower.id]
+    ),
+    "unfollowers": (
+        [Unfollower.instagram_user_id, InstagramUser.username, InstagramUser.full_name, Unfollower.unfollowed_at],
+        [Unfollower.unfollowed_at, Unfollower.id]
+    ),
+}
+
+class ExportService:
+    """Writes an account's followers or unfollower history to a gzip file.
+
+    Rows come from a server-side cursor in batches and go straight to the
+    compressed file, so memory use doesn't depend on the account size.
+    Unfollower exports start with the rows already moved to archive files.
+    """
+
+    def __init__(self, engine=None, archive_service=None):
+        self.engine = engine or get_engine()
+        self.archive = archive_service
+
+    def export(self, tracked_account_id, kind="followers", fmt="csv", task=None):
+        """Write the export to a temporary file and return (path, rows)
+
+        The caller deletes the file once it has been sent. Raises
+        OperationCancelled if the task is cancelled.
+        """
+        columns, ordering = EXPORT_KINDS[kind]
+        table = columns[0].class_
+        query = (
+            select(*columns)
+            .join(InstagramUser, InstagramUser.id == table.instagram_user_id)
+            .where(table.tracked_account_id == tracked_account_id)
+            .order_by(*ordering)
+        )
+
+        handle, path = tempfile.mkstemp(prefix=f"{kind}-", suffix=f".{fmt}.gz")
+        os.close(handle)
+        rows = 0
+
+        try:
+            with self.engine.connect() as connection, gzip.open(path, "wt", encoding="utf-8", newline="") as output:
+                result = connection.execution_options(
+                    stream_results=True,
+                    yield_per=EXPORT_BATCH_SIZE
+                ).execute(query)
+
+                names = list(result.keys())
+                write = self._writer(output, fmt, names)
+
+                if kind == "unfollowers" and self.archive:
+                    # Archived rows are older than every row left in the table
+                    for row in self.archive.iter_rows(tracked_account_id):
+                        write(tuple(getattr(row, name) for name in names))
+                        rows += 1
+                        if task and rows % EXPORT_BATCH_SIZE == 0:
+                            task.check_cancelled()
+                            task.report(rows=rows)
+
+                for batch in result.partitions():
+                    if task:
+                        task.check_cancelled()
+
+                    for row in batch:
+                        write(row)
+                    rows += len(batch)
+
+                    if task:
+                        task.report(rows=rows)
+
+            logger.info(f"Exported {rows} {kind} of account {tracked_account_id} as {fmt}")
+            return path, rows
+        except BaseException:
+            os.remove(path)
+            raise
+
+    @staticmethod
+    def _writer(output, fmt, names):
+        """Build a function that writes one row in the requested format"""
+        if fmt == "csv":
+            writer = csv.writer(output)
+            writer.writerow(names)
+            return lambda row: writer.writerow(["" if value is None else value for value in row])
+
+        def write_json(row):
+            output.write(json.dumps(dict(zip(names, row)), ensure_ascii=False, default=str))
+            output.write("\n")
+
+        return write_json
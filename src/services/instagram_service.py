@@ -1,31 +1,72 @@
 import os
-import json
-from instagrapi import Client
-from instagrapi.exceptions import LoginRequired, ChallengeRequired, SelectContactPointRecoveryForm
 from dotenv import load_dotenv
 from loguru import logger
 import time
 import random
-import tempfile
-import requests
-import pickle
+import threading
 from pathlib import Path
 from src.db.session import get_session, close_session
 from src.db.models import Settings
+from src.services.task_runner import OperationCancelled
 
 load_dotenv()
 
+# Followers requested per page; each page is at least one API request
+FOLLOWER_PAGE_SIZE = int(os.getenv("INSTAGRAM_FOLLOWER_PAGE_SIZE", "200"))
+
+def import_instagrapi():
+    """Import instagrapi on first use.
+    
+    instagrapi pulls in pydantic, Pillow and requests, which together dominate
+    the bot's import time, so modules that only need Telegram never load it.
+    """
+    import instagrapi
+    import instagrapi.exceptions
+    return instagrapi
+
+class FollowerRecord:
+    """One fetched follower: the numeric ID and names, nothing else.
+
+    instagrapi's UserShort also carries profile picture URLs and pydantic
+    bookkeeping; a slotted object keeps a 100k follower list several times
+    smaller while it is diffed.
+    """
+    __slots__ = ("instagram_user_id", "username", "full_name")
+    
+    def __init__(self, instagram_user_id, username, full_name):
+        self.instagram_user_id = instagram_user_id
+        self.username = username
+        self.full_name = full_name
+    
+    def __repr__(self):
+        return f"<FollowerRecord(instagram_user_id={self.instagram_user_id}, username={self.username})>"
+
 class InstagramService:
     def __init__(self):
+        # The client logs in on first use, see ensure_client()
         self.client = None
-        self.initialize_client()
+        # The scheduler thread and handler executors share this service; the
+        # client is only replaced or logged in while holding the lock
+        self._client_lock = threading.RLock()
+    
+    def ensure_client(self):
+        """Log in with the stored credentials if no client exists yet"""
+        with self._client_lock:
+            if self.client is None:
+                self.initialize_client()
+            return self.client
         
     def initialize_client(self):
         """Initialize the Instagram client with credentials from environment variables or database"""
+        with self._client_lock:
+            self._initialize_client()
+    
+    def _initialize_client(self):
         # Create settings directory if it doesn't exist
         Path("settings").mkdir(exist_ok=True)
         
         # Create new client
+        Client = import_instagrapi().Client
         self.client = Client()
         
         # Get credentials
@@ -71,7 +112,19 @@ class InstagramService:
     
     def login(self, username, password):
         """Login to Instagram with the given credentials with challenge handling"""
+        with self._client_lock:
+            return self._login(username, password)
+    
+    def _login(self, username, password):
+        instagrapi = import_instagrapi()
+        Client = instagrapi.Client
+        ChallengeRequired = instagrapi.exceptions.ChallengeRequired
+        SelectContactPointRecoveryForm = instagrapi.exceptions.SelectContactPointRecoveryForm
+        
         try:
+            if self.client is None:
+                self.client = Client()
+            
             # Set client logger
             self.client.logger = logger
             
@@ -152,23 +205,25 @@ class InstagramService:
             
             # Ensure we're properly logged in
             logger.info(f"Attempting to get user ID for {clean_username}")
-            self.initialize_client()
+            with self._client_lock:
+                self.initialize_client()
+                client = self.client
             
             # Try multiple methods to get user ID
             
             # Method 1: Try standard API
             try:
                 logger.info(f"Using standard API to find ID for {clean_username}")
-                user_info = self.client.user_info_by_username(clean_username)
+                user_info = client.user_info_by_username(clean_username)
                 logger.info(f"Found user ID {user_info.pk} for {clean_username}")
-                return user_info.pk
+                return int(user_info.pk)
             except Exception as e:
                 logger.warning(f"Standard method failed: {e}, trying alternatives")
                 
             # Method 2: Try web API (often works for private accounts)
             try:
                 logger.info(f"Using web API to find ID for {clean_username}")
-                data = self.client.private.request(
+                data = client.private.request(
                     "web/search/topsearch/",
                     params={"context": "user", "query": clean_username}
                 )
@@ -176,7 +231,7 @@ class InstagramService:
                 if data and "users" in data:
                     for user in data["users"]:
                         if user["user"]["username"].lower() == clean_username:
-                            user_id = user["user"]["pk"]
+                            user_id = int(user["user"]["pk"])
                             logger.info(f"Found user ID {user_id} for {clean_username} via web API")
                             return user_id
             except Exception as e:
@@ -207,7 +262,7 @@ class InstagramService:
             # Try to get privacy status 
             try:
                 logger.info(f"Checking privacy status for {clean_username}")
-                user_info = self.client.user_info(user_id)
+                user_info = self.ensure_client().user_info(user_id)
                 is_private = user_info.is_private
                 logger.info(f"Account {clean_username} privacy status: {is_private}")
                 return is_private
@@ -227,57 +282,150 @@ class InstagramService:
         # Always return False to indicate manual follow is required
         return False
     
-    def get_followers(self, user_id=None, username=None):
-        """Get a list of followers for the specified user"""
-        try:
-            if not user_id and username:
-                user_id = self.get_user_id_by_username(username)
+    def iter_follower_records(self, user_id, task=None, stats=None):
+        """Yield followers one page of FollowerRecords at a time
+        
+        Only one page is held at a time, and errors propagate so a caller can
+        tell a failed fetch from an empty one.
+        """
+        pages = followers = 0
+        
+        for page in self.iter_follower_pages(user_id, task=task, stats=stats):
+            records = self._to_records(page)
+            pages += 1
+            followers += len(records)
             
-            if not user_id:
-                logger.error("No user ID or username provided to get followers")
-                return []
+            if task:
+                task.report(pages=pages, followers=followers)
+            yield records
+    
+    def get_following(self, user_id, task=None, stats=None):
+        """Yield the accounts a user follows, one page of FollowerRecords at a time
+        
+        The following-list counterpart of iter_follower_records: errors
+        propagate, stats gets the same keys, and progress is reported as
+        pages and following.
+        """
+        pages = following = 0
+        
+        for page in self._iter_pages("following", user_id, FOLLOWER_PAGE_SIZE, task, stats):
+            records = self._to_records(page)
+            pages += 1
+            following += len(records)
             
-            # Get all followers with pagination
-            all_followers = []
-            max_retries = 3
-            retries = 0
+            if task:
+                task.report(pages=pages, following=following)
+            yield records
+    
+    @staticmethod
+    def _to_records(page):
+        return [FollowerRecord(int(user.pk), user.username, user.full_name) for user in page]
+    
+    def iter_follower_pages(self, user_id, page_size=FOLLOWER_PAGE_SIZE, task=None, stats=None):
+        """Yield followers of a user one page at a time
+        
+        stats["complete"] ends up True only if pagination ran to the last page;
+        an empty page that still points to a next one ends the fetch early.
+        """
+        return self._iter_pages("followers", user_id, page_size, task, stats)
+    
+    def _iter_pages(self, relation, user_id, page_size, task=None, stats=None):
+        """Page through a user's "followers" or "following" list"""
+        max_id = ""
+        if stats is not None:
+            stats["complete"] = False
+        
+        while True:
+            page, max_id = self._fetch_page(relation, user_id, page_size, max_id, task, stats)
+            if not page and max_id:
+                logger.warning(f"Empty {relation} page with a next cursor for {user_id}, stopping the fetch")
+                break
+            yield page
             
-            while retries < max_retries:
-                try:
-                    # Add random delays to avoid rate limiting
-                    time.sleep(random.randint(2, 5))
-                    all_followers = self.client.user_followers(user_id, amount=0)  # 0 means all followers
-                    break
-                except LoginRequired:
-                    logger.warning("Login required, attempting to reinitialize client")
-                    self.initialize_client()
-                    retries += 1
-                except Exception as e:
-                    # Check if it's a private account error
-                    if "Private account" in str(e):
-                        logger.error(f"Cannot view followers of private account {user_id}")
-                        return []
-                    
-                    logger.error(f"Error fetching followers for {user_id}: {e}")
-                    retries += 1
-                    time.sleep(5)  # Wait before retry
+            if not max_id:
+                if stats is not None:
+                    stats["complete"] = True
+                break
+    
+    def _fetch_page(self, relation, user_id, page_size, max_id, task=None, stats=None):
+        """Fetch one page of followers or following with retries"""
+        LoginRequired = import_instagrapi().exceptions.LoginRequired
+        max_retries = 3
+        retries = 0
+        last_error = None
+        
+        while retries < max_retries:
+            if task:
+                task.check_cancelled()
             
-            return [
-                {
-                    "instagram_user_id": follower_id,
-                    "username": follower_info.username,
-                    "full_name": follower_info.full_name
-                }
-                for follower_id, follower_info in all_followers.items()
-            ]
+            try:
+                # Add random delays to avoid rate limiting
+                self._sleep(random.randint(2, 5), task)
+                client = self.ensure_client()
+                if stats is not None:
+                    stats["api_calls"] = stats.get("api_calls", 0) + 1
+                fetch_chunk = getattr(client, f"user_{relation}_v1_chunk")
+                return fetch_chunk(str(user_id), max_amount=page_size, max_id=max_id)
+            except LoginRequired as e:
+                logger.warning("Login required, attempting to reinitialize client")
+                self.initialize_client()
+                last_error = e
+                retries += 1
+            except OperationCancelled:
+                raise
+            except Exception as e:
+                # Check if it's a private account error
+                if "Private account" in str(e):
+                    logger.error(f"Cannot view {relation} of private account {user_id}")
+                    raise
+                
+                logger.error(f"Error fetching {relation} for {user_id}: {e}")
+                last_error = e
+                retries += 1
+                self._sleep(5, task)  # Wait before retry
+        
+        raise last_error
+    
+    def get_follower_count(self, user_id, stats=None):
+        """Follower count shown on the profile, or None if it can't be fetched"""
+        try:
+            client = self.ensure_client()
+            if stats is not None:
+                stats["api_calls"] = stats.get("api_calls", 0) + 1
+            # instagrapi caches user_info for the life of the client; the count must be current
+            return client.user_info(str(user_id), use_cache=False).follower_count
+        except Exception as e:
+            logger.error(f"Failed to get follower count for {user_id}: {e}")
+            return None
+    
+    def is_follower(self, user_id, follower_id, follower_username, stats=None):
+        """Check one follower with a follower search instead of a full list
+        
+        Returns True or False, or None if the search failed.
+        """
+        try:
+            client = self.ensure_client()
+            self._sleep(random.randint(1, 3))
+            if stats is not None:
+                stats["api_calls"] = stats.get("api_calls", 0) + 1
+            matches = client.search_followers_v1(str(user_id), follower_username)
+            return any(int(user.pk) == follower_id for user in matches)
         except Exception as e:
-            logger.error(f"Failed to get followers: {e}")
-            return []
+            logger.error(f"Failed to check follower {follower_username} of {user_id}: {e}")
+            return None
+    
+    @staticmethod
+    def _sleep(seconds, task=None):
+        """Sleep, waking up early if the task is cancelled"""
+        if task:
+            task.sleep(seconds)
+        else:
+            time.sleep(seconds)
     
     def get_user_info(self, user_id):
         """Get information about a specific user"""
         try:
-            user_info = self.client.user_info(user_id)
+            user_info = self.ensure_client().user_info(user_id)
             return {
                 "instagram_user_id": user_id,
                 "username": user_info.username,
@@ -0,0 +1,183 @@
+import datetime
+import os
+import socket
+import threading
+import time
+import uuid
+from loguru import logger
+from sqlalchemy.exc import IntegrityError
+from src.db.session import get_session, close_session
+from src.db.models import SchedulerLease
+
+class LeaderElection:
+    """DB-backed leader lease so only one bot replica runs the scheduler.
+
+    The lease row holds the current holder and a fencing token. The token is
+    incremented on every takeover, so work started by a replica that has since
+    lost the lease can be detected with validate() and dropped.
+    """
+
+    def __init__(self, name="scheduler", lease_seconds=None, heartbeat_seconds=None):
+        self.name = name
+        self.lease_seconds = lease_seconds or int(os.getenv("LEADER_LEASE_SECONDS", "15"))
+        self.heartbeat_seconds = heartbeat_seconds or int(os.getenv("LEADER_HEARTBEAT_SECONDS", "5"))
+        self.holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.fencing_token = None
+        self.valid_until = 0.0  # Local monotonic deadline of the current lease
+        self.thread = None
+        self.running = False
+        self._stop_event = threading.Event()
+
+    def is_leader(self):
+        """Check if this replica currently holds an unexpired lease"""
+        return self.fencing_token is not None and time.monotonic() < self.valid_until
+
+    def try_acquire(self):
+        """Acquire the lease, renew it if already held, or take it over if expired"""
+        now = datetime.datetime.utcnow()
+        expires_at = now + datetime.timedelta(seconds=self.lease_seconds)
+        started = time.monotonic()
+        session = get_session()
+
+        try:
+            # Renew the lease we already hold
+            if self.fencing_token is not None:
+                renewed = session.query(SchedulerLease).filter_by(
+                    name=self.name,
+                    holder_id=self.holder_id,
+                    fencing_token=self.fencing_token
+                ).update(
+                    {"expires_at": expires_at, "heartbeat_at": now},
+                    synchronize_session=False
+                )
+                session.commit()
+
+                if renewed:
+                    self.valid_until = started + self.lease_seconds
+                    return True
+
+                logger.warning(f"Lost scheduler leadership (token {self.fencing_token})")
+                self.fencing_token = None
+                self.valid_until = 0.0
+
+            lease = session.query(SchedulerLease).filter_by(name=self.name).first()
+
+            if not lease:
+                # First replica ever: create the lease row
+                session.add(SchedulerLease(
+                    name=self.name,
+                    holder_id=self.holder_id,
+                    fencing_token=1,
+                    expires_at=expires_at,
+                    heartbeat_at=now
+                ))
+                try:
+                    session.commit()
+                except IntegrityError:
+                    session.rollback()
+                    return False
+                new_token = 1
+            else:
+                if lease.expires_at and lease.expires_at > now and lease.holder_id != self.holder_id:
+                    return False
+
+                # Compare-and-swap on the old token so only one replica wins the takeover
+                new_token = lease.fencing_token + 1
+                taken = session.query(SchedulerLease).filter_by(
+                    name=self.name,
+                    fencing_token=lease.fencing_token
+                ).update(
+                    {
+                        "holder_id": self.holder_id,
+                        "fencing_token": new_token,
+                        "expires_at": expires_at,
+                        "heartbeat_at": now
+                    },
+                    synchronize_session=False
+                )
+                session.commit()
+
+                if not taken:
+                    return False
+
+            self.fencing_token = new_token
+            self.valid_until = started + self.lease_seconds
+            logger.info(f"Acquired scheduler leadership as {self.holder_id} (token {new_token})")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error acquiring scheduler lease: {e}")
+            session.rollback()
+            return self.is_leader()
+        finally:
+            close_session(session)
+
+    def validate(self, fencing_token):
+        """Check that the given token is still the current one in the database"""
+        if fencing_token is None or fencing_token != self.fencing_token or not self.is_leader():
+            return False
+
+        session = get_session()
+
+        try:
+            lease = session.query(SchedulerLease).filter_by(name=self.name).first()
+            return bool(lease and lease.holder_id == self.holder_id and lease.fencing_token == fencing_token)
+        except Exception as e:
+            logger.error(f"Error validating scheduler lease: {e}")
+            return False
+        finally:
+            close_session(session)
+
+    def release(self):
+        """Expire the lease immediately so another replica can take over"""
+        if self.fencing_token is None:
+            return
+
+        session = get_session()
+
+        try:
+            session.query(SchedulerLease).filter_by(
+                name=self.name,
+                holder_id=self.holder_id,
+                fencing_token=self.fencing_token
+            ).update(
+                {"expires_at": datetime.datetime.utcnow()},
+                synchronize_session=False
+            )
+            session.commit()
+            logger.info(f"Released scheduler leadership (token {self.fencing_token})")
+        except Exception as e:
+            logger.error(f"Error releasing scheduler lease: {e}")
+            session.rollback()
+        finally:
+            self.fencing_token = None
+            self.valid_until = 0.0
+            close_session(session)
+
+    def start(self):
+        """Start sending heartbeats in a background thread"""
+        if self.running:
+            return False
+
+        def run_heartbeat():
+            while not self._stop_event.is_set():
+                self.try_acquire()
+                self._stop_event.wait(self.heartbeat_seconds)
+
+        self.running = True
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=run_heartbeat, name="leader-heartbeat")
+        self.thread.daemon = True
+        self.thread.start()
+
+        return True
+
+    def stop(self):
+        """Stop heartbeats and give up the lease"""
+        self.running = False
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=self.heartbeat_seconds)
+            self.thread = None
+
+        self.release()
@@ -0,0 +1,414 @@
+import asyncio
+import os
+import time
+from loguru import logger
+from telegram import InputFile
+from telegram.error import RetryAfter, TimedOut, NetworkError, Forbidden, BadRequest
+from src.db.session import get_session, close_session
+from src.db.models import User, UserPreference
+from src.services.outbox_service import OutboxService
+from src.utils.messages import md, format_unfollower_line, chunk_lines, render_unfollowers_csv
+
+# Longest wait before a message that hit a network error is retried
+MAX_RETRY_DELAY_SECONDS = 60
+
+class AsyncRateLimiter:
+    """Token bucket limiter for coroutines sharing one event loop"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds):
+        """Stop handing out tokens for the given number of seconds"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class NotificationService:
+    """Queue of outgoing Telegram messages delivered within Telegram's rate limits.
+
+    Unfollower alerts are read from the notification outbox by a dispatcher
+    task and marked sent or failed once delivery finishes. Other messages can
+    be queued directly with enqueue() from any thread.
+    """
+
+    def __init__(self, bot, global_rate=None, per_chat_interval=None, max_concurrency=None, max_retries=None):
+        self.bot = bot
+        self.global_limiter = AsyncRateLimiter(global_rate or float(os.getenv("TELEGRAM_GLOBAL_RATE", "25")))
+        self.per_chat_interval = per_chat_interval or float(os.getenv("TELEGRAM_PER_CHAT_INTERVAL", "1.0"))
+        self.max_concurrency = max_concurrency or int(os.getenv("NOTIFICATION_CONCURRENCY", "20"))
+        self.max_retries = max_retries or int(os.getenv("NOTIFICATION_MAX_RETRIES", "5"))
+        self.retry_base_seconds = float(os.getenv("NOTIFICATION_RETRY_BASE_SECONDS", "2"))
+        self.poll_seconds = float(os.getenv("OUTBOX_POLL_SECONDS", "5"))
+        self.batch_size = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+        self.document_threshold = int(os.getenv("DIGEST_DOCUMENT_THRESHOLD", "200"))
+        self.outbox = OutboxService()
+        self.loop = None
+        self.queue = None
+        self.worker = None
+        self.dispatcher = None
+        self._wake_event = None
+        self._semaphore = None
+        self._chat_locks = {}  # chat_id -> [lock, number of queued deliveries]
+        self._chat_next_send = {}
+        self._pending = set()
+        self._retrying = 0  # Messages waiting out a retry delay
+
+    async def start(self):
+        """Start the delivery worker on the running event loop"""
+        if self.worker:
+            return False
+
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._wake_event = asyncio.Event()
+        self.worker = asyncio.create_task(self._run())
+        self.dispatcher = asyncio.create_task(self._dispatch_outbox())
+        logger.info("Notification service started")
+        return True
+
+    async def stop(self):
+        """Stop the worker, letting in-flight deliveries finish"""
+        if not self.worker:
+            return
+
+        # Claimed rows not delivered yet are picked up again after the claim timeout
+        for task in (self.dispatcher, self.worker):
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.dispatcher = None
+        self.worker = None
+
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+
+        logger.info(f"Notification service stopped ({self.queue.qsize()} messages left in queue)")
+
+    def enqueue(self, chat_id, text, parse_mode=None):
+        """Queue a message for delivery; safe to call from any thread"""
+        if not self.loop:
+            logger.error("Notification service is not started, dropping message")
+            return False
+
+        item = {
+            "chat_id": chat_id,
+            "parts": [{"text": text, "parse_mode": parse_mode}],
+            "next_part": 0,
+            "attempts": 0,
+            "outbox": []
+        }
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+        return True
+
+    def wake(self, results=None):
+        """Make the dispatcher poll the outbox now; safe to call from any thread"""
+        if self.loop:
+            self.loop.call_soon_threadsafe(self._wake_event.set)
+
+    def get_recipients(self, user_ids):
+        """Look up chat IDs and digest settings for many users in a single query.
+
+        Errors propagate so a failed lookup leaves the claimed rows to be
+        retried rather than treated as orphaned.
+        """
+        if not user_ids:
+            return {}
+
+        session = get_session()
+
+        try:
+            rows = session.query(User.id, User.chat_id, UserPreference.digest_minutes).outerjoin(
+                UserPreference, UserPreference.user_id == User.id
+            ).filter(User.id.in_(list(user_ids))).all()
+            return {user_id: (chat_id, digest_minutes) for user_id, chat_id, digest_minutes in rows}
+        finally:
+            close_session(session)
+
+    def build_parts(self, sections, digest=False):
+        """Render (instagram_username, unfollowers) sections into sendable message parts.
+
+        Text is split into messages under Telegram's length limit; lists
+        longer than the document threshold are sent as a CSV attachment.
+        """
+        total = sum(len(unfollowers) for _, unfollowers in sections)
+
+        if total > self.document_threshold:
+            accounts = ", ".join(f"@{username}" for username, _ in sections)
+            filename = f"unfollowers_{sections[0][0] if len(sections) == 1 else 'digest'}.csv"
+            return [{
+                "document": render_unfollowers_csv(sections),
+                "filename": filename,
+                "caption": f"🔔 {total} people unfollowed {accounts[:900]}. The full list is attached."
+            }]
+
+        if digest:
+            header = f"🗞 *Unfollower digest: {total} unfollowed*\n\n"
+        else:
+            username, unfollowers = sections[0]
+            header = f"🔔 *Unfollower Alert for @{md(username)}*\n\n"
+            if total == 1:
+                unfollower = unfollowers[0]
+                return [{
+                    "text": header + f"*{md(unfollower['username'])}* ({md(unfollower['full_name'])}) has unfollowed you.",
+                    "parse_mode": "Markdown"
+                }]
+            header += f"*{total} people* have unfollowed you:\n\n"
+
+        lines = []
+        for username, unfollowers in sections:
+            if digest:
+                lines.append(f"*@{md(username)}* ({len(unfollowers)}):")
+            lines.extend(format_unfollower_line(idx, unfollower) for idx, unfollower in enumerate(unfollowers, 1))
+
+        return [{"text": text, "parse_mode": "Markdown"} for text in chunk_lines(header, lines)]
+
+    async def _dispatch_outbox(self):
+        """Poll the outbox and queue claimed unfollower alerts"""
+        last_purge = 0.0
+
+        while True:
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake_event.clear()
+
+            try:
+                # Claim the next batch only once the last one is out, so claimed rows
+                # never wait here past the claim timeout and get claimed again
+                if not self._has_backlog():
+                    await self._claim_batch()
+
+                if time.monotonic() - last_purge > 3600:
+                    await self.loop.run_in_executor(None, self.outbox.purge_sent)
+                    last_purge = time.monotonic()
+            except Exception as e:
+                logger.error(f"Error dispatching outbox: {e}")
+
+    async def _claim_batch(self):
+        """Claim up to batch_size due outbox rows and queue them"""
+        rows = await self.loop.run_in_executor(None, self.outbox.claim_pending, self.batch_size)
+        if not rows:
+            return
+
+        recipients = await self.loop.run_in_executor(
+            None, self.get_recipients, {row["user_id"] for row in rows}
+        )
+
+        items, orphaned = self._group_rows(rows, recipients)
+        for item in items:
+            self.queue.put_nowait(item)
+        if orphaned:
+            await self._outbox_failed({"outbox": orphaned}, "User not found", permanent=True)
+
+        logger.info(f"Queued {len(rows)} unfollower notifications from the outbox")
+
+    def _has_backlog(self):
+        """Whether messages are still queued, being sent or waiting to be retried"""
+        return not self.queue.empty() or bool(self._pending) or self._retrying > 0
+
+    def _delivery_done(self, task):
+        self._pending.discard(task)
+        # Claim the next batch right away instead of at the next poll
+        if not self._has_backlog():
+            self._wake_event.set()
+
+    def _group_rows(self, rows, recipients):
+        """Turn claimed outbox rows into queue items, one digest per user in digest mode.
+
+        Returns the items and the claims of rows whose user no longer exists.
+        """
+        items = []
+        orphaned = []
+        digests = {}
+
+        for row in rows:
+            recipient = recipients.get(row["user_id"])
+            if not recipient:
+                logger.error(f"User not found for ID: {row['user_id']}")
+                orphaned.append((row["outbox_id"], row["claim_token"]))
+                continue
+
+            chat_id, digest_minutes = recipient
+            outbox = (row["outbox_id"], row["claim_token"])
+
+            if digest_minutes:
+                sections = digests.setdefault(row["user_id"], {"chat_id": chat_id, "sections": {}, "outbox": []})
+                sections["sections"].setdefault(row["instagram_username"], []).extend(row["unfollowers"])
+                sections["outbox"].append(outbox)
+                continue
+
+            items.append({
+                "chat_id": chat_id,
+                "parts": self.build_parts([(row["instagram_username"], row["unfollowers"])]),
+                "next_part": 0,
+                "attempts": 0,
+                "outbox": [outbox]
+            })
+
+        for digest in digests.values():
+            items.append({
+                "chat_id": digest["chat_id"],
+                "parts": self.build_parts(list(digest["sections"].items()), digest=True),
+                "next_part": 0,
+                "attempts": 0,
+                "outbox": digest["outbox"]
+            })
+
+        return items, orphaned
+
+    async def _outbox_sent(self, item):
+        """Mark the outbox rows behind a message as delivered"""
+        for outbox_id, claim_token in item["outbox"]:
+            await self.loop.run_in_executor(None, self.outbox.mark_sent, outbox_id, claim_token)
+
+    async def _outbox_failed(self, item, error, permanent=False):
+        """Hand the outbox rows behind a message back for a later retry"""
+        for outbox_id, claim_token in item["outbox"]:
+            await self.loop.run_in_executor(
+                None, self.outbox.mark_failed, outbox_id, claim_token, error, permanent
+            )
+
+    async def _run(self):
+        """Take messages off the queue and deliver them concurrently"""
+        while True:
+            item = await self.queue.get()
+
+            task = asyncio.create_task(self._deliver(item))
+            self._pending.add(task)
+            task.add_done_callback(self._delivery_done)
+
+    async def _deliver(self, item):
+        """Send one message honouring the per-chat and global limits"""
+        chat_id = item["chat_id"]
+        entry = self._chat_locks.setdefault(chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        lock = entry[0]
+
+        try:
+            async with lock:
+                parts = item["parts"]
+
+                # Resume after the last delivered part so a retry never repeats a chunk
+                while item["next_part"] < len(parts):
+                    # Per-chat spacing
+                    wait = self._chat_next_send.get(chat_id, 0.0) - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+
+                    # Limit concurrent requests only once this chat is ready to send,
+                    # so a busy chat cannot hold slots other chats could use
+                    try:
+                        async with self._semaphore:
+                            await self.global_limiter.acquire()
+                            sent = await self._send(item, parts[item["next_part"]])
+                    finally:
+                        self._chat_next_send[chat_id] = time.monotonic() + self.per_chat_interval
+
+                    if not sent:
+                        return
+
+                    item["next_part"] += 1
+
+                logger.info(f"Sent notification to chat {chat_id} ({len(parts)} part(s))")
+                await self._outbox_sent(item)
+        except Exception as e:
+            logger.error(f"Error sending notification to chat {chat_id}: {e}")
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._chat_locks.pop(chat_id, None)
+            self._prune_chat_state()
+
+    async def _send(self, item, part):
+        """Make one Telegram API call; returns False if the item was requeued or dropped"""
+        chat_id = item["chat_id"]
+
+        try:
+            if "document" in part:
+                await self.bot.send_document(
+                    chat_id=chat_id,
+                    document=InputFile(part["document"], filename=part["filename"]),
+                    caption=part["caption"]
+                )
+            else:
+                await self.bot.send_message(
+                    chat_id=chat_id,
+                    text=part["text"],
+                    parse_mode=part["parse_mode"]
+                )
+            return True
+        except RetryAfter as e:
+            # Flood control applies to the whole bot, so pause every sender
+            logger.warning(f"Telegram flood control, retrying in {e.retry_after}s")
+            self.global_limiter.pause(e.retry_after)
+            await self._retry(item, e, backoff=False)
+        except (Forbidden, BadRequest) as e:
+            # BadRequest subclasses NetworkError, so it has to be caught first
+            logger.error(f"Dropping notification for chat {chat_id}: {e}")
+            await self._outbox_failed(item, e, permanent=True)
+        except (TimedOut, NetworkError) as e:
+            logger.warning(f"Network error sending to chat {chat_id}: {e}")
+            await self._retry(item, e)
+
+        return False
+
+    def _prune_chat_state(self, max_size=1000):
+        """Forget per-chat send times that no longer delay anything"""
+        if len(self._chat_next_send) <= max_size:
+            return
+
+        now = time.monotonic()
+        for chat_id in [c for c, t in self._chat_next_send.items() if t < now]:
+            del self._chat_next_send[chat_id]
+
+    async def _retry(self, item, error, backoff=True):
+        """Put a failed message back on the queue unless it ran out of attempts
+
+        With backoff the message waits retry_base_seconds, doubling with each
+        attempt up to MAX_RETRY_DELAY_SECONDS, before it is queued again.
+        Flood control pauses the rate limiter instead.
+        """
+        item["attempts"] += 1
+        if item["attempts"] > self.max_retries:
+            logger.error(f"Giving up on notification for chat {item['chat_id']} after {item['attempts']} attempts")
+            await self._outbox_failed(item, error)
+            return
+
+        if not backoff:
+            self.queue.put_nowait(item)
+            return
+
+        delay = min(self.retry_base_seconds * 2 ** (item["attempts"] - 1), MAX_RETRY_DELAY_SECONDS)
+        self._retrying += 1
+        self.loop.call_later(delay, self._requeue, item)
+
+    def _requeue(self, item):
+        self._retrying -= 1
+        self.queue.put_nowait(item)
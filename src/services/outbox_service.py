@@ -0,0 +1,179 @@
+import datetime
+import json
+import os
+import uuid
+from loguru import logger
+from sqlalchemy import or_, and_, func
+from src.db.session import get_session, close_session
+from src.db.models import NotificationOutbox, UserPreference
+
+class OutboxService:
+    """Durable store of unfollower alerts waiting to be delivered.
+
+    Rows are written by TrackingService in the same transaction as the
+    follower diff, then claimed and delivered by NotificationService.
+    """
+
+    def __init__(self, max_attempts=None, claim_timeout_seconds=None):
+        self.max_attempts = max_attempts or int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+        self.claim_timeout_seconds = claim_timeout_seconds or int(os.getenv("OUTBOX_CLAIM_TIMEOUT_SECONDS", "300"))
+
+    @staticmethod
+    def add_unfollowers(session, tracked_account, unfollowers, check_time):
+        """Add an outbox row to the caller's session; committed together with the diff"""
+        key = f"unfollowers:{tracked_account.id}:{check_time:%Y%m%d%H%M%S%f}"
+        row = NotificationOutbox(
+            idempotency_key=key,
+            user_id=tracked_account.user_id,
+            tracked_account_id=tracked_account.id,
+            instagram_username=tracked_account.instagram_username,
+            payload=json.dumps(unfollowers, ensure_ascii=False),
+            status="pending",
+            next_attempt_at=OutboxService.due_time(session, tracked_account.user_id, check_time)
+        )
+        session.add(row)
+        return row
+
+    @staticmethod
+    def due_time(session, user_id, check_time):
+        """When a new alert for this user should be delivered.
+
+        Users in digest mode collect alerts until their window closes: every
+        row added during the window shares the window's due time, so the
+        dispatcher claims them together and sends one digest.
+        """
+        preference = session.query(UserPreference).filter_by(user_id=user_id).first()
+        if not preference or not preference.digest_minutes:
+            return check_time
+
+        open_window = session.query(func.min(NotificationOutbox.next_attempt_at)).filter(
+            NotificationOutbox.user_id == user_id,
+            NotificationOutbox.status == "pending",
+            NotificationOutbox.attempts == 0,
+            NotificationOutbox.next_attempt_at > check_time
+        ).scalar()
+
+        return open_window or check_time + datetime.timedelta(minutes=preference.digest_minutes)
+
+    def claim_pending(self, limit=100):
+        """Atomically claim a batch of due rows for delivery by this process"""
+        now = datetime.datetime.utcnow()
+        stale_claim = now - datetime.timedelta(seconds=self.claim_timeout_seconds)
+        claim_token = uuid.uuid4().hex
+        session = get_session()
+
+        try:
+            due = or_(
+                and_(NotificationOutbox.status == "pending", NotificationOutbox.next_attempt_at <= now),
+                # Rows left in "sending" by a crashed process are retried
+                and_(NotificationOutbox.status == "sending", NotificationOutbox.claimed_at < stale_claim)
+            )
+            # Order by user so a digest window is rarely split across batches
+            ids = [row_id for (row_id,) in session.query(NotificationOutbox.id)
+                   .filter(due)
+                   .order_by(NotificationOutbox.user_id, NotificationOutbox.id)
+                   .limit(limit)
+                   .all()]
+
+            if not ids:
+                return []
+
+            session.query(NotificationOutbox).filter(
+                NotificationOutbox.id.in_(ids),
+                due
+            ).update(
+                {"status": "sending", "claim_token": claim_token, "claimed_at": now},
+                synchronize_session=False
+            )
+            session.commit()
+
+            rows = session.query(NotificationOutbox).filter_by(claim_token=claim_token).order_by(
+                NotificationOutbox.user_id, NotificationOutbox.id
+            ).all()
+            return [
+                {
+                    "outbox_id": row.id,
+                    "claim_token": claim_token,
+                    "idempotency_key": row.idempotency_key,
+                    "user_id": row.user_id,
+                    "instagram_username": row.instagram_username,
+                    "unfollowers": json.loads(row.payload),
+                    "attempts": row.attempts
+                }
+                for row in rows
+            ]
+        except Exception as e:
+            logger.error(f"Error claiming outbox rows: {e}")
+            session.rollback()
+            return []
+        finally:
+            close_session(session)
+
+    def mark_sent(self, outbox_id, claim_token):
+        """Record successful delivery of a claimed row"""
+        session = get_session()
+
+        try:
+            session.query(NotificationOutbox).filter_by(id=outbox_id, claim_token=claim_token).update(
+                {"status": "sent", "sent_at": datetime.datetime.utcnow(), "last_error": None},
+                synchronize_session=False
+            )
+            session.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error marking outbox row {outbox_id} as sent: {e}")
+            session.rollback()
+            return False
+        finally:
+            close_session(session)
+
+    def mark_failed(self, outbox_id, claim_token, error, permanent=False):
+        """Release a claimed row for a later retry with exponential backoff"""
+        session = get_session()
+
+        try:
+            row = session.query(NotificationOutbox).filter_by(id=outbox_id, claim_token=claim_token).first()
+            if not row:
+                return False
+
+            row.attempts += 1
+            row.last_error = str(error)[:1000]
+            row.claim_token = None
+            row.claimed_at = None
+
+            if permanent or row.attempts >= self.max_attempts:
+                row.status = "failed"
+                logger.error(f"Outbox row {row.idempotency_key} failed permanently: {error}")
+            else:
+                backoff = min(3600, 30 * 2 ** (row.attempts - 1))
+                row.status = "pending"
+                row.next_attempt_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=backoff)
+                logger.warning(f"Outbox row {row.idempotency_key} will be retried in {backoff}s: {error}")
+
+            session.commit()
+            return True
+        except Exception as e:
+            logger.error(f"Error marking outbox row {outbox_id} as failed: {e}")
+            session.rollback()
+            return False
+        finally:
+            close_session(session)
+
+    def purge_sent(self, older_than_days=7):
+        """Delete delivered rows older than the given number of days"""
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(days=older_than_days)
+        session = get_session()
+
+        try:
+            deleted = session.query(NotificationOutbox).filter(
+                NotificationOutbox.status == "sent",
+                NotificationOutbox.sent_at < cutoff
+            ).delete(synchronize_session=False)
+            session.commit()
+            return deleted
+        except Exception as e:
+            logger.error(f"Error purging outbox: {e}")
+            session.rollback()
+            return 0
+        finally:
+            close_session(session)
@@ -0,0 +1,64 @@
+import datetime
+import os
+from loguru import logger
+from sqlalchemy import and_, delete, func, insert, literal, select
+from src.db.async_session import async_session_scope
+from src.db.models import Follower, Following, FollowRelation, InstagramUser
+
+# Followings started this many days ago or less count as new
+NEW_FOLLOWING_DAYS = int(os.getenv("NEW_FOLLOWING_DAYS", "7"))
+
+class RelationService:
+    """Mutuals, not-following-back and new followings of accounts that track their following list.
+
+    They are set operations between the stored followers and followings of
+    an account, run in SQL after each check and kept in follow_relations, so
+    the Telegram commands only read a few indexed rows.
+    """
+
+    @staticmethod
+    def refresh(session, tracked_account_id, now=None):
+        """Recompute an account's relations from its snapshots in the caller's transaction"""
+        followers = select(Follower.instagram_user_id).where(Follower.tracked_account_id == tracked_account_id)
+        following = select(Following.instagram_user_id).where(Following.tracked_account_id == tracked_account_id)
+        cutoff = (now or datetime.datetime.utcnow()) - datetime.timedelta(days=NEW_FOLLOWING_DAYS)
+
+        # Every set is a subset of the following list, which Instagram caps at 7,500
+        sets = {
+            "mutual": following.intersect(followers),
+            "not_following_back": following.except_(followers),
+            "new_following": following.where(Following.created_at >= cutoff)
+        }
+
+        session.execute(delete(FollowRelation).where(FollowRelation.tracked_account_id == tracked_account_id))
+        for kind, user_ids in sets.items():
+            user_ids = user_ids.subquery()
+            session.execute(insert(FollowRelation).from_select(
+                ["tracked_account_id", "kind", "instagram_user_id"],
+                select(literal(tracked_account_id), literal(kind), user_ids.c.instagram_user_id)
+            ))
+
+    @staticmethod
+    def clear(session, tracked_account_id):
+        """Drop an account's following snapshot and relations in the caller's transaction"""
+        session.execute(delete(FollowRelation).where(FollowRelation.tracked_account_id == tracked_account_id))
+        session.execute(delete(Following).where(Following.tracked_account_id == tracked_account_id))
+
+    async def get_relation_async(self, tracked_account_id, kind, limit):
+        """Up to limit people in one of an account's relations, by username, and their total count"""
+        relation = and_(FollowRelation.tracked_account_id == tracked_account_id, FollowRelation.kind == kind)
+
+        try:
+            async with async_session_scope() as session:
+                total = await session.scalar(select(func.count()).select_from(FollowRelation).where(relation))
+                rows = (await session.execute(
+                    select(InstagramUser.username, InstagramUser.full_name)
+                    .join(FollowRelation, FollowRelation.instagram_user_id == InstagramUser.id)
+                    .where(relation)
+                    .order_by(InstagramUser.username)
+                    .limit(limit)
+                )).all()
+                return rows, total
+        except Exception as e:
+            logger.error(f"Error getting {kind} relations: {e}")
+            return [], 0
@@ -1,33 +1,46 @@
+import os
 import schedule
 import time
 import threading
 from loguru import logger
 from src.services.tracking_service import TrackingService
 from src.services.user_service import UserService
+from src.services.leader_service import LeaderElection
 
 class SchedulerService:
-    def __init__(self, bot, job_callback):
+    def __init__(self, bot, job_callback, tracking_service=None, user_service=None):
         self.bot = bot
-        self.job_callback = job_callback  # Callback to handle unfollower notifications
-        self.tracking_service = TrackingService()
-        self.user_service = UserService()
+        self.job_callback = job_callback  # Called with each batch of results once alerts are in the outbox
+        self.tracking_service = tracking_service or TrackingService()
+        self.user_service = user_service or UserService()
+        self.leader = LeaderElection("scheduler")
         self.thread = None
         self.running = False
         
         # Set the initial check interval
         self.update_check_interval()
+        
+        # Reclaim storage from untracked accounts in the background
+        purge_seconds = int(os.getenv("ACCOUNT_PURGE_INTERVAL_SECONDS", "60"))
+        schedule.clear("purge")
+        schedule.every(purge_seconds).seconds.do(self.run_purge).tag("purge")
+        
+        # Move unfollowers past the retention period to archive files
+        archive_seconds = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+        schedule.clear("archive")
+        schedule.every(archive_seconds).seconds.do(self.run_archive).tag("archive")
     
     def update_check_interval(self):
         """Update the check interval from settings"""
         try:
-            # Clear all existing jobs
-            schedule.clear()
+            # Clear the existing check job
+            schedule.clear("check")
             
             # Get the check interval from settings
             interval_minutes = int(self.user_service.get_setting("check_interval", "60"))
             
             # Schedule the job with the new interval
-            schedule.every(interval_minutes).minutes.do(self.run_check)
+            schedule.every(interval_minutes).minutes.do(self.run_check).tag("check")
             logger.info(f"Scheduled follower checks every {interval_minutes} minutes")
             
             return True
@@ -37,14 +50,21 @@ class SchedulerService:
     
     def run_check(self):
         """Run a check for all tracked accounts"""
+        # Only the replica holding the leader lease runs checks
+        fencing_token = self.leader.fencing_token
+        if not self.leader.is_leader():
+            logger.info("Skipping scheduled check, this replica is not the leader")
+            return False
+        
         try:
-            logger.info("Running scheduled follower check")
-            results = self.tracking_service.check_all_accounts()
+            logger.info(f"Running scheduled follower check (fencing token {fencing_token})")
+            results = self.tracking_service.check_all_accounts(
+                should_continue=lambda: self.leader.validate(fencing_token)
+            )
             
             if results:
-                for result in results:
-                    # Call the job callback to handle notifications
-                    self.job_callback(result)
+                # Hand the whole batch to the callback so notifications can be queued together
+                self.job_callback(results)
                 
                 logger.info(f"Found unfollowers for {len(results)} accounts")
             else:
@@ -55,18 +75,42 @@ class SchedulerService:
             logger.error(f"Error running scheduled check: {e}")
             return False
     
+    def run_purge(self):
+        """Purge accounts that users stopped tracking"""
+        if not self.leader.is_leader():
+            return False
+        
+        purged = self.tracking_service.purge_deleted_accounts()
+        if purged:
+            logger.info(f"Purged {purged} untracked accounts")
+        return True
+    
+    def run_archive(self):
+        """Archive unfollowers older than the retention period"""
+        fencing_token = self.leader.fencing_token
+        if not self.leader.is_leader():
+            return False
+        
+        self.tracking_service.archive.compact(
+            should_continue=lambda: self.leader.validate(fencing_token)
+        )
+        return True
+    
     def start(self):
         """Start the scheduler in a background thread"""
         if self.running:
             return False
         
+        self.leader.start()
+        
         def run_scheduler():
             self.running = True
-            logger.info("Scheduler started")
+            logger.info(f"Scheduler started as {self.leader.holder_id}")
             
             while self.running:
                 try:
-                    schedule.run_pending()
+                    if self.leader.is_leader():
+                        schedule.run_pending()
                     time.sleep(1)
                 except Exception as e:
                     logger.error(f"Error in scheduler loop: {e}")
@@ -84,5 +128,7 @@ class SchedulerService:
             self.thread.join(timeout=1)
             self.thread = None
         
+        self.leader.stop()
+        
         logger.info("Scheduler stopped")
         return True 
\ No newline at end of file
@@ -0,0 +1,144 @@
+import os
+import threading
+from loguru import logger
+from sqlalchemy.exc import IntegrityError
+from src.db.session import get_session, close_session
+from src.db.models import CacheVersion, Settings, User
+
+class SettingsCache:
+    """In-memory copy of the settings table and the admin chat IDs.
+
+    Reads never touch the database. Writers call invalidate(), which bumps a
+    version counter row in `cache_versions` and reloads this process; other
+    processes poll that row and reload when the version changes.
+    """
+
+    VERSION_NAME = "settings"
+
+    def __init__(self, poll_seconds=None):
+        self.poll_seconds = poll_seconds or int(os.getenv("SETTINGS_CACHE_POLL_SECONDS", "10"))
+        self.settings = {}
+        self.admin_chat_ids = frozenset()
+        self.version = None
+        self.loaded = False
+        self.listeners = []  # Called with no arguments after a reload picks up a change
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.thread = None
+
+    def get(self, key, default=None):
+        """Get a setting without a database query"""
+        self._ensure_loaded()
+        return self.settings.get(key, default)
+
+    def is_admin(self, chat_id):
+        """Check the admin role without a database query"""
+        self._ensure_loaded()
+        return str(chat_id) in self.admin_chat_ids
+
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.load()
+
+    def load(self):
+        """Read all settings, admins and the current version from the database"""
+        session = get_session()
+
+        try:
+            version = session.query(CacheVersion.version).filter_by(name=self.VERSION_NAME).scalar() or 0
+            settings = {row.key: row.value for row in session.query(Settings.key, Settings.value)}
+            admins = frozenset(row.chat_id for row in session.query(User.chat_id).filter_by(is_admin=True))
+        except Exception as e:
+            logger.error(f"Error loading settings cache: {e}")
+            return False
+        finally:
+            close_session(session)
+
+        with self._lock:
+            # Replace whole objects so readers never see a half-updated cache
+            self.settings = settings
+            self.admin_chat_ids = admins
+            self.version = version
+            self.loaded = True
+
+        logger.debug(f"Loaded settings cache version {version} ({len(settings)} settings, {len(admins)} admins)")
+        return True
+
+    def invalidate(self):
+        """Bump the shared version after a write and reload this process"""
+        session = get_session()
+
+        try:
+            bumped = session.query(CacheVersion).filter_by(name=self.VERSION_NAME).update(
+                {"version": CacheVersion.version + 1},
+                synchronize_session=False
+            )
+            if not bumped:
+                session.add(CacheVersion(name=self.VERSION_NAME, version=1))
+            session.commit()
+        except IntegrityError:
+            # Another process created the row first; bump it instead
+            session.rollback()
+            session.query(CacheVersion).filter_by(name=self.VERSION_NAME).update(
+                {"version": CacheVersion.version + 1},
+                synchronize_session=False
+            )
+            session.commit()
+        except Exception as e:
+            logger.error(f"Error bumping settings cache version: {e}")
+            session.rollback()
+        finally:
+            close_session(session)
+
+        self.load()
+
+    def refresh_if_changed(self):
+        """Reload if another process bumped the version; returns True if it reloaded"""
+        session = get_session()
+
+        try:
+            version = session.query(CacheVersion.version).filter_by(name=self.VERSION_NAME).scalar() or 0
+        except Exception as e:
+            logger.error(f"Error checking settings cache version: {e}")
+            return False
+        finally:
+            close_session(session)
+
+        if version == self.version:
+            return False
+
+        logger.info(f"Settings changed (version {self.version} -> {version}), reloading cache")
+        if not self.load():
+            return False
+
+        for listener in self.listeners:
+            try:
+                listener()
+            except Exception as e:
+                logger.error(f"Settings cache listener failed: {e}")
+
+        return True
+
+    def add_listener(self, callback):
+        """Call callback after the cache reloads because of a change made elsewhere"""
+        self.listeners.append(callback)
+
+    def start(self):
+        """Start polling the version row"""
+        if self.thread:
+            return
+
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._watch, name="settings-cache", daemon=True)
+        self.thread.start()
+
+    def _watch(self):
+        while not self._stop_event.wait(self.poll_seconds):
+            self.refresh_if_changed()
+
+    def stop(self):
+        """Stop polling"""
+        self._stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+            self.thread = None
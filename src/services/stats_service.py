@@ -0,0 +1,165 @@
+import datetime
+from loguru import logger
+from sqlalchemy import func, select, update
+from src.db.session import get_session, close_session
+from src.db.async_session import async_session_scope
+from src.db.models import (
+    AccountStats, BotStat, UnfollowDay, User, TrackedAccount, Follower, Unfollower, UnfollowerArchive
+)
+
+class StatsService:
+    """Counters behind /stats, kept up to date as data changes.
+
+    Writers call the static methods with their own session so a counter
+    change commits together with the rows it counts; /stats then reads a
+    handful of small rows instead of counting the big tables.
+    """
+
+    @staticmethod
+    def increment(session, **deltas):
+        """Add to global counters in the caller's transaction"""
+        for key, delta in deltas.items():
+            if not delta:
+                continue
+
+            changed = session.query(BotStat).filter_by(key=key).update(
+                {"value": BotStat.value + delta},
+                synchronize_session=False
+            )
+            if not changed:
+                session.add(BotStat(key=key, value=delta))
+                session.flush()
+
+    @staticmethod
+    async def increment_async(session, **deltas):
+        """Async version of increment; the counters must already exist"""
+        for key, delta in deltas.items():
+            if delta:
+                await session.execute(
+                    update(BotStat).where(BotStat.key == key).values(value=BotStat.value + delta)
+                )
+
+    @staticmethod
+    def set_values(session, **values):
+        """Overwrite global values such as the last cycle's numbers"""
+        for key, value in values.items():
+            changed = session.query(BotStat).filter_by(key=key).update(
+                {"value": value},
+                synchronize_session=False
+            )
+            if not changed:
+                session.add(BotStat(key=key, value=value))
+                session.flush()
+
+    @staticmethod
+    def record_check(session, tracked_account_id, follower_count, added, removed, check_ms, fetch_ms, api_calls):
+        """Record one follower diff in the caller's transaction"""
+        stats = session.get(AccountStats, tracked_account_id)
+        if stats is None:
+            stats = AccountStats(tracked_account_id=tracked_account_id, follower_count=0, unfollower_count=0, checks=0)
+            session.add(stats)
+
+        stats.follower_count = follower_count
+        stats.unfollower_count += removed
+        stats.checks += 1
+        stats.last_check_ms = check_ms
+        stats.last_fetch_ms = fetch_ms
+        stats.last_api_calls = api_calls
+
+        StatsService.increment(
+            session,
+            followers=added - removed,
+            unfollowers=removed,
+            checks=1,
+            check_ms_total=check_ms,
+            fetch_ms_total=fetch_ms,
+            api_calls=api_calls
+        )
+
+        if removed:
+            today = datetime.datetime.utcnow().date()
+            changed = session.query(UnfollowDay).filter_by(day=today).update(
+                {"unfollowers": UnfollowDay.unfollowers + removed},
+                synchronize_session=False
+            )
+            if not changed:
+                session.add(UnfollowDay(day=today, unfollowers=removed))
+
+    def record_cycle(self, accounts, api_calls, duration_ms):
+        """Store the numbers of the check cycle that just finished"""
+        session = get_session()
+
+        try:
+            StatsService.increment(session, cycles=1)
+            StatsService.set_values(
+                session,
+                last_cycle_accounts=accounts,
+                last_cycle_api_calls=api_calls,
+                last_cycle_ms=duration_ms
+            )
+            session.commit()
+        except Exception as e:
+            logger.error(f"Error recording check cycle: {e}")
+            session.rollback()
+        finally:
+            close_session(session)
+
+    async def get_summary_async(self, days=7):
+        """Global counters and unfollows for the last few days"""
+        since = datetime.datetime.utcnow().date() - datetime.timedelta(days=days - 1)
+
+        async with async_session_scope() as session:
+            counters = dict((await session.execute(select(BotStat.key, BotStat.value))).all())
+            per_day = (await session.execute(
+                select(UnfollowDay.day, UnfollowDay.unfollowers)
+                .where(UnfollowDay.day >= since)
+                .order_by(UnfollowDay.day.desc())
+            )).all()
+
+        return counters, per_day
+
+    def rebuild(self):
+        """Recount everything from the base tables; a full scan, for repairing drift"""
+        session = get_session()
+
+        try:
+            live_accounts = TrackedAccount.deleted_at.is_(None)
+            StatsService.set_values(
+                session,
+                users=session.query(func.count(User.id)).scalar(),
+                tracked_accounts=session.query(func.count(TrackedAccount.id)).filter(live_accounts).scalar(),
+                followers=session.query(func.count(Follower.id)).scalar(),
+                unfollowers=session.query(func.count(Unfollower.id)).scalar(),
+                archived_unfollowers=session.query(func.coalesce(func.sum(UnfollowerArchive.rows), 0)).scalar()
+            )
+
+            followers = dict(
+                session.query(Follower.tracked_account_id, func.count(Follower.id))
+                .group_by(Follower.tracked_account_id)
+            )
+            unfollowers = dict(
+                session.query(Unfollower.tracked_account_id, func.count(Unfollower.id))
+                .group_by(Unfollower.tracked_account_id)
+            )
+            # Per-account totals include rows already moved to archive files
+            archived = dict(
+                session.query(UnfollowerArchive.tracked_account_id, func.sum(UnfollowerArchive.rows))
+                .group_by(UnfollowerArchive.tracked_account_id)
+            )
+            for (account_id,) in session.query(TrackedAccount.id):
+                stats = session.get(AccountStats, account_id)
+                if stats is None:
+                    stats = AccountStats(tracked_account_id=account_id, checks=0)
+                    session.add(stats)
+                stats.follower_count = followers.get(account_id, 0)
+                stats.unfollower_count = unfollowers.get(account_id, 0) + archived.get(account_id, 0)
+
+            session.commit()
+            logger.info("Rebuilt statistics from base tables")
+            return True
+        except Exception as e:
+            logger.error(f"Error rebuilding statistics: {e}")
+            session.rollback()
+            return False
+        finally:
+            close_session(session)
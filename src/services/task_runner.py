@@ -0,0 +1,125 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from src.db.session import unit_of_work
+
+class OperationCancelled(Exception):
+    """Raised inside a background task when the user cancelled it"""
+
+
+class TaskAlreadyRunning(RuntimeError):
+    """Raised by BackgroundTaskRunner.run when the key already has a task"""
+
+
+class TaskContext:
+    """Handle passed to a blocking operation running on the task executor.
+
+    Lets the operation report progress back to the event loop and notice
+    cancellation between steps.
+    """
+
+    def __init__(self, loop, on_progress=None, progress_interval=2.0):
+        self.loop = loop
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+        self.cancel_event = threading.Event()
+        self._last_progress = 0.0
+
+    @property
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def check_cancelled(self):
+        """Raise OperationCancelled if the task was cancelled"""
+        if self.cancel_event.is_set():
+            raise OperationCancelled()
+
+    def sleep(self, seconds):
+        """Sleep that wakes up early and raises when the task is cancelled"""
+        if self.cancel_event.wait(seconds):
+            raise OperationCancelled()
+
+    def report(self, **progress):
+        """Send progress to the event loop, throttled to avoid flooding message edits"""
+        if not self.on_progress:
+            return
+
+        now = time.monotonic()
+        if now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+
+        self.loop.call_soon_threadsafe(self._schedule_progress, progress)
+
+    def _schedule_progress(self, progress):
+        task = asyncio.ensure_future(self.on_progress(progress))
+        task.add_done_callback(self._log_progress_error)
+
+    @staticmethod
+    def _log_progress_error(task):
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Progress callback failed: {task.exception()}")
+
+
+class BackgroundTaskRunner:
+    """Runs blocking Instagram operations on a bounded thread pool.
+
+    At most one task runs per key (the chat ID), so a user can't start a
+    second long operation before the first one finishes or is cancelled.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or int(os.getenv("BLOCKING_TASK_WORKERS", "4"))
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="blocking-task")
+        self.tasks = {}
+
+    def is_running(self, key):
+        """Check if a task is already running for the key
+
+        Only a hint for replying early: another update can start a task while
+        the caller awaits, so run() still raises TaskAlreadyRunning.
+        """
+        return key in self.tasks
+
+    async def run(self, key, func, *args, on_progress=None, **kwargs):
+        """Run func(*args, task=context, **kwargs) on the executor and await its result"""
+        if key in self.tasks:
+            raise TaskAlreadyRunning(f"A task is already running for {key}")
+
+        loop = asyncio.get_running_loop()
+        context = TaskContext(loop, on_progress)
+        self.tasks[key] = context
+
+        try:
+            return await loop.run_in_executor(
+                self.executor,
+                functools.partial(self._call, func, *args, task=context, **kwargs)
+            )
+        finally:
+            self.tasks.pop(key, None)
+
+    @staticmethod
+    def _call(func, *args, **kwargs):
+        """Run one task on an executor thread inside its own unit of work"""
+        with unit_of_work(f"task:{func.__name__}"):
+            return func(*args, **kwargs)
+
+    def cancel(self, key):
+        """Ask the task for the key to stop at its next checkpoint"""
+        context = self.tasks.get(key)
+        if not context:
+            return False
+
+        context.cancel_event.set()
+        logger.info(f"Cancellation requested for task {key}")
+        return True
+
+    def shutdown(self):
+        """Cancel running tasks and stop the executor"""
+        for context in self.tasks.values():
+            context.cancel_event.set()
+        self.executor.shutdown(wait=False)
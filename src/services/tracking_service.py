@@ -1,14 +1,64 @@
+import asyncio
 import datetime
+from array import array
+import heapq
+import os
+import time
 from loguru import logger
-from src.db.session import get_session, close_session
-from src.db.models import TrackedAccount, Follower, Unfollower
+from sqlalchemy import DateTime, and_, delete, exists, func, insert, literal, or_, select, tuple_
+from src.db.session import get_session, close_session, unit_of_work
+from src.db.async_session import async_session_scope
+from src.db.models import (
+    TrackedAccount, Follower, FollowerDiff, FollowerStaging, FollowerSuspect, Following, FollowRelation,
+    Unfollower, InstagramUser
+)
+from src.services.archive_service import ArchiveService
+from src.services.directory_service import DirectoryService
 from src.services.instagram_service import InstagramService
+from src.services.outbox_service import OutboxService
+from src.services.relation_service import RelationService
+from src.services.stats_service import StatsService
+from src.services.task_runner import OperationCancelled
+from src.utils import follower_hash
+
+# A fetch missing at least TRUNCATION_MIN_MISSING followers is only trusted if it
+# got within TRUNCATION_TOLERANCE of the profile's follower count
+TRUNCATION_MIN_MISSING = int(os.getenv("TRUNCATION_MIN_MISSING", "20"))
+TRUNCATION_TOLERANCE = float(os.getenv("TRUNCATION_TOLERANCE", "0.02"))
+
+# Suspects checked one by one per check while fetches keep looking truncated
+SUSPECT_RECHECK_LIMIT = int(os.getenv("SUSPECT_RECHECK_LIMIT", "20"))
+
+# Rows written per transaction when applying a follower diff, so other writers
+# get the database between chunks
+DIFF_CHUNK_SIZE = int(os.getenv("DIFF_CHUNK_SIZE", "5000"))
+
+# IDs read per round trip when updating the follower hash
+HASH_BATCH_SIZE = 10000
+
+# Fetched IDs sorted per run; only a run at a time is turned into Python ints
+ID_SORT_RUN_SIZE = 65536
+
+# Rows deleted per transaction when purging untracked accounts
+PURGE_BATCH_SIZE = int(os.getenv("ACCOUNT_PURGE_BATCH_SIZE", "5000"))
+
+# Per-account tables purged in batches: model, column to batch on, stats counter
+PURGED_TABLES = (
+    (FollowerStaging, "instagram_user_id", None),
+    (FollowerSuspect, "instagram_user_id", None),
+    (FollowRelation, "instagram_user_id", None),
+    (Following, "instagram_user_id", None),
+    (Follower, "id", "followers"),
+    (Unfollower, "id", "unfollowers")
+)
 
 class TrackingService:
-    def __init__(self):
-        self.instagram_service = InstagramService()
+    def __init__(self, instagram_service=None, archive_service=None):
+        self.instagram_service = instagram_service or InstagramService()
+        self.archive = archive_service or ArchiveService()
+        self.stats = StatsService()
     
-    def start_tracking(self, user_id, instagram_username):
+    def start_tracking(self, user_id, instagram_username, task=None):
         """Start tracking an Instagram account's followers"""
         session = get_session()
         
@@ -25,7 +75,8 @@ class TrackingService:
             # Check if already tracking
             existing = session.query(TrackedAccount).filter_by(
                 user_id=user_id, 
-                instagram_username=instagram_username
+                instagram_username=instagram_username,
+                deleted_at=None
             ).first()
             
             if existing:
@@ -48,12 +99,21 @@ class TrackingService:
             )
             
             session.add(tracked_account)
+            StatsService.increment(session, tracked_accounts=1)
             session.commit()
             
             # If the account is public, save the initial followers
             if not is_private:
                 logger.info(f"Account {instagram_username} is public, fetching followers")
-                self.update_followers(tracked_account.id)
+                tracked_account_id = tracked_account.id
+                try:
+                    self.update_followers(tracked_account_id, task=task)
+                except OperationCancelled:
+                    # Don't leave a half-initialized account behind
+                    session.query(TrackedAccount).filter_by(id=tracked_account_id).delete()
+                    StatsService.increment(session, tracked_accounts=-1)
+                    session.commit()
+                    return False, "Cancelled"
                 return True, "Started tracking followers successfully"
             else:
                 # For private accounts, we don't try to send follow request automatically
@@ -69,12 +129,12 @@ class TrackingService:
         finally:
             close_session(session)
     
-    def confirm_follow_accepted(self, tracked_account_id):
+    def confirm_follow_accepted(self, tracked_account_id, task=None):
         """Confirm that a follow request has been accepted and save initial followers"""
         session = get_session()
         
         try:
-            tracked_account = session.query(TrackedAccount).filter_by(id=tracked_account_id).first()
+            tracked_account = session.query(TrackedAccount).filter_by(id=tracked_account_id, deleted_at=None).first()
             if not tracked_account:
                 close_session(session)
                 return False, "Tracked account not found"
@@ -92,7 +152,7 @@ class TrackingService:
             # Now try to update followers
             try:
                 logger.info(f"Attempting to get followers for {username}")
-                result = self.update_followers(tracked_account_id)
+                result = self.update_followers(tracked_account_id, task=task)
                 
                 if result is not False:  # Check if not False (could be empty list which is valid)
                     tracked_account.follow_requested = False
@@ -104,6 +164,8 @@ class TrackingService:
                     logger.error(f"Failed to get followers for {username}")
                     return False, "Не удалось получить список подписчиков. Убедитесь, что ручная подписка была принята."
                 
+            except OperationCancelled:
+                return False, "Отменено"
             except Exception as e:
                 logger.error(f"Error getting followers: {e}")
                 return False, f"Ошибка при получении подписчиков: {str(e)}"
@@ -115,96 +177,570 @@ class TrackingService:
         finally:
             close_session(session)
     
-    def update_followers(self, tracked_account_id):
-        """Update the followers for a tracked account"""
+    def update_followers(self, tracked_account_id, task=None, cycle=None):
+        """Update the followers for a tracked account
+        
+        The follower list is streamed page by page into the directory, while
+        the IDs are collected in an array of 8-byte integers, sorted in runs of
+        ID_SORT_RUN_SIZE and merged without repeats. If their hash
+        matches the stored one, nothing else is read or written. Otherwise they
+        go to the follower_staging table and are diffed against followers in SQL. The diff is applied in
+        transactions of at most DIFF_CHUNK_SIZE rows, tracked in follower_diffs;
+        a check that finds an unfinished diff finishes it instead of fetching.
+        Raises OperationCancelled if the task is cancelled while fetching. API
+        calls made are added to cycle["api_calls"] when a cycle dict is passed.
+        """
         session = get_session()
+        started = time.perf_counter()
+        fetch_stats = {"api_calls": 0}
         
         try:
-            tracked_account = session.query(TrackedAccount).filter_by(id=tracked_account_id).first()
+            tracked_account = session.query(TrackedAccount).filter_by(id=tracked_account_id, deleted_at=None).first()
             if not tracked_account:
                 close_session(session)
                 return False
             
-            # Get current followers
-            followers = self.instagram_service.get_followers(user_id=tracked_account.instagram_user_id)
-            if not followers:
-                close_session(session)
+            diff = session.get(FollowerDiff, tracked_account_id)
+            if diff is not None:
+                logger.info(f"Resuming the unfinished follower diff of {tracked_account.instagram_username}")
+                return self._apply_diff(session, tracked_account, diff, started)
+            
+            stored_hash = tracked_account.followers_hash
+            
+            # Get current followers. Names are refreshed one short transaction per
+            # page (rows only change on a rename); IDs wait in a compact array until
+            # the hash shows whether the set changed
+            self._clear_staging(session, tracked_account_id)
+            fetched = array("q")
+            runs = [0]
+            for page in self.instagram_service.iter_follower_records(
+                tracked_account.instagram_user_id,
+                task=task,
+                stats=fetch_stats
+            ):
+                DirectoryService.upsert(session, page)
+                session.commit()
+                fetched.extend(record.instagram_user_id for record in page)
+                if len(fetched) - runs[-1] >= ID_SORT_RUN_SIZE:
+                    self._sort_run(fetched, runs)
+            self._sort_run(fetched, runs)
+            fetch_ms = int((time.perf_counter() - started) * 1000)
+            
+            fetched_count = fetched_hash = 0
+            for user_ids in self._unique_ids(fetched, runs):
+                fetched_count += len(user_ids)
+                fetched_hash = follower_hash.add_ids(fetched_hash, user_ids)
+            if not fetched_count:
                 return False
             
-            # Get existing followers from database
-            existing_followers = session.query(Follower).filter_by(tracked_account_id=tracked_account_id).all()
-            existing_follower_ids = {f.instagram_user_id for f in existing_followers}
+            check_time = datetime.datetime.utcnow()
+            if stored_hash is not None and follower_hash.from_column(stored_hash) == fetched_hash:
+                # Same set as last time: nothing to diff or write, and every suspect is back
+                session.query(FollowerSuspect).filter_by(tracked_account_id=tracked_account_id).delete(
+                    synchronize_session=False
+                )
+                tracked_account.last_check = check_time
+                StatsService.record_check(
+                    session,
+                    tracked_account_id,
+                    follower_count=fetched_count,
+                    added=0,
+                    removed=0,
+                    check_ms=int((time.perf_counter() - started) * 1000),
+                    fetch_ms=fetch_ms,
+                    api_calls=fetch_stats["api_calls"]
+                )
+                session.commit()
+                return []
+            
+            # The set changed: stage the IDs for the SQL diff
+            for user_ids in self._unique_ids(fetched, runs):
+                session.execute(insert(FollowerStaging), [
+                    {"tracked_account_id": tracked_account_id, "instagram_user_id": user_id}
+                    for user_id in user_ids
+                ])
+                session.commit()
+            del fetched
             
-            # Identify new and current followers
-            current_follower_ids = {f["instagram_user_id"] for f in followers}
+            staged = FollowerStaging.tracked_account_id == tracked_account_id
+            follower_count = fetched_count
+            missing = session.scalar(
+                select(func.count()).select_from(Follower).where(self._missing_followers(tracked_account_id))
+            )
             
-            # Identify unfollowers (followers that exist in database but not in current followers)
-            unfollower_ids = existing_follower_ids - current_follower_ids
+            # Decide before writing anything, so no write lock is held during API calls
+            trusted = self._fetch_trusted(tracked_account, fetch_stats, follower_count, missing)
+            confirmed, cleared = [], []
+            if not trusted:
+                confirmed, cleared = self._recheck_suspects(session, tracked_account, fetch_stats)
+            
+            # Record the diff before applying it, so it can be finished after a crash
+            diff = FollowerDiff(
+                tracked_account_id=tracked_account_id,
+                check_time=check_time,
+                trusted=trusted,
+                follower_count=follower_count if trusted else follower_count + missing,
+                added=0,
+                removed=0,
+                followers_hash=stored_hash,
+                fetch_ms=fetch_ms,
+                api_calls=fetch_stats["api_calls"]
+            )
+            session.add(diff)
             
-            # Add new followers to database
-            for follower_data in followers:
-                if follower_data["instagram_user_id"] not in existing_follower_ids:
-                    new_follower = Follower(
-                        instagram_user_id=follower_data["instagram_user_id"],
-                        username=follower_data["username"],
-                        full_name=follower_data["full_name"],
-                        tracked_account_id=tracked_account_id
+            is_suspect = FollowerSuspect.tracked_account_id == tracked_account_id
+            if trusted:
+                session.query(FollowerSuspect).filter(is_suspect).delete(synchronize_session=False)
+            else:
+                if missing:
+                    # Quarantine: the missing followers stay followers until confirmed
+                    logger.warning(
+                        f"Follower list of {tracked_account.instagram_username} looks truncated "
+                        f"({follower_count} fetched, {missing} missing); holding back unfollowers"
                     )
-                    session.add(new_follower)
+                    session.execute(insert(FollowerSuspect).from_select(
+                        ["tracked_account_id", "instagram_user_id", "missing_since"],
+                        select(
+                            literal(tracked_account_id),
+                            Follower.instagram_user_id,
+                            literal(check_time, DateTime)
+                        ).where(self._missing_followers(tracked_account_id), ~exists().where(
+                            is_suspect, FollowerSuspect.instagram_user_id == Follower.instagram_user_id
+                        ))
+                    ))
+                session.query(FollowerSuspect).filter(is_suspect, or_(
+                    FollowerSuspect.instagram_user_id.in_(cleared + confirmed),
+                    exists().where(staged, FollowerStaging.instagram_user_id == FollowerSuspect.instagram_user_id)
+                )).delete(synchronize_session=False)
+                
+                # At most SUSPECT_RECHECK_LIMIT rows, so they go with the first transaction
+                if confirmed:
+                    self._move_to_unfollowers(session, diff, confirmed)
+            
+            session.commit()
+            return self._apply_diff(session, tracked_account, diff, started)
             
-            # Process unfollowers
-            unfollowers_data = []
-            for unfollower_id in unfollower_ids:
-                # Get the follower object
-                follower = next((f for f in existing_followers if f.instagram_user_id == unfollower_id), None)
+        except OperationCancelled:
+            session.rollback()
+            self._clear_staging(session, tracked_account_id)
+            raise
+        except Exception as e:
+            logger.error(f"Error updating followers: {e}")
+            session.rollback()
+            self._clear_staging(session, tracked_account_id)
+            return False
+        finally:
+            if cycle is not None:
+                cycle["api_calls"] = cycle.get("api_calls", 0) + fetch_stats["api_calls"]
+            close_session(session)
+    
+    def _apply_diff(self, session, tracked_account, diff, started):
+        """Apply a recorded diff chunk by chunk, then queue its alert and record the check
+        
+        Each chunk commits together with the running totals in the diff row, and
+        picks its rows by comparing follower_staging with followers, so running
+        this again after a crash continues where it stopped.
+        """
+        tracked_account_id = tracked_account.id
+        staged = FollowerStaging.tracked_account_id == tracked_account_id
+        is_follower = exists().where(
+            Follower.tracked_account_id == tracked_account_id,
+            Follower.instagram_user_id == FollowerStaging.instagram_user_id
+        )
+        
+        # New followers
+        while True:
+            user_ids = session.scalars(
+                select(FollowerStaging.instagram_user_id).where(staged, ~is_follower)
+                .order_by(FollowerStaging.instagram_user_id)
+                .limit(DIFF_CHUNK_SIZE)
+            ).all()
+            if not user_ids:
+                break
+            
+            session.execute(insert(Follower), [
+                {"instagram_user_id": user_id, "tracked_account_id": tracked_account_id, "created_at": diff.check_time}
+                for user_id in user_ids
+            ])
+            diff.added += len(user_ids)
+            if diff.followers_hash is not None:
+                diff.followers_hash = follower_hash.to_column(
+                    follower_hash.add_ids(follower_hash.from_column(diff.followers_hash), user_ids)
+                )
+            session.commit()
+        
+        # Unfollowers, unless the fetch looked truncated
+        while diff.trusted:
+            user_ids = session.scalars(
+                select(Follower.instagram_user_id).where(self._missing_followers(tracked_account_id))
+                .order_by(Follower.instagram_user_id)
+                .limit(DIFF_CHUNK_SIZE)
+            ).all()
+            if not user_ids:
+                break
+            
+            self._move_to_unfollowers(session, diff, user_ids)
+            session.commit()
+        
+        # Names for the alert, read back through ix_unfollowers_account_time
+        unfollowers_data = []
+        if diff.removed:
+            unfollowers_data = [
+                {"username": username, "full_name": full_name}
+                for username, full_name in session.execute(
+                    select(InstagramUser.username, InstagramUser.full_name)
+                    .join(Unfollower, Unfollower.instagram_user_id == InstagramUser.id)
+                    .where(Unfollower.tracked_account_id == tracked_account_id, Unfollower.unfollowed_at == diff.check_time)
+                )
+            ]
+        
+        new_hash = diff.followers_hash
+        if new_hash is None:
+            new_hash = follower_hash.to_column(follower_hash.add_ids(0, session.scalars(
+                select(Follower.instagram_user_id).where(Follower.tracked_account_id == tracked_account_id)
+                .execution_options(yield_per=HASH_BATCH_SIZE)
+            )))
+        
+        # Update the last_check timestamp
+        tracked_account.last_check = diff.check_time
+        tracked_account.followers_hash = new_hash
+        
+        # Queue the alert in the same transaction so it can't be lost
+        if unfollowers_data:
+            OutboxService.add_unfollowers(session, tracked_account, unfollowers_data, diff.check_time)
+        
+        StatsService.record_check(
+            session,
+            tracked_account_id,
+            follower_count=diff.follower_count if diff.trusted else diff.follower_count - diff.removed,
+            added=diff.added,
+            removed=diff.removed,
+            check_ms=int((time.perf_counter() - started) * 1000),
+            fetch_ms=diff.fetch_ms or 0,
+            api_calls=diff.api_calls or 0
+        )
+        
+        session.delete(diff)
+        session.commit()
+        
+        self._clear_staging(session, tracked_account_id)
+        return unfollowers_data
+    
+    @staticmethod
+    def _missing_followers(tracked_account_id):
+        """Condition for followers of the account that the current fetch didn't return"""
+        return and_(
+            Follower.tracked_account_id == tracked_account_id,
+            ~exists().where(
+                FollowerStaging.tracked_account_id == tracked_account_id,
+                FollowerStaging.instagram_user_id == Follower.instagram_user_id
+            )
+        )
+    
+    def _fetch_trusted(self, tracked_account, fetch_stats, follower_count, missing):
+        """Whether a fetch is complete enough to turn missing followers into unfollowers
+        
+        A fetch that stopped before the last page never is. Otherwise, when many
+        followers are missing, the fetched count must be close to the count the
+        profile shows.
+        """
+        if not fetch_stats.get("complete"):
+            logger.warning(f"Follower fetch of {tracked_account.instagram_username} ended before the last page")
+            return False
+        if missing < TRUNCATION_MIN_MISSING:
+            return True
+        
+        expected = self.instagram_service.get_follower_count(tracked_account.instagram_user_id, stats=fetch_stats)
+        if expected is None:
+            return False
+        return follower_count >= expected * (1 - TRUNCATION_TOLERANCE)
+    
+    def _recheck_suspects(self, session, tracked_account, fetch_stats):
+        """Check suspects still missing from this fetch one by one; returns (confirmed, cleared) IDs"""
+        refetched = exists().where(
+            FollowerStaging.tracked_account_id == tracked_account.id,
+            FollowerStaging.instagram_user_id == FollowerSuspect.instagram_user_id
+        )
+        suspects = session.execute(
+            select(FollowerSuspect.instagram_user_id, InstagramUser.username)
+            .join(InstagramUser, InstagramUser.id == FollowerSuspect.instagram_user_id)
+            .where(
+                FollowerSuspect.tracked_account_id == tracked_account.id,
+                InstagramUser.username.isnot(None),
+                ~refetched
+            )
+            .order_by(FollowerSuspect.missing_since)
+            .limit(SUSPECT_RECHECK_LIMIT)
+        ).all()
+        
+        confirmed, cleared = [], []
+        for user_id, username in suspects:
+            following = self.instagram_service.is_follower(
+                tracked_account.instagram_user_id, user_id, username, stats=fetch_stats
+            )
+            if following is None:
+                break  # The API is struggling; try the rest next time
+            (cleared if following else confirmed).append(user_id)
+        
+        if suspects:
+            logger.info(
+                f"Rechecked {len(confirmed) + len(cleared)} suspects of {tracked_account.instagram_username}: "
+                f"{len(confirmed)} unfollowed, {len(cleared)} still following"
+            )
+        return confirmed, cleared
+    
+    @staticmethod
+    def _move_to_unfollowers(session, diff, user_ids):
+        """Turn these followers into unfollowers in the caller's transaction"""
+        session.execute(insert(Unfollower), [
+            {"instagram_user_id": user_id, "tracked_account_id": diff.tracked_account_id, "unfollowed_at": diff.check_time}
+            for user_id in user_ids
+        ])
+        session.query(Follower).filter(
+            Follower.tracked_account_id == diff.tracked_account_id,
+            Follower.instagram_user_id.in_(user_ids)
+        ).delete(synchronize_session=False)
+        
+        diff.removed += len(user_ids)
+        if diff.followers_hash is not None:
+            diff.followers_hash = follower_hash.to_column(
+                follower_hash.remove_ids(follower_hash.from_column(diff.followers_hash), user_ids)
+            )
+    
+    @staticmethod
+    def _sort_run(user_ids, runs):
+        """Sort the IDs appended since the last run in place and start a new run"""
+        start = runs[-1]
+        if len(user_ids) > start:
+            user_ids[start:] = array("q", sorted(user_ids[start:]))
+            runs.append(len(user_ids))
+    
+    @staticmethod
+    def _unique_ids(user_ids, runs):
+        """Sorted IDs without the repeats that overlapping pages produce, DIFF_CHUNK_SIZE at a time
+        
+        The sorted runs are merged straight out of the array, so no more than
+        a chunk of IDs is held as Python ints.
+        """
+        view = memoryview(user_ids)
+        chunk = array("q")
+        previous = None
+        for user_id in heapq.merge(*(view[start:end] for start, end in zip(runs, runs[1:]))):
+            if user_id != previous:
+                chunk.append(user_id)
+                previous = user_id
+                if len(chunk) == DIFF_CHUNK_SIZE:
+                    yield chunk
+                    chunk = array("q")
+        if chunk:
+            yield chunk
+    
+    @staticmethod
+    def _clear_staging(session, tracked_account_id):
+        """Drop what a previous or failed check left in the staging table
+        
+        Staging rows of a diff that is still being applied are kept, since
+        the next check resumes from them.
+        """
+        try:
+            if session.get(FollowerDiff, tracked_account_id) is not None:
+                return
+            
+            # Usually there is nothing to clear; don't start a write for it
+            if not session.scalar(select(exists().where(FollowerStaging.tracked_account_id == tracked_account_id))):
+                return
+            
+            while True:
+                batch = (
+                    select(FollowerStaging.instagram_user_id)
+                    .where(FollowerStaging.tracked_account_id == tracked_account_id)
+                    .limit(DIFF_CHUNK_SIZE)
+                )
+                deleted = session.query(FollowerStaging).filter(
+                    FollowerStaging.tracked_account_id == tracked_account_id,
+                    FollowerStaging.instagram_user_id.in_(batch.scalar_subquery())
+                ).delete(synchronize_session=False)
+                session.commit()
                 
-                if follower:
-                    # Create unfollower record
-                    unfollower = Unfollower(
-                        instagram_user_id=follower.instagram_user_id,
-                        username=follower.username,
-                        full_name=follower.full_name,
-                        tracked_account_id=tracked_account_id
-                    )
-                    session.add(unfollower)
-                    
-                    # Add to return data
-                    unfollowers_data.append({
-                        "username": follower.username,
-                        "full_name": follower.full_name
-                    })
-                    
-                    # Delete the follower record
-                    session.delete(follower)
+                if deleted < DIFF_CHUNK_SIZE:
+                    break
+        except Exception as e:
+            logger.error(f"Error clearing follower staging: {e}")
+            session.rollback()
+    
+    def update_following(self, tracked_account_id, task=None, cycle=None):
+        """Update the following snapshot of an account that opted in, then its relations
+        
+        Instagram caps following lists at 7,500 accounts, so unlike followers
+        the fetched IDs are diffed as a set in memory; names still go to the
+        directory one page at a time. A fetch that stopped before the last page
+        only adds followings. The relations are refreshed from the stored
+        snapshots even if the fetch fails, since the followers may have changed.
+        Returns False if the account doesn't track its following or the fetch
+        failed. Raises OperationCancelled if the task is cancelled while fetching.
+        """
+        session = get_session()
+        fetch_stats = {"api_calls": 0}
+        
+        try:
+            tracked_account = session.query(TrackedAccount).filter_by(
+                id=tracked_account_id, deleted_at=None, track_following=True
+            ).first()
+            if not tracked_account:
+                return False
             
-            # Update the last_check timestamp
-            tracked_account.last_check = datetime.datetime.utcnow()
+            fetched = set()
+            try:
+                for page in self.instagram_service.get_following(
+                    tracked_account.instagram_user_id,
+                    task=task,
+                    stats=fetch_stats
+                ):
+                    DirectoryService.upsert(session, page)
+                    session.commit()
+                    fetched.update(record.instagram_user_id for record in page)
+            except OperationCancelled:
+                raise
+            except Exception as e:
+                logger.error(f"Error fetching following of {tracked_account.instagram_username}: {e}")
+                session.rollback()
+                fetched = None
             
+            if fetched:
+                self._apply_following(session, tracked_account, fetched, fetch_stats.get("complete"))
+            RelationService.refresh(session, tracked_account_id)
             session.commit()
-            return unfollowers_data
+            return bool(fetched)
             
+        except OperationCancelled:
+            session.rollback()
+            raise
         except Exception as e:
-            logger.error(f"Error updating followers: {e}")
+            logger.error(f"Error updating following: {e}")
             session.rollback()
             return False
+        finally:
+            if cycle is not None:
+                cycle["api_calls"] = cycle.get("api_calls", 0) + fetch_stats["api_calls"]
+            close_session(session)
+    
+    @staticmethod
+    def _apply_following(session, tracked_account, fetched, complete):
+        """Bring the stored following snapshot in line with a fetched ID set"""
+        tracked_account_id = tracked_account.id
+        stored = set(session.scalars(
+            select(Following.instagram_user_id).where(Following.tracked_account_id == tracked_account_id)
+        ))
+        check_time = datetime.datetime.utcnow()
+        
+        # Start dates are only known from the second snapshot on
+        created_at = check_time if tracked_account.following_checked_at else None
+        added = fetched - stored
+        if added:
+            session.execute(insert(Following), [
+                {"tracked_account_id": tracked_account_id, "instagram_user_id": user_id, "created_at": created_at}
+                for user_id in added
+            ])
+        
+        removed = stored - fetched if complete else set()
+        if removed:
+            session.execute(delete(Following).where(
+                Following.tracked_account_id == tracked_account_id,
+                Following.instagram_user_id.in_(removed)
+            ))
+        
+        tracked_account.following_checked_at = check_time
+        logger.info(
+            f"Following of {tracked_account.instagram_username}: {len(fetched)} fetched, "
+            f"{len(added)} new, {len(removed)} gone"
+        )
+    
+    def set_following_tracking(self, user_id, tracked_account_id, enabled, task=None):
+        """Turn following tracking on or off for one of a user's accounts
+        
+        Turning it on fetches the first snapshot right away, so the relations
+        are there before the next check; turning it off drops the snapshot.
+        Returns (success, message).
+        """
+        session = get_session()
+        
+        try:
+            tracked_account = session.query(TrackedAccount).filter_by(
+                id=tracked_account_id,
+                user_id=user_id,
+                deleted_at=None
+            ).first()
+            if not tracked_account:
+                return False, "Tracked account not found"
+            
+            if not enabled:
+                tracked_account.track_following = False
+                tracked_account.following_checked_at = None
+                RelationService.clear(session, tracked_account_id)
+                session.commit()
+                return True, f"Stopped tracking who @{tracked_account.instagram_username} follows"
+            
+            if tracked_account.follow_requested:
+                return False, "The follow request for this account hasn't been confirmed yet"
+            
+            username = tracked_account.instagram_username
+            tracked_account.track_following = True
+            session.commit()
+            
+            # update_following closes its session, which may be this one
+            try:
+                fetched = self.update_following(tracked_account_id, task=task)
+            except OperationCancelled:
+                session = get_session()
+                session.query(TrackedAccount).filter_by(id=tracked_account_id).update({"track_following": False})
+                session.commit()
+                return False, "Cancelled"
+            
+            if not fetched:
+                return False, "Could not fetch the following list; it will be retried on the next check"
+            return True, f"Now tracking who @{username} follows"
+            
+        except Exception as e:
+            logger.error(f"Error changing following tracking: {e}")
+            session.rollback()
+            return False, f"Error: {str(e)}"
         finally:
             close_session(session)
     
-    def check_all_accounts(self):
-        """Check all tracked accounts for unfollowers"""
+    def check_all_accounts(self, should_continue=None):
+        """Check all tracked accounts for unfollowers
+        
+        should_continue is called before each account; returning False stops the
+        check early (used by the scheduler when it loses leadership). Each account
+        is checked in its own unit of work.
+        """
         session = get_session()
         results = []
+        cycle = {"api_calls": 0}
+        started = time.perf_counter()
+        checked = 0
         
         try:
-            tracked_accounts = session.query(TrackedAccount).all()
+            # Plain rows, so nothing stays attached to this session during the checks
+            tracked_accounts = session.query(
+                TrackedAccount.id,
+                TrackedAccount.user_id,
+                TrackedAccount.instagram_username,
+                TrackedAccount.track_following
+            ).filter_by(follow_requested=False, deleted_at=None).all()
+            close_session(session)
             
             for account in tracked_accounts:
-                # Skip accounts with pending follow requests
-                if account.follow_requested:
-                    continue
+                if should_continue and not should_continue():
+                    logger.warning("Stopping account check early")
+                    break
                 
                 # Check for unfollowers
-                unfollowers = self.update_followers(account.id)
+                with unit_of_work(f"check:{account.instagram_username}"):
+                    unfollowers = self.update_followers(account.id, cycle=cycle)
+                    if account.track_following:
+                        self.update_following(account.id, cycle=cycle)
+                checked += 1
                 
                 if unfollowers and len(unfollowers) > 0:
                     results.append({
@@ -213,6 +749,11 @@ class TrackingService:
                         "unfollowers": unfollowers
                     })
             
+            self.stats.record_cycle(
+                accounts=checked,
+                api_calls=cycle["api_calls"],
+                duration_ms=int((time.perf_counter() - started) * 1000)
+            )
             return results
             
         except Exception as e:
@@ -226,7 +767,7 @@ class TrackingService:
         session = get_session()
         
         try:
-            accounts = session.query(TrackedAccount).filter_by(user_id=user_id).all()
+            accounts = session.query(TrackedAccount).filter_by(user_id=user_id, deleted_at=None).all()
             return accounts
         except Exception as e:
             logger.error(f"Error getting tracked accounts: {e}")
@@ -234,21 +775,128 @@ class TrackingService:
         finally:
             close_session(session)
     
+    async def get_tracked_accounts_async(self, user_id):
+        """Async version of get_tracked_accounts for Telegram handlers"""
+        try:
+            async with async_session_scope() as session:
+                result = await session.execute(select(TrackedAccount).filter_by(user_id=user_id, deleted_at=None))
+                return result.scalars().all()
+        except Exception as e:
+            logger.error(f"Error getting tracked accounts: {e}")
+            return []
+    
+    async def get_tracked_account_async(self, user_id, instagram_username):
+        """Find a user's tracked account by Instagram username"""
+        try:
+            async with async_session_scope() as session:
+                result = await session.execute(
+                    select(TrackedAccount).filter_by(
+                        user_id=user_id,
+                        instagram_username=instagram_username,
+                        deleted_at=None
+                    )
+                )
+                return result.scalars().first()
+        except Exception as e:
+            logger.error(f"Error getting tracked account: {e}")
+            return None
+    
+    async def get_unfollower_page_async(self, tracked_account_id, limit, before=None, after=None,
+                                        since=None, until=None, prefix=None):
+        """One page of an account's unfollow history, newest first
+        
+        Uses keyset pagination on (unfollowed_at, id), which the
+        ix_unfollowers_account_time index serves directly, so a page costs the
+        same however deep it is. before/after are (unfollowed_at, id) cursors
+        from the last/first row of the current page. Returns (rows, has_more),
+        where has_more tells whether rows exist past the page in the direction read.
+        
+        Rows past the retention period live in archive files; they are always
+        older than the table's rows, so a page that runs out of table rows
+        continues into the archive, and paging back reads the archive first.
+        """
+        query = (
+            select(
+                Unfollower.id, Unfollower.instagram_user_id, InstagramUser.username,
+                InstagramUser.full_name, Unfollower.unfollowed_at
+            )
+            .join(InstagramUser, InstagramUser.id == Unfollower.instagram_user_id)
+            .where(Unfollower.tracked_account_id == tracked_account_id)
+        )
+        
+        if since:
+            query = query.where(Unfollower.unfollowed_at >= since)
+        if until:
+            query = query.where(Unfollower.unfollowed_at < until)
+        if prefix:
+            escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            query = query.where(InstagramUser.username.ilike(f"{escaped}%", escape="\\"))
+        
+        position = tuple_(Unfollower.unfollowed_at, Unfollower.id)
+        if after:
+            # Going back towards newer rows: read upwards, then flip
+            query = query.where(position > tuple_(*after)).order_by(
+                Unfollower.unfollowed_at.asc(), Unfollower.id.asc()
+            )
+        else:
+            if before:
+                query = query.where(position < tuple_(*before))
+            query = query.order_by(Unfollower.unfollowed_at.desc(), Unfollower.id.desc())
+        
+        try:
+            async with async_session_scope() as session:
+                rows = (await session.execute(query.limit(limit + 1))).all()
+        except Exception as e:
+            logger.error(f"Error getting unfollower history: {e}")
+            return [], False
+        
+        loop = asyncio.get_running_loop()
+        if after:
+            # Newer rows than the cursor may still be in the archive
+            archived = await loop.run_in_executor(
+                None, self.archive.read_page, tracked_account_id, limit + 1, None, after, since, until, prefix
+            )
+            rows = archived + rows
+        elif len(rows) <= limit:
+            # Table exhausted in this direction: continue into the archive
+            edge = (rows[-1].unfollowed_at, rows[-1].id) if rows else before
+            archived = await loop.run_in_executor(
+                None, self.archive.read_page, tracked_account_id, limit + 1 - len(rows), edge, None, since, until, prefix
+            )
+            rows = rows + archived
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if after:
+            rows.reverse()
+        
+        return rows, has_more
+    
     def stop_tracking(self, user_id, tracked_account_id):
-        """Stop tracking an Instagram account"""
+        """Stop tracking an Instagram account
+        
+        The account is only marked as deleted here, so this returns right away;
+        purge_deleted_accounts removes it and its followers later.
+        """
         session = get_session()
         
         try:
             tracked_account = session.query(TrackedAccount).filter_by(
                 id=tracked_account_id, 
-                user_id=user_id
+                user_id=user_id,
+                deleted_at=None
             ).first()
             
             if not tracked_account:
                 close_session(session)
                 return False, "Tracked account not found"
             
-            session.delete(tracked_account)
+            tracked_account.deleted_at = datetime.datetime.utcnow()
+            StatsService.increment(session, tracked_accounts=-1)
+            # Checks skip deleted accounts, so an unfinished diff would never be resumed
+            session.query(FollowerDiff).filter_by(tracked_account_id=tracked_account_id).delete(
+                synchronize_session=False
+            )
             session.commit()
             
             return True, f"Stopped tracking {tracked_account.instagram_username}"
@@ -258,4 +906,54 @@ class TrackingService:
             session.rollback()
             return False, f"Error: {str(e)}"
         finally:
-            close_session(session) 
\ No newline at end of file
+            close_session(session)
+    
+    def purge_deleted_accounts(self, batch_size=None):
+        """Delete untracked accounts with their followers, unfollowers and other per-account rows
+        
+        Child rows go in batches of batch_size, each in its own short transaction,
+        so other writers are never locked out for long. Returns the number of
+        accounts purged.
+        """
+        batch_size = batch_size or PURGE_BATCH_SIZE
+        session = get_session()
+        purged = 0
+        
+        try:
+            account_ids = [
+                row.id for row in
+                session.query(TrackedAccount.id).filter(TrackedAccount.deleted_at.isnot(None))
+            ]
+            
+            for account_id in account_ids:
+                for model, key, counter in PURGED_TABLES:
+                    key = getattr(model, key)
+                    while True:
+                        batch = select(key).where(model.tracked_account_id == account_id).limit(batch_size)
+                        deleted = session.query(model).filter(
+                            model.tracked_account_id == account_id,
+                            key.in_(batch.scalar_subquery())
+                        ).delete(synchronize_session=False)
+                        if counter:
+                            StatsService.increment(session, **{counter: -deleted})
+                        session.commit()
+                        
+                        if deleted < batch_size:
+                            break
+                
+                self.archive.remove_account(account_id)
+                
+                # ON DELETE CASCADE catches anything written since the last batch
+                session.query(TrackedAccount).filter_by(id=account_id).delete(synchronize_session=False)
+                session.commit()
+                purged += 1
+                logger.info(f"Purged untracked account {account_id}")
+            
+            return purged
+            
+        except Exception as e:
+            logger.error(f"Error purging untracked accounts: {e}")
+            session.rollback()
+            return purged
+        finally:
+            close_session(session)
@@ -0,0 +1,40 @@
+import os
+import threading
+from collections import OrderedDict
+
+class UserIdCache:
+    """Bounded LRU map of Telegram chat ID -> users.id.
+
+    Users are never deleted, so an entry stays valid once written; the bound
+    only keeps memory flat as the number of chats grows.
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size or int(os.getenv("USER_CACHE_SIZE", "10000"))
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chat_id):
+        """Return the cached user ID for the chat, or None"""
+        with self._lock:
+            user_id = self._entries.get(chat_id)
+            if user_id is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(chat_id)
+            self.hits += 1
+            return user_id
+
+    def put(self, chat_id, user_id):
+        """Store a user ID, evicting the least recently used chats over the bound"""
+        with self._lock:
+            self._entries[chat_id] = user_id
+            self._entries.move_to_end(chat_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,12 +1,39 @@
+import asyncio
 from loguru import logger
-from src.db.session import get_session, close_session
-from src.db.models import User, Settings
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from src.db.session import get_session, close_session, current_unit_of_work
+from src.db.async_session import async_session_scope
+from src.db.models import User, Settings, UserPreference
+from src.services.settings_cache import SettingsCache
+from src.services.user_cache import UserIdCache
+from src.services.stats_service import StatsService
 import os
 
 class UserService:
-    def __init__(self):
-        # Initialize the admin user on startup
-        self.initialize_admin()
+    def __init__(self, settings_cache=None, user_ids=None):
+        self.settings_cache = settings_cache or SettingsCache()
+        self.user_ids = user_ids or UserIdCache()
+        self._first_contact_locks = {}  # chat_id -> [asyncio.Lock, waiters]
+    
+    @staticmethod
+    def _cached_user(chat_id):
+        """The user already loaded for this chat in the current unit of work"""
+        unit = current_unit_of_work()
+        return unit.cache.get(("user", chat_id)) if unit else None
+    
+    @staticmethod
+    def _cache_user(user):
+        """Remember a loaded user for the rest of the unit of work"""
+        unit = current_unit_of_work()
+        if unit is not None:
+            unit.cache[("user", user.chat_id)] = user
+        return user
+    
+    def _remember(self, user):
+        """Write a loaded or created user through to the caches"""
+        self.user_ids.put(user.chat_id, user.id)
+        return self._cache_user(user)
     
     def initialize_admin(self):
         """Initialize the admin user based on ADMIN_CHAT_ID environment variable"""
@@ -42,13 +69,16 @@ class UserService:
                 
                 session.add(Settings(key="check_interval", value=check_interval))
                 
+                StatsService.increment(session, users=1)
                 session.commit()
+                self.settings_cache.invalidate()
                 logger.info(f"Admin user created with chat_id: {admin_chat_id}")
             else:
                 # Ensure admin has admin rights
                 if not admin.is_admin:
                     admin.is_admin = True
                     session.commit()
+                    self.settings_cache.invalidate()
                     logger.info(f"Updated admin status for user with chat_id: {admin_chat_id}")
         
         except Exception as e:
@@ -59,6 +89,10 @@ class UserService:
     
     def get_or_create_user(self, chat_id, username=None):
         """Get an existing user or create a new one"""
+        user = self._cached_user(chat_id)
+        if user:
+            return user
+        
         session = get_session()
         
         try:
@@ -71,10 +105,16 @@ class UserService:
                     is_admin=False
                 )
                 session.add(user)
-                session.commit()
-                logger.info(f"New user created: {chat_id}")
+                try:
+                    StatsService.increment(session, users=1)
+                    session.commit()
+                    logger.info(f"New user created: {chat_id}")
+                except IntegrityError:
+                    # Created concurrently by another process
+                    session.rollback()
+                    user = session.query(User).filter_by(chat_id=chat_id).one()
             
-            return user
+            return self._remember(user)
         except Exception as e:
             logger.error(f"Error getting or creating user: {e}")
             session.rollback()
@@ -84,16 +124,7 @@ class UserService:
     
     def is_admin(self, chat_id):
         """Check if a user is an admin"""
-        session = get_session()
-        
-        try:
-            user = session.query(User).filter_by(chat_id=chat_id).first()
-            return user and user.is_admin
-        except Exception as e:
-            logger.error(f"Error checking admin status: {e}")
-            return False
-        finally:
-            close_session(session)
+        return self.settings_cache.is_admin(chat_id)
     
     def update_settings(self, key, value):
         """Update a setting in the database"""
@@ -109,6 +140,7 @@ class UserService:
                 session.add(setting)
             
             session.commit()
+            self.settings_cache.invalidate()
             return True
         except Exception as e:
             logger.error(f"Error updating setting: {e}")
@@ -118,17 +150,117 @@ class UserService:
             close_session(session)
     
     def get_setting(self, key, default=None):
-        """Get a setting from the database"""
+        """Get a setting from the in-memory cache"""
+        return self.settings_cache.get(key, default)
+    
+    def get_digest_minutes(self, user_id):
+        """Get the user's digest window in minutes, or None for immediate alerts"""
         session = get_session()
         
         try:
-            setting = session.query(Settings).filter_by(key=key).first()
+            preference = session.query(UserPreference).filter_by(user_id=user_id).first()
+            return preference.digest_minutes if preference else None
+        except Exception as e:
+            logger.error(f"Error getting digest setting: {e}")
+            return None
+        finally:
+            close_session(session)
+    
+    def set_digest_minutes(self, user_id, minutes):
+        """Set the user's digest window; None turns digest mode off"""
+        session = get_session()
+        
+        try:
+            preference = session.query(UserPreference).filter_by(user_id=user_id).first()
             
-            if setting:
-                return setting.value
-            return default
+            if preference:
+                preference.digest_minutes = minutes
+            else:
+                session.add(UserPreference(user_id=user_id, digest_minutes=minutes))
+            
+            session.commit()
+            return True
         except Exception as e:
-            logger.error(f"Error getting setting: {e}")
-            return default
+            logger.error(f"Error updating digest setting: {e}")
+            session.rollback()
+            return False
         finally:
-            close_session(session) 
\ No newline at end of file
+            close_session(session)
+    
+    # Async read paths for Telegram handlers, so DB latency doesn't block the event loop
+    
+    async def get_or_create_user_async(self, chat_id, username=None):
+        """Async version of get_or_create_user"""
+        user = self._cached_user(chat_id)
+        if user:
+            return user
+        
+        try:
+            async with async_session_scope() as session:
+                result = await session.execute(select(User).filter_by(chat_id=chat_id))
+                user = result.scalars().first()
+                
+                if not user:
+                    user = User(
+                        chat_id=chat_id,
+                        username=username,
+                        is_admin=False
+                    )
+                    session.add(user)
+                    try:
+                        await StatsService.increment_async(session, users=1)
+                        await session.commit()
+                        logger.info(f"New user created: {chat_id}")
+                    except IntegrityError:
+                        # Created concurrently by another process
+                        await session.rollback()
+                        result = await session.execute(select(User).filter_by(chat_id=chat_id))
+                        user = result.scalars().one()
+                
+                return self._remember(user)
+        except Exception as e:
+            logger.error(f"Error getting or creating user: {e}")
+            return None
+    
+    async def get_user_id_async(self, chat_id, username=None):
+        """Get the users.id for a chat, creating the user on first contact.
+        
+        Served from the LRU cache after the first call. Concurrent first
+        updates from one chat wait on a per-chat lock so only one of them
+        queries and inserts.
+        """
+        user_id = self.user_ids.get(chat_id)
+        if user_id is not None:
+            return user_id
+        
+        entry = self._first_contact_locks.setdefault(chat_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                user_id = self.user_ids.get(chat_id)
+                if user_id is None:
+                    user = await self.get_or_create_user_async(chat_id, username)
+                    user_id = user.id if user else None
+                return user_id
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._first_contact_locks.pop(chat_id, None)
+    
+    async def is_admin_async(self, chat_id):
+        """Async version of is_admin; served from the cache"""
+        return self.settings_cache.is_admin(chat_id)
+    
+    async def get_setting_async(self, key, default=None):
+        """Async version of get_setting; served from the cache"""
+        return self.settings_cache.get(key, default)
+    
+    async def get_digest_minutes_async(self, user_id):
+        """Async version of get_digest_minutes"""
+        try:
+            async with async_session_scope() as session:
+                result = await session.execute(select(UserPreference.digest_minutes).filter_by(user_id=user_id))
+                return result.scalar()
+        except Exception as e:
+            logger.error(f"Error getting digest setting: {e}")
+            return None
\ No newline at end of file
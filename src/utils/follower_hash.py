@@ -0,0 +1,31 @@
+"""
+Order-independent hash of a set of follower IDs
+"""
+
+MASK = (1 << 64) - 1
+
+def mix(user_id):
+    """Spread an Instagram ID over 64 bits (the splitmix64 finalizer)"""
+    value = (user_id + 0x9E3779B97F4A7C15) & MASK
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK
+    return value ^ (value >> 31)
+
+def add_ids(digest, user_ids):
+    """Hash of the set after adding IDs that weren't in it"""
+    for user_id in user_ids:
+        digest = (digest + mix(user_id)) & MASK
+    return digest
+
+def remove_ids(digest, user_ids):
+    """Hash of the set after removing IDs that were in it"""
+    for user_id in user_ids:
+        digest = (digest - mix(user_id)) & MASK
+    return digest
+
+def to_column(digest):
+    """Store an unsigned 64-bit hash in a signed BIGINT column"""
+    return digest - (1 << 64) if digest >= 1 << 63 else digest
+
+def from_column(value):
+    return value & MASK
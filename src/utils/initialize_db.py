@@ -2,7 +2,7 @@
 Database initialization utility
 """
 from src.db.models import init_db
-from src.services.user_service import UserService
+from src.services.container import services
 from loguru import logger
 
 def initialize_database():
@@ -13,8 +13,7 @@ def initialize_database():
     init_db()
     
     # Initialize admin user
-    user_service = UserService()
-    user_service.initialize_admin()
+    services.users.initialize_admin()
     
     logger.info("Database initialization complete")
 
@@ -0,0 +1,56 @@
+"""
+Helpers for rendering Telegram messages
+"""
+import csv
+import io
+from telegram.helpers import escape_markdown
+
+# Telegram rejects text messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+def md(text):
+    """Escape user-provided text for legacy Markdown parse mode"""
+    return escape_markdown(str(text or ""), version=1)
+
+def format_unfollower_line(idx, unfollower):
+    """Render one unfollower as a numbered list line"""
+    line = f"{idx}. *{md(unfollower['username'])}*"
+    if unfollower.get("full_name"):
+        line += f" ({md(unfollower['full_name'])})"
+    return line
+
+def chunk_lines(header, lines, limit=MAX_MESSAGE_LENGTH):
+    """Pack lines into as few messages as possible, each under the length limit.
+
+    Every message starts with the header; lines are never split between
+    messages, and a single oversized line is truncated.
+    """
+    chunks = []
+    current = header
+
+    for line in lines:
+        if len(header) + len(line) + 1 > limit:
+            line = line[:limit - len(header) - 2] + "…"
+
+        if len(current) + len(line) + 1 > limit:
+            chunks.append(current.rstrip("\n"))
+            current = header
+
+        current += line + "\n"
+
+    if current != header or not chunks:
+        chunks.append(current.rstrip("\n"))
+
+    return chunks
+
+def render_unfollowers_csv(sections):
+    """Render (instagram_username, unfollowers) sections as a CSV attachment body"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["tracked_account", "username", "full_name"])
+
+    for instagram_username, unfollowers in sections:
+        for unfollower in unfollowers:
+            writer.writerow([instagram_username, unfollower.get("username") or "", unfollower.get("full_name") or ""])
+
+    return buffer.getvalue().encode("utf-8")
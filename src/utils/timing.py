@@ -0,0 +1,38 @@
+"""
+Startup timing helpers
+"""
+import time
+from contextlib import contextmanager
+from loguru import logger
+
+class StartupTimer:
+    """Records how long each startup phase takes and logs a report"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        """Time the code inside the with-block as one phase"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    def record(self, name, seconds):
+        """Add a phase measured elsewhere"""
+        self.phases.append((name, seconds))
+
+    def report(self, title="Startup timing"):
+        """Log every phase and the total time since the timer was created"""
+        total = time.perf_counter() - self.started
+        lines = [f"{title}: {total * 1000:.0f} ms total"]
+        for name, seconds in self.phases:
+            lines.append(f"  {name}: {seconds * 1000:.1f} ms")
+        logger.info("\n".join(lines))
+        return total
+
+
+startup_timer = StartupTimer()